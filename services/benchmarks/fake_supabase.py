@@ -0,0 +1,510 @@
+import asyncio
+import copy
+import operator
+import random
+import re
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+
+# How embedded resources join: (parent table, embed name) -> (embedded table, parent column, embedded column, to_many)
+RELATIONS = {
+    ("stories", "story_companies"): ("story_companies", "id", "story_id", True),
+    ("companies", "story_companies"): ("story_companies", "id", "company_id", True),
+    ("companies", "funding_rounds"): ("funding_rounds", "id", "company_id", True),
+    ("companies", "company_events"): ("company_events", "id", "company_id", True),
+    ("story_companies", "companies"): ("companies", "company_id", "id", False),
+    ("story_companies", "stories"): ("stories", "story_id", "id", False),
+}
+
+# Conflict target when upsert() is called without on_conflict
+PRIMARY_KEYS = {"story_companies": "story_id,company_id"}
+
+
+class FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class Latency:
+    """Simulated PostgREST round trip: base milliseconds plus uniform jitter"""
+
+    def __init__(self, base_ms: float = 0.0, jitter_ms: float = 0.0, seed: Optional[int] = None):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+
+    async def wait(self):
+        delay = self.base_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        # Always yield, so concurrency behaves like real I/O even at zero latency
+        await asyncio.sleep(delay / 1000)
+
+
+class FakeSupabase:
+    """In-memory stand-in for the AsyncClient surface the services use.
+
+    Supports table() query chains (select with embeds and !inner, eq, gt,
+    gte, lt, ilike, is_, in_, or_ keyset filters, order, limit, range, insert,
+    upsert, update, delete) and the two RPCs in supabase/migrations. Every
+    execute() sleeps for the configured latency and is counted by table
+    and operation.
+    """
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]], latency: Optional[Latency] = None):
+        self.tables = tables
+        self.latency = latency or Latency()
+        self.calls: Counter = Counter()
+        # (table, column) -> value -> rows; dropped whenever the table is written
+        self._indexes: Dict[Tuple[str, str], Dict[str, List[Dict[str, Any]]]] = {}
+
+    def table(self, name: str) -> "Query":
+        self.tables.setdefault(name, [])
+        return Query(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> "Rpc":
+        return Rpc(self, name, params)
+
+    def lookup(self, table: str, column: str, value: Any) -> List[Dict[str, Any]]:
+        """Rows of table whose column equals value, via a lazily built index"""
+        index = self._indexes.get((table, column))
+        if index is None:
+            index = {}
+            for row in self.tables.get(table, []):
+                if row.get(column) is not None:
+                    index.setdefault(str(row[column]), []).append(row)
+            self._indexes[(table, column)] = index
+        return index.get(str(value), [])
+
+    def changed(self, table: str):
+        """Forget indexes over a table after a write"""
+        for key in [key for key in self._indexes if key[0] == table]:
+            del self._indexes[key]
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def call_counts(self) -> Dict[str, int]:
+        return dict(sorted(self.calls.items()))
+
+    async def _round_trip(self, label: str):
+        self.calls[label] += 1
+        await self.latency.wait()
+
+
+class Rpc:
+    def __init__(self, client: FakeSupabase, name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    async def execute(self) -> FakeResponse:
+        await self.client._round_trip(f"rpc.{self.name}")
+        if self.name == "increment_story_counters":
+            stories = {row["id"]: row for row in self.client.tables["stories"]}
+            for delta in self.params["deltas"]:
+                story = stories.get(delta["id"])
+                if story:
+                    story["likes"] = (story.get("likes") or 0) + delta.get("likes", 0)
+                    story["views"] = (story.get("views") or 0) + delta.get("views", 0)
+            return FakeResponse([])
+        if self.name == "update_story_with_companies":
+            return FakeResponse(self._update_story_with_companies())
+        raise ValueError(f"Unknown RPC: {self.name}")
+
+    def _update_story_with_companies(self):
+        tables = self.client.tables
+        story = next((row for row in tables["stories"] if row["id"] == self.params["target"]), None)
+        if story is None:
+            return None
+        story.update(self.params.get("changes") or {})
+        wanted = self.params.get("company_ids")
+        added, removed = [], []
+        if wanted is not None:
+            links = tables["story_companies"]
+            current = {link["company_id"] for link in links if link["story_id"] == story["id"]}
+            removed = sorted(current - set(wanted))
+            added = sorted(set(wanted) - current)
+            tables["story_companies"] = [
+                link for link in links if not (link["story_id"] == story["id"] and link["company_id"] in removed)
+            ]
+            tables["story_companies"].extend({"story_id": story["id"], "company_id": c} for c in added)
+            self.client.changed("story_companies")
+        self.client.changed("stories")
+        linked = sorted(link["company_id"] for link in tables["story_companies"] if link["story_id"] == story["id"])
+        return {"story": copy.deepcopy(story), "added": added, "removed": removed, "company_ids": linked}
+
+
+class Query:
+    """A PostgREST-style query builder over one in-memory table"""
+
+    def __init__(self, client: FakeSupabase, table: str):
+        self.client = client
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self.minimal = False
+        self.filters: List[Tuple[List[str], Callable[[Any], bool]]] = []
+        # Equality filters, used to pick candidate rows from indexes
+        self.equals: List[Tuple[str, Any, Callable[[Any], bool]]] = []
+        self.embedded_equals: List[Tuple[List[str], Any]] = []
+        self.row_filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List[Tuple[str, bool, Optional[bool]]] = []
+        self.offset = 0
+        self.row_limit: Optional[int] = None
+
+    # Operations
+
+    def select(self, columns: str = "*", **kwargs) -> "Query":
+        self.operation = "select"
+        self.columns = columns
+        return self
+
+    def insert(self, rows, returning=None, **kwargs) -> "Query":
+        self.operation = "insert"
+        self.payload = rows
+        self.minimal = _is_minimal(returning)
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False, returning=None, **kwargs) -> "Query":
+        self.operation = "upsert"
+        self.payload = rows
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.minimal = _is_minimal(returning)
+        return self
+
+    def update(self, values: Dict[str, Any], **kwargs) -> "Query":
+        self.operation = "update"
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs) -> "Query":
+        self.operation = "delete"
+        return self
+
+    # Filters
+
+    def eq(self, column: str, value: Any) -> "Query":
+        test = lambda v: _same(v, value)
+        if "." not in column and value is not None:
+            self.equals.append((column, value, test))
+        elif value is not None:
+            self.embedded_equals.append((column.split("."), value))
+        return self._filter(column, test)
+
+    def neq(self, column: str, value: Any) -> "Query":
+        return self._filter(column, lambda v: not _same(v, value))
+
+    def gt(self, column: str, value: Any) -> "Query":
+        return self._filter(column, lambda v: v is not None and _key(v) > _key(value))
+
+    def gte(self, column: str, value: Any) -> "Query":
+        return self._filter(column, lambda v: v is not None and _key(v) >= _key(value))
+
+    def lt(self, column: str, value: Any) -> "Query":
+        return self._filter(column, lambda v: v is not None and _key(v) < _key(value))
+
+    def lte(self, column: str, value: Any) -> "Query":
+        return self._filter(column, lambda v: v is not None and _key(v) <= _key(value))
+
+    def ilike(self, column: str, pattern: str) -> "Query":
+        regex = _like_regex(pattern)
+        return self._filter(column, lambda v: v is not None and regex.match(str(v)) is not None)
+
+    def is_(self, column: str, value: Any) -> "Query":
+        test = _condition(column, "is", str(value).lower())
+        return self._filter(column, lambda v: test({column: v}))
+
+    def in_(self, column: str, values) -> "Query":
+        wanted = {str(v) for v in values}
+        return self._filter(column, lambda v: v is not None and str(v) in wanted)
+
+    def or_(self, expression: str) -> "Query":
+        condition = _parse_logic(expression, any)
+        self.row_filters.append(condition)
+        return self
+
+    # Modifiers
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, **kwargs) -> "Query":
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size: int, **kwargs) -> "Query":
+        self.row_limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "Query":
+        self.offset = start
+        self.row_limit = end - start + 1
+        return self
+
+    async def execute(self) -> FakeResponse:
+        await self.client._round_trip(f"{self.table_name}.{self.operation}")
+        if self.operation == "select":
+            return FakeResponse(self._select())
+        self.client.changed(self.table_name)
+        if self.operation in ("insert", "upsert"):
+            data = self._write()
+            return FakeResponse([] if self.minimal else data)
+        if self.operation == "update":
+            rows = self._matching()
+            for row in rows:
+                row.update(copy.deepcopy(self.payload))
+            return FakeResponse(copy.deepcopy(rows))
+        rows = self._matching()
+        doomed = {id(row) for row in rows}
+        self.client.tables[self.table_name] = [row for row in self._rows() if id(row) not in doomed]
+        return FakeResponse(copy.deepcopy(rows))
+
+    # Internals
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return self.client.tables[self.table_name]
+
+    def _filter(self, column: str, test: Callable[[Any], bool]) -> "Query":
+        self.filters.append((column.split("."), test))
+        return self
+
+    def _matching(self) -> List[Dict[str, Any]]:
+        indexed = None
+        if self.equals:
+            # Status-like columns would make a poor index; prefer the most selective-looking column
+            column, value, indexed = min(self.equals, key=lambda item: item[0] in ("status", "category"))
+            candidates = self.client.lookup(self.table_name, column, value)
+        else:
+            candidates = self._rows()
+        # The index already applied its own filter
+        checks = [(path[0], test) for path, test in self.filters if len(path) == 1 and test is not indexed]
+        if not checks and not self.row_filters:
+            return list(candidates)
+        return [
+            row for row in candidates
+            if all(test(row.get(column)) for column, test in checks)
+            and all(condition(row) for condition in self.row_filters)
+        ]
+
+    def _select(self) -> List[Dict[str, Any]]:
+        fields, embeds = _parse_select(self.columns)
+        embedded_filters = [(path, test) for path, test in self.filters if len(path) > 1]
+        rows = self._matching()
+        for path, value in self.embedded_equals:
+            allowed = self._semi_join(embeds, path, value)
+            if allowed is not None:
+                rows = [row for row in rows if id(row) in allowed]
+
+        # Order columns are always top-level, so sort before resolving embeds.
+        # Common case first: one direction over non-null strings is a single sort.
+        columns = [column for column, _, _ in self.orders]
+        if (
+            self.orders
+            and len({desc for _, desc, _ in self.orders}) == 1
+            and all(isinstance(row.get(column), str) for row in rows for column in columns)
+        ):
+            rows = sorted(rows, key=operator.itemgetter(*columns), reverse=self.orders[0][1])
+            orders = []
+        else:
+            orders = self.orders
+        for column, desc, nullsfirst in reversed(orders):
+            # Postgres default: NULLS FIRST for DESC, NULLS LAST for ASC
+            nulls_first = desc if nullsfirst is None else nullsfirst
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            if all(isinstance(r[column], str) for r in present):
+                present.sort(key=operator.itemgetter(column), reverse=desc)
+            else:
+                present.sort(key=lambda r: _key(r[column]), reverse=desc)
+            rows = missing + present if nulls_first else present + missing
+
+        # Shape rows in order until the page is full; !inner embeds may drop some
+        end = None if self.row_limit is None else self.offset + self.row_limit
+        results = []
+        for row in rows:
+            shaped = self._shape(self.table_name, row, fields, embeds, embedded_filters, [])
+            if shaped is not None:
+                results.append(shaped)
+                if end is not None and len(results) >= end:
+                    break
+        return copy.deepcopy(results[self.offset:end])
+
+    def _semi_join(self, embeds, path: List[str], value: Any) -> Optional[set]:
+        """ids of top-level rows an !inner embed filter can keep, walked back from the matching leaf rows.
+
+        Only narrows the candidates; _shape still applies the filter itself.
+        """
+        top = next((embed for embed in embeds if embed[0] == path[0]), None)
+        if top is None or not top[1]:
+            return None
+        hops = []
+        table = self.table_name
+        for name in path[:-1]:
+            relation = RELATIONS.get((table, name))
+            if relation is None:
+                return None
+            hops.append((table, relation))
+            table = relation[0]
+        rows = self.client.lookup(table, path[-1], value)
+        for parent_table, (_, parent_col, child_col, _) in reversed(hops):
+            keys = {row.get(child_col) for row in rows if row.get(child_col) is not None}
+            rows = [parent for key in keys for parent in self.client.lookup(parent_table, parent_col, key)]
+        return {id(row) for row in rows}
+
+    def _shape(self, table, row, fields, embeds, filters, prefix) -> Optional[Dict[str, Any]]:
+        """Project row and resolve its embeds; None if an !inner embed came back empty"""
+        resolved = {}
+        for name, inner, sub_fields, sub_embeds in embeds:
+            target, parent_col, child_col, to_many = RELATIONS[(table, name)]
+            path = prefix + [name]
+            nested = [(p, t) for p, t in filters if p[:len(path)] == path]
+            parent_value = row.get(parent_col)
+            candidates = self.client.lookup(target, child_col, parent_value) if parent_value is not None else []
+            children = []
+            for child in candidates:
+                # Filters on this embed's own columns
+                if not all(t(child.get(p[len(path)])) for p, t in nested if len(p) == len(path) + 1):
+                    continue
+                child_shaped = self._shape(target, child, sub_fields, sub_embeds, nested, path)
+                if child_shaped is None:
+                    continue
+                # A deeper filter that nulled out a to-one embed drops the row, like an inner join
+                if any(len(p) > len(path) + 1 and child_shaped.get(p[len(path)]) is None for p, _ in nested):
+                    continue
+                children.append(child_shaped)
+            if inner and not children:
+                return None
+            resolved[name] = children if to_many else (children[0] if children else None)
+        # Project only rows that survived their !inner embeds
+        shaped = dict(row) if "*" in fields else {f: row.get(f) for f in fields}
+        shaped.update(resolved)
+        return shaped
+
+    def _write(self) -> List[Dict[str, Any]]:
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        table = self._rows()
+        conflict = (self.on_conflict or PRIMARY_KEYS.get(self.table_name, "id")).split(",")
+        index = {tuple(str(r.get(c)) for c in conflict): r for r in table}
+        now = datetime.now(timezone.utc).isoformat()
+        written = []
+        # Like a single INSERT statement, a batch with a conflicting row writes nothing
+        if self.operation == "insert":
+            keys = [tuple(str(row.get(c)) for c in conflict) for row in rows if all(c in row for c in conflict)]
+            if any(key in index for key in keys) or len(set(keys)) < len(keys):
+                raise _unique_violation(self.table_name)
+        for row in rows:
+            row = copy.deepcopy(row)
+            if "id" not in row and self.table_name != "story_companies":
+                row["id"] = str(uuid.uuid4())
+            row.setdefault("created_at", now)
+            row.setdefault("updated_at", now)
+            key = tuple(str(row.get(c)) for c in conflict)
+            existing = index.get(key)
+            if existing is not None:
+                if self.operation == "insert":
+                    raise _unique_violation(self.table_name)
+                if self.ignore_duplicates:
+                    continue
+                existing.update(row)
+                written.append(copy.deepcopy(existing))
+                continue
+            table.append(row)
+            index[key] = row
+            written.append(copy.deepcopy(row))
+        return written
+
+
+def _unique_violation(table_name: str) -> APIError:
+    # What PostgREST returns for a duplicate primary key
+    return APIError({"code": "23505", "message": f"duplicate key value violates unique constraint on {table_name}"})
+
+
+def _is_minimal(returning) -> bool:
+    return getattr(returning, "value", returning) == "minimal"
+
+
+def _key(value):
+    # Dates, timestamps and UUIDs are compared as PostgREST receives them: strings
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, bool) or isinstance(b, bool):
+        return str(a).lower() == str(b).lower()
+    return str(a) == str(b)
+
+
+def _like_regex(pattern: str):
+    parts = (re.escape(part) for part in pattern.split("%"))
+    return re.compile("^" + ".*".join(parts) + "$", re.IGNORECASE | re.DOTALL)
+
+
+def _split_top(expression: str) -> List[str]:
+    """Split on commas that aren't inside parentheses or quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_logic(expression: str, combine) -> Callable[[Dict[str, Any]], bool]:
+    """Parse the body of an or=(...) / and(...) filter into a row predicate"""
+    conditions = []
+    for part in _split_top(expression):
+        if part.startswith("and(") and part.endswith(")"):
+            conditions.append(_parse_logic(part[4:-1], all))
+        elif part.startswith("or(") and part.endswith(")"):
+            conditions.append(_parse_logic(part[3:-1], any))
+        else:
+            column, op, value = part.split(".", 2)
+            value = value.strip('"')
+            conditions.append(_condition(column, op, value))
+    return lambda row: combine(condition(row) for condition in conditions)
+
+
+def _condition(column: str, op: str, value: str) -> Callable[[Dict[str, Any]], bool]:
+    tests = {
+        "eq": lambda v: _same(v, value),
+        "neq": lambda v: not _same(v, value),
+        "lt": lambda v: v is not None and _key(v) < _key(value),
+        "lte": lambda v: v is not None and _key(v) <= _key(value),
+        "gt": lambda v: v is not None and _key(v) > _key(value),
+        "gte": lambda v: v is not None and _key(v) >= _key(value),
+        "is": lambda v: v is None if value == "null" else v is (value == "true"),
+    }
+    test = tests[op]
+    return lambda row: test(row.get(column))
+
+
+def _parse_select(columns: str):
+    """Turn a select string into (fields, embeds); embeds are (name, inner, fields, embeds)"""
+    fields, embeds = [], []
+    for part in _split_top(" ".join(columns.split())):
+        if "(" in part:
+            head, body = part.split("(", 1)
+            head = head.strip()
+            inner = head.endswith("!inner")
+            name = head.split("!")[0].strip()
+            sub_fields, sub_embeds = _parse_select(body[:-1])
+            embeds.append((name, inner, sub_fields, sub_embeds))
+        else:
+            fields.append(part)
+    return fields, embeds
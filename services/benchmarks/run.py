@@ -0,0 +1,280 @@
+"""Load-test the service endpoints against an in-memory PostgREST stand-in.
+
+Each scenario runs in its own Python process: the service's app module is
+imported with db.connect patched to return a FakeSupabase seeded with
+synthetic data, started, warmed up, then driven through its ASGI app by
+concurrent clients. Results are printed (or written with --output) as JSON.
+
+    python services/benchmarks/run.py --requests 1000 --concurrency 50 --latency-ms 8
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_supabase import FakeSupabase, Latency
+from scenarios import SCENARIOS
+from seed import seed_tables
+
+# Longest wait for a service's background loaders (trending, search, ...) after startup
+READY_TIMEOUT = 60.0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per read scenario")
+    parser.add_argument("--import-requests", type=int, default=20, help="Measured uploads for the CSV import scenario")
+    parser.add_argument("--csv-rows", type=int, default=200, help="Rows per uploaded CSV")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests sent first")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Injected latency per upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=2.0, help="Uniform jitter added to --latency-ms")
+    parser.add_argument("--stories", type=int, default=5000)
+    parser.add_argument("--companies", type=int, default=500)
+    parser.add_argument("--rounds-per-company", type=int, default=3)
+    parser.add_argument("--events-per-company", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--trace-memory", action="store_true", help="Also report tracemalloc peak (slows the run)")
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "min": round(ordered[0], 3) if ordered else 0.0,
+        "p50": round(percentile(ordered, 50), 3),
+        "p95": round(percentile(ordered, 95), 3),
+        "p99": round(percentile(ordered, 99), 3),
+        "max": round(ordered[-1], 3) if ordered else 0.0,
+        "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_scenario(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the scenario's service on a fake database and measure it under load"""
+    import httpx
+
+    scenario = SCENARIOS[name]
+    # Keep the service self-contained: in-process events, scratch job dir, no snapshot files
+    os.environ["EVENT_BUS"] = "local"
+    os.environ["IMPORT_JOB_DIR"] = tempfile.mkdtemp(prefix="bench-import-jobs-")
+    os.environ.pop("SNAPSHOT_DIR", None)
+    sys.path.insert(0, os.path.join(SERVICES_DIR, scenario.service))
+
+    fake = FakeSupabase(
+        seed_tables(args.stories, args.companies, args.rounds_per_company, args.events_per_company, seed=args.seed),
+        Latency(args.latency_ms, args.jitter_ms, seed=args.seed),
+    )
+    db = importlib.import_module("db")
+
+    async def connect(http_client):
+        return fake
+
+    db.connect = connect
+    service = importlib.import_module("app")
+
+    await service.app.router.startup()
+    deadline = time.monotonic() + READY_TIMEOUT
+    while not scenario.ready(service):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{scenario.service} service wasn't ready after {READY_TIMEOUT:.0f}s")
+        await asyncio.sleep(0.05)
+
+    options = {"companies": args.companies, "csv_rows": args.csv_rows}
+    total = args.import_requests if scenario.service == "cms" else args.requests
+    warmup = min(args.warmup, total) if scenario.service == "cms" else args.warmup
+    rng = random.Random(args.seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors: List[str] = []
+
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        async def send(request_number: int, measured: bool):
+            request = scenario.build(rng, request_number, options)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                status = response.status_code
+                if status >= 400 and len(errors) < 10:
+                    errors.append(f"{status}: {response.text[:200]}")
+            except Exception as e:
+                status = "exception"
+                if len(errors) < 10:
+                    errors.append(repr(e))
+            if measured:
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[str(status)] += 1
+
+        async def drive(count: int, offset: int, measured: bool):
+            queue = iter(range(offset, offset + count))
+
+            async def worker():
+                for request_number in queue:
+                    await send(request_number, measured)
+
+            await asyncio.gather(*(worker() for _ in range(min(args.concurrency, count) or 1)))
+
+        await drive(warmup, 0, measured=False)
+        fake.reset_calls()
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await drive(total, warmup, measured=True)
+        elapsed = time.perf_counter() - started
+        traced_peak = None
+        if args.trace_memory:
+            traced_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+        calls = fake.call_counts()
+
+        service_stats = None
+        if any(route.path == "/internal/stats" for route in service.app.routes):
+            service_stats = (await client.get("/internal/stats")).json()
+
+    await service.app.router.shutdown()
+
+    failed = sum(count for status, count in statuses.items() if status == "exception" or int(status) >= 500)
+    return {
+        "scenario": name,
+        "service": scenario.service,
+        "endpoint": scenario.endpoint,
+        "requests": total,
+        "concurrency": args.concurrency,
+        "errors": failed,
+        "status_codes": dict(sorted(statuses.items())),
+        "sample_errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+        "upstream_calls": {
+            "total": sum(calls.values()),
+            "per_request": round(sum(calls.values()) / total, 3) if total else 0.0,
+            "by_operation": calls,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_traced_mb": traced_peak,
+        "service_stats": service_stats,
+    }
+
+
+def run_child(args: argparse.Namespace):
+    result = asyncio.run(run_scenario(args.child, args))
+    with open(args.result_file, "w") as f:
+        json.dump(result, f)
+
+
+def run_all(args: argparse.Namespace, argv: List[str]) -> Dict[str, Any]:
+    """Run every selected scenario in a fresh interpreter so module state and peak RSS don't leak between them"""
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    results = []
+    for name in names:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_file = f.name
+        # Service warnings go to the child's stdout; keep them off ours
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *argv, "--child", name, "--result-file", result_file],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            if completed.returncode != 0:
+                results.append({"scenario": name, "error": completed.stderr.strip().splitlines()[-1:] or ["failed"]})
+                print(f"Warning: Scenario {name} failed:\n{completed.stderr}", file=sys.stderr)
+                continue
+            with open(result_file) as f:
+                results.append(json.load(f))
+        finally:
+            os.remove(result_file)
+
+    return {
+        "config": {
+            "requests": args.requests,
+            "import_requests": args.import_requests,
+            "csv_rows": args.csv_rows,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "stories": args.stories,
+            "companies": args.companies,
+            "seed": args.seed,
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+
+
+def main():
+    argv = sys.argv[1:]
+    args = parse_args(argv)
+    if args.child:
+        run_child(args)
+        return
+
+    report = run_all(args, _without_output(argv))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def _without_output(argv: List[str]) -> List[str]:
+    """Drop --output (and its value) from the arguments forwarded to child processes"""
+    forwarded = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg == "--output":
+            skip = True
+            continue
+        if arg.startswith("--output="):
+            continue
+        forwarded.append(arg)
+    return forwarded
+
+
+if __name__ == "__main__":
+    main()
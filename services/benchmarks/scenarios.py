@@ -0,0 +1,74 @@
+import random
+from typing import Any, Callable, Dict, NamedTuple
+from seed import CATEGORIES, COMPANY_TYPES, INDUSTRIES, csv_rows
+
+
+class Scenario(NamedTuple):
+    """One endpoint under load: which service serves it and how to build each request"""
+    service: str
+    endpoint: str
+    # (rng, request number, options) -> keyword arguments for httpx.AsyncClient.request
+    build: Callable[[random.Random, int, Dict[str, Any]], Dict[str, Any]]
+    # Background state the endpoint relies on once the service is warm
+    ready: Callable[[Any], bool] = lambda service: True
+
+
+def _skewed(rng: random.Random, size: int) -> int:
+    """Pick an index where low numbers are hot, like real traffic"""
+    return min(int(rng.paretovariate(1.16)) - 1, size - 1)
+
+
+def _stories(rng, i, options):
+    params = {"category": rng.choice(["all"] * 4 + CATEGORIES), "page": 1 + _skewed(rng, 5)}
+    roll = rng.random()
+    if roll < 0.15:
+        params["industry"] = rng.choice(INDUSTRIES)
+    elif roll < 0.3:
+        params["company_slug"] = f"company-{_skewed(rng, options['companies'])}"
+    return {"method": "GET", "url": "/stories", "params": params}
+
+
+def _trending(rng, i, options):
+    return {"method": "GET", "url": "/stories/trending", "params": {"timeframe": rng.choice(["day", "week", "week", "month"])}}
+
+
+def _company_timeline(rng, i, options):
+    slug = f"company-{_skewed(rng, options['companies'])}"
+    return {"method": "GET", "url": f"/companies/{slug}/timeline"}
+
+
+def _companies(rng, i, options):
+    params = {"page": 1 + _skewed(rng, 10), "sort": rng.choice(["name", "story_count", "total_funding", "updated_at"])}
+    roll = rng.random()
+    if roll < 0.3:
+        params["industry"] = rng.choice(INDUSTRIES)
+    elif roll < 0.45:
+        params["company_type"] = rng.choice(COMPANY_TYPES)
+    return {"method": "GET", "url": "/companies", "params": params}
+
+
+def _import_csv(rng, i, options):
+    upload = csv_rows(options["csv_rows"], f"bench{i}", options["companies"], seed=i)
+    return {
+        "method": "POST",
+        "url": "/editor/stories/import-csv",
+        "files": {"file": (f"bench{i}.csv", upload.encode("utf-8"), "text/csv")},
+    }
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "feed.get_stories": Scenario(
+        "feed", "GET /stories", _stories,
+        ready=lambda service: service.search_index.ready,
+    ),
+    "feed.get_trending_stories": Scenario(
+        "feed", "GET /stories/trending", _trending,
+        ready=lambda service: service.trending.ready,
+    ),
+    "timeline.get_company_timeline": Scenario("timeline", "GET /companies/{slug}/timeline", _company_timeline),
+    "timeline.get_companies": Scenario("timeline", "GET /companies", _companies),
+    "cms.import_stories_csv": Scenario(
+        "cms", "POST /editor/stories/import-csv", _import_csv,
+        ready=lambda service: service.company_ids.ready and service.duplicate_index.ready,
+    ),
+}
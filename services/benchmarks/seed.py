@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+CATEGORIES = ["funding", "product", "acquisition", "ipo", "partnership", "general"]
+INDUSTRIES = ["fintech", "healthtech", "edtech", "ai", "climate", "saas", "ecommerce", "mobility", "biotech", "security"]
+COMPANY_TYPES = ["startup", "scaleup", "enterprise", "investor"]
+LOCATIONS = ["San Francisco, CA", "New York, NY", "London, UK", "Berlin, Germany", "Bangalore, India", "Singapore", "Austin, TX", "Paris, France"]
+ROUND_TYPES = ["pre-seed", "seed", "series-a", "series-b", "series-c"]
+EVENT_TYPES = ["launch", "hire", "partnership", "expansion", "award"]
+WORDS = (
+    "platform startup launches raises funding round investors growth market product users revenue "
+    "customers team expansion global series seed capital venture partnership acquisition enterprise "
+    "cloud data ai model payments health climate energy mobile app analytics security developer"
+).split()
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def seed_tables(
+    stories: int = 5000,
+    companies: int = 500,
+    rounds_per_company: int = 3,
+    events_per_company: int = 4,
+    max_links_per_story: int = 3,
+    seed: int = 42
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Build deterministic synthetic rows for every table the services read"""
+    rng = random.Random(seed)
+    ids = random.Random(seed + 1)
+    now = datetime.now(timezone.utc)
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=ids.getrandbits(128), version=4))
+
+    company_rows = []
+    for i in range(companies):
+        name = f"{_words(rng, 2).title()} {i}"
+        company_rows.append({
+            "id": new_id(),
+            "name": name,
+            "slug": f"company-{i}",
+            "description": _words(rng, 20),
+            "industry": rng.choice(INDUSTRIES),
+            "company_type": rng.choice(COMPANY_TYPES),
+            "location": rng.choice(LOCATIONS),
+            "founded_date": (now - timedelta(days=rng.randint(200, 4000))).date().isoformat(),
+            "website": f"https://company-{i}.example.com",
+            "logo_url": f"https://cdn.example.com/logos/{i}.png",
+            "status": "active",
+            "created_at": _timestamp(now - timedelta(days=rng.randint(30, 900))),
+            "updated_at": _timestamp(now - timedelta(days=rng.randint(0, 30))),
+            "total_funding": 0,
+            "funding_rounds_count": 0,
+            "last_funding_round": None,
+            "last_funding_date": None,
+            "story_count": 0,
+        })
+
+    funding_rows = []
+    event_rows = []
+    for company in company_rows:
+        for _ in range(rng.randint(0, rounds_per_company * 2)):
+            announced = (now - timedelta(days=rng.randint(0, 1500))).date().isoformat()
+            amount = rng.choice([None, rng.randint(1, 500) * 250_000])
+            funding_rows.append({
+                "id": new_id(),
+                "company_id": company["id"],
+                "round_type": rng.choice(ROUND_TYPES),
+                "amount_raised": amount,
+                "currency": "USD",
+                "announced_date": announced,
+                "investors": [f"{_words(rng, 1).title()} Ventures" for _ in range(rng.randint(1, 3))],
+                "valuation": amount * 5 if amount else None,
+                "source_url": f"https://news.example.com/rounds/{new_id()}",
+                "description": _words(rng, 12),
+            })
+            company["total_funding"] += amount or 0
+            company["funding_rounds_count"] += 1
+            if not company["last_funding_date"] or announced > company["last_funding_date"]:
+                company["last_funding_date"] = announced
+                company["last_funding_round"] = funding_rows[-1]["round_type"]
+        for _ in range(rng.randint(0, events_per_company * 2)):
+            event_rows.append({
+                "id": new_id(),
+                "company_id": company["id"],
+                "event_type": rng.choice(EVENT_TYPES),
+                "event_date": (now - timedelta(days=rng.randint(0, 1500))).date().isoformat(),
+                "title": _words(rng, 5).capitalize(),
+                "description": _words(rng, 15),
+                "amount": None,
+                "source_url": None,
+                "metadata": {},
+            })
+
+    story_rows = []
+    link_rows = []
+    for i in range(stories):
+        # Most stories are recent, so the trending windows have something to rank
+        published = now - timedelta(minutes=int(rng.expovariate(1 / (60 * 24 * 20))))
+        story = {
+            "id": new_id(),
+            "title": f"{_words(rng, 7).capitalize()} {i}",
+            "summary": _words(rng, 30),
+            "content": _words(rng, 300),
+            "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(WORDS, 3),
+            "source_url": f"https://news.example.com/stories/{i}",
+            "image_url": f"https://cdn.example.com/images/{i}.jpg",
+            "status": "published" if rng.random() < 0.95 else "draft",
+            "created_by": "benchmark",
+            "published_date": _timestamp(published),
+            "created_at": _timestamp(published),
+            "updated_at": _timestamp(published),
+            "likes": int(rng.paretovariate(1.5)) - 1,
+            "views": int(rng.paretovariate(1.2) * 10),
+        }
+        story_rows.append(story)
+        for company in rng.sample(company_rows, rng.randint(1, max_links_per_story)):
+            link_rows.append({"story_id": story["id"], "company_id": company["id"]})
+            company["story_count"] += 1
+
+    return {
+        "stories": story_rows,
+        "companies": company_rows,
+        "story_companies": link_rows,
+        "funding_rounds": funding_rows,
+        "company_events": event_rows,
+        "categories": [
+            {"id": category, "name": category.title(), "icon": "", "color": "#0ea5e9", "sort_order": i}
+            for i, category in enumerate(CATEGORIES)
+        ],
+        "industries": [
+            {"id": industry, "name": industry.title(), "sort_order": i}
+            for i, industry in enumerate(INDUSTRIES)
+        ],
+        "submissions": [],
+    }
+
+
+def csv_rows(count: int, prefix: str, companies: int = 500, seed: int = 7) -> str:
+    """A CSV upload of count fresh stories for the import scenario, in the /editor/csv-template layout"""
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["title", "summary", "content", "category", "tags", "source_url", "published_date", "status", "company_slugs"])
+    for i in range(count):
+        # Mostly existing companies, with the odd new one for the importer to create
+        slugs = [f"company-{rng.randrange(companies)}" for _ in range(rng.randint(1, 2))]
+        if rng.random() < 0.1:
+            slugs.append(f"{prefix}-new-{i}")
+        writer.writerow([
+            f"{prefix} {_words(rng, 6)} {i}",
+            f"{prefix} {i} {_words(rng, 25)}",
+            _words(rng, 80),
+            rng.choice(CATEGORIES),
+            json.dumps(rng.sample(WORDS, 3)),
+            f"https://import.example.com/{prefix}/{i}",
+            datetime.now(timezone.utc).isoformat(),
+            "published",
+            ",".join(slugs),
+        ])
+    return out.getvalue()
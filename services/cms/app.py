@@ -1,16 +1,25 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import os
-from supabase import create_client, Client
+from supabase import AsyncClient
 import uvicorn
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-import csv
-import io
 import json
 import uuid
 from urllib.parse import urlparse
+from invalidation import publish_change
+from events import STORY_CREATED, STORY_UPDATED, STORY_DELETED, LINKS_CHANGED, REFERENCE_CHANGED
+from pagination import decode_cursor, paginate
+from fields import ADMIN_FIELDS, parse_fields
+from companies import company_ids, generate_slug
+from importer import REQUIRED_FIELDS, CsvImport, open_csv, save_stories
+from jobs import ImportJobQueue
+from dedupe import DuplicateIndex
+import db
+import invalidation
 
 app = FastAPI(title="CMS Service", version="1.0.0")
 
@@ -22,9 +31,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-supabase_url = os.environ.get("SUPABASE_URL", "")
-supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE", "")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Supabase connection, opened on startup over a pooled keep-alive HTTP client
+http_client = db.create_http_client()
+supabase: AsyncClient = None
+
+async def load_duplicate_candidates():
+    """Yield the compared fields of every story, a page at a time"""
+    batch_size = 1000
+    start = 0
+    while True:
+        result = await supabase.table("stories").select(
+            "id, title, summary, source_url"
+        ).order("id").range(start, start + batch_size - 1).execute()
+        yield result.data
+        if len(result.data) < batch_size:
+            return
+        start += batch_size
+
+# Near-duplicate lookup for new stories, loaded at startup and kept current by CMS writes
+duplicate_index = DuplicateIndex(load_duplicate_candidates)
+
+# Background CSV imports, run by a small local worker pool
+import_jobs = ImportJobQueue()
 
 # Data models
 class SubmissionCreate(BaseModel):
@@ -48,6 +76,7 @@ class StoryCreate(BaseModel):
     company_slugs: List[str] = []
     published_date: Optional[datetime] = None
     status: str = "published"
+    allow_duplicate: bool = False
 
 class StoryUpdate(BaseModel):
     title: Optional[str] = None
@@ -68,17 +97,59 @@ class StoryApproval(BaseModel):
     company_slugs: List[str] = []
     source_url: Optional[str] = None
     image_url: Optional[str] = None
+    allow_duplicate: bool = False
+
+class BulkApprovalItem(BaseModel):
+    submission_id: str
+    # Unset fields fall back to the submission's proposed values
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    category: Optional[str] = None
+    tags: Optional[List[str]] = None
+    company_slugs: List[str] = []
+    source_url: Optional[str] = None
+    image_url: Optional[str] = None
+    allow_duplicate: bool = False
+
+class BulkApproval(BaseModel):
+    items: List[BulkApprovalItem]
+
+class BulkRejection(BaseModel):
+    submission_ids: List[str]
+    reason: str = "Does not meet guidelines"
+
+# Largest batch accepted by the bulk moderation endpoints
+MAX_BULK_ITEMS = 200
+
+@app.on_event("startup")
+async def connect_supabase():
+    global supabase
+    supabase = await db.connect(http_client)
+    try:
+        await company_ids.warm(supabase)
+    except Exception as e:
+        # Unknown slugs are still looked up on demand
+        print(f"Warning: Failed to warm company slug cache: {str(e)}")
+    duplicate_index.start()
+    await import_jobs.start(supabase, duplicate_index)
+
+@app.on_event("shutdown")
+async def close_supabase():
+    await import_jobs.stop()
+    await duplicate_index.stop()
+    await invalidation.drain()
+    await http_client.aclose()
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "CMS Service is running!", "version": "1.0.0"}
 
 # Submissions Management
 @app.post("/submissions")
-def create_submission(submission: SubmissionCreate):
+async def create_submission(submission: SubmissionCreate):
     """Create a new story submission"""
     try:
-        result = supabase.table("submissions").insert({
+        result = await supabase.table("submissions").insert({
             "founder_name": submission.founder_name,
             "founder_email": submission.founder_email,
             "company_name": submission.company_name,
@@ -95,31 +166,29 @@ def create_submission(submission: SubmissionCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/submissions")
-def get_submissions(
+async def get_submissions(
     status: str = Query("pending", regex="^(pending|approved|rejected|all)$"),
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page")
 ):
     """Get submissions by status"""
+    after = decode_cursor(cursor) if cursor else None
     try:
         query = supabase.table("submissions").select("*")
         
         if status != "all":
             query = query.eq("status", status)
-            
-        query = query.order("submitted_at", desc=True)
-        
-        # Pagination
-        start = (page - 1) * limit
-        end = start + limit - 1
         
-        result = query.range(start, end).execute()
+        # Pagination (keyset when a cursor is given, offset otherwise)
+        submissions, next_cursor = await paginate(query, "submitted_at", page, limit, after)
         
         return {
-            "submissions": result.data,
-            "page": page,
+            "submissions": submissions,
+            "page": None if after else page,
             "limit": limit,
-            "status": status
+            "status": status,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -127,15 +196,22 @@ def get_submissions(
 @app.post("/submissions/{submission_id}/approve")
 async def approve_submission(submission_id: str, approval: StoryApproval):
     """Approve a submission and create a story"""
+    if not approval.allow_duplicate:
+        reject_duplicate(approval.title, approval.summary, approval.source_url)
     try:
         # Get submission
-        submission_result = supabase.table("submissions").select("*").eq("id", submission_id).execute()
+        submission_result = await supabase.table("submissions").select("*").eq("id", submission_id).execute()
         
         if not submission_result.data:
             raise HTTPException(status_code=404, detail="Submission not found")
             
         submission = submission_result.data[0]
         
+        # Claim the submission first, so overlapping approvals can't both create a story
+        claimed = await claim_submissions([submission_id], {"status": "approved"})
+        if not claimed:
+            raise HTTPException(status_code=409, detail=f"Submission is already {submission.get('status')}")
+        
         # Create story
         story_data = {
             "title": approval.title,
@@ -149,42 +225,170 @@ async def approve_submission(submission_id: str, approval: StoryApproval):
             "published_date": datetime.now().isoformat()
         }
         
-        story_result = supabase.table("stories").insert(story_data).execute()
+        try:
+            story_result = await supabase.table("stories").insert(story_data).execute()
+        except Exception:
+            await release_submissions([submission_id])
+            raise
         story_id = story_result.data[0]["id"]
+        duplicate_index.add(story_result.data[0])
         
         # Handle company associations
+        linked_slugs = []
         if approval.company_slugs:
-            await link_story_to_companies(story_id, approval.company_slugs, submission["company_name"])
+            linked_slugs = await link_story_to_companies(story_id, approval.company_slugs, submission["company_name"])
         elif submission["company_name"]:
-            await link_story_to_companies(story_id, [], submission["company_name"])
+            linked_slugs = await link_story_to_companies(story_id, [], submission["company_name"])
         
-        # Update submission status
-        supabase.table("submissions").update({
-            "status": "approved",
-            "reviewed_by": "admin",
-            "reviewed_at": datetime.now().isoformat()
-        }).eq("id", submission_id).execute()
+        publish_change(STORY_CREATED, [story_id], [approval.category], linked_slugs)
         
         return {"message": "Submission approved", "story_id": story_id}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/submissions/{submission_id}/reject")
-def reject_submission(submission_id: str, reason: str = "Does not meet guidelines"):
+async def reject_submission(submission_id: str, reason: str = "Does not meet guidelines"):
     """Reject a submission"""
     try:
-        result = supabase.table("submissions").update({
-            "status": "rejected",
-            "admin_notes": reason,
-            "reviewed_by": "admin",
-            "reviewed_at": datetime.now().isoformat()
-        }).eq("id", submission_id).execute()
+        # Only a pending submission can be rejected; never overturn another review
+        claimed = await claim_submissions([submission_id], {"status": "rejected", "admin_notes": reason})
         
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Submission not found")
+        if not claimed:
+            submission_result = await supabase.table("submissions").select("status").eq("id", submission_id).execute()
+            if not submission_result.data:
+                raise HTTPException(status_code=404, detail="Submission not found")
+            raise HTTPException(status_code=409, detail=f"Submission is already {submission_result.data[0].get('status')}")
         
         return {"message": "Submission rejected", "reason": reason}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/submissions/bulk-approve")
+async def bulk_approve_submissions(approval: BulkApproval):
+    """Approve many submissions, creating their stories in batches"""
+    if len(approval.items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} submissions per request")
+    try:
+        ids = list(dict.fromkeys(item.submission_id for item in approval.items))
+        submissions = {}
+        if ids:
+            result = await supabase.table("submissions").select("*").in_("id", ids).execute()
+            submissions = {s["id"]: s for s in result.data}
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        stories = []
+        submission_ids = {}
+        batch = DuplicateIndex()
+        now = datetime.now().isoformat()
+        seen = set()
+        for item in approval.items:
+            if item.submission_id in seen:
+                continue
+            seen.add(item.submission_id)
+            submission = submissions.get(item.submission_id)
+            if not submission:
+                results[item.submission_id] = {"status": "not_found"}
+                continue
+            if submission.get("status") != "pending":
+                results[item.submission_id] = {"status": "skipped", "detail": f"Submission is already {submission.get('status')}"}
+                continue
+            
+            story = {
+                "id": str(uuid.uuid4()),
+                "title": item.title or submission["proposed_title"],
+                "summary": item.summary or submission["proposed_summary"],
+                "category": item.category or submission.get("proposed_category") or "general",
+                "tags": item.tags if item.tags is not None else (submission.get("proposed_tags") or []),
+                "source_url": item.source_url,
+                "image_url": item.image_url,
+                "status": "published",
+                "created_by": "admin",
+                "published_date": now,
+                "company_slugs": item.company_slugs,
+                "company_name": submission.get("company_name")
+            }
+            if not item.allow_duplicate:
+                duplicate = duplicate_index.find(story) or batch.find(story)
+                if duplicate:
+                    results[item.submission_id] = {"status": "duplicate", **duplicate}
+                    continue
+            batch.add(story)
+            stories.append(story)
+            submission_ids[story["id"]] = item.submission_id
+        
+        # Only submissions still pending at this point get a story; another
+        # approval may have claimed some since they were read
+        claimed = await claim_submissions(list(submission_ids.values()), {"status": "approved"}, now)
+        for story in stories:
+            if submission_ids[story["id"]] not in claimed:
+                results[submission_ids[story["id"]]] = {"status": "skipped", "detail": "Submission was reviewed by another request"}
+        stories = [story for story in stories if submission_ids[story["id"]] in claimed]
+        
+        # Stories and their company links go out in batched inserts
+        try:
+            saved = await save_stories(supabase, stories)
+        except Exception:
+            await release_submissions([submission_ids[story["id"]] for story in stories])
+            raise
+        saved_ids = set(saved["saved_ids"])
+        for story in stories:
+            if story["id"] in saved_ids:
+                duplicate_index.add(story)
+                results[submission_ids[story["id"]]] = {"status": "approved", "story_id": story["id"]}
+            else:
+                results[submission_ids[story["id"]]] = {"status": "error", "detail": "Failed to save story"}
+        
+        # Put submissions whose story didn't save back in the queue
+        await release_submissions([submission_ids[story["id"]] for story in stories if story["id"] not in saved_ids])
+        
+        approved = [submission_ids[story_id] for story_id in saved["saved_ids"]]
+        publish_change(STORY_CREATED, saved["saved_ids"], saved["categories"], saved["linked_slugs"])
+        
+        return {
+            "approved_count": len(approved),
+            "results": [{"submission_id": submission_id, **outcome} for submission_id, outcome in results.items()],
+            "errors": saved["errors"][:10]
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/submissions/bulk-reject")
+async def bulk_reject_submissions(rejection: BulkRejection):
+    """Reject many submissions in one update"""
+    if len(rejection.submission_ids) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} submissions per request")
+    try:
+        ids = list(dict.fromkeys(rejection.submission_ids))
+        # Only pending submissions are rejected; approved ones already have a story
+        rejected = await claim_submissions(ids, {"status": "rejected", "admin_notes": rejection.reason})
+        
+        # Tell already-reviewed submissions apart from unknown ids
+        reviewed = {}
+        others = [submission_id for submission_id in ids if submission_id not in rejected]
+        if others:
+            result = await supabase.table("submissions").select("id, status").in_("id", others).execute()
+            reviewed = {s["id"]: s["status"] for s in result.data}
+        
+        results = []
+        for submission_id in ids:
+            if submission_id in rejected:
+                results.append({"submission_id": submission_id, "status": "rejected"})
+            elif submission_id in reviewed:
+                results.append({"submission_id": submission_id, "status": "skipped", "detail": f"Submission is already {reviewed[submission_id]}"})
+            else:
+                results.append({"submission_id": submission_id, "status": "not_found"})
+        
+        return {
+            "rejected_count": len(rejected),
+            "reason": rejection.reason,
+            "results": results
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -192,6 +396,8 @@ def reject_submission(submission_id: str, reason: str = "Does not meet guideline
 @app.post("/editor/stories")
 async def create_story(story: StoryCreate):
     """Create a new story manually"""
+    if not story.allow_duplicate:
+        reject_duplicate(story.title, story.summary, story.source_url)
     try:
         story_data = {
             "title": story.title,
@@ -206,12 +412,16 @@ async def create_story(story: StoryCreate):
             "published_date": (story.published_date or datetime.now()).isoformat()
         }
         
-        result = supabase.table("stories").insert(story_data).execute()
+        result = await supabase.table("stories").insert(story_data).execute()
         story_id = result.data[0]["id"]
+        duplicate_index.add(result.data[0])
         
         # Link to companies
+        linked_slugs = []
         if story.company_slugs:
-            await link_story_to_companies(story_id, story.company_slugs)
+            linked_slugs = await link_story_to_companies(story_id, story.company_slugs)
+        
+        publish_change(STORY_CREATED, [story_id], [story.category], linked_slugs)
         
         return {"message": "Story created successfully", "story": result.data}
         
@@ -243,48 +453,80 @@ async def update_story(story_id: str, story: StoryUpdate):
             
         update_data["updated_at"] = datetime.now().isoformat()
         
-        result = supabase.table("stories").update(update_data).eq("id", story_id).execute()
+        # Resolve the new link set up front (cached, creating unknown companies)
+        link_ids = None
+        if story.company_slugs is not None:
+            # Don't create companies for a story that isn't there
+            existing = await supabase.table("stories").select("id").eq("id", story_id).execute()
+            if not existing.data:
+                raise HTTPException(status_code=404, detail="Story not found")
+            wanted = {slug: slug.replace("-", " ").title() for slug in story.company_slugs}
+            slug_ids, _ = await company_ids.resolve(supabase, wanted)
+            link_ids = [slug_ids[slug] for slug in wanted if slug in slug_ids]
+        
+        # Story write and link diff happen in one transaction
+        result = await supabase.rpc("update_story_with_companies", {
+            "target": story_id,
+            "changes": update_data,
+            "company_ids": link_ids
+        }).execute()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Story not found")
+        updated = result.data["story"]
+        duplicate_index.add(updated)
         
-        # Update company links if provided
-        if story.company_slugs is not None:
-            # Remove existing links
-            supabase.table("story_companies").delete().eq("story_id", story_id).execute()
-            # Add new links
-            await link_story_to_companies(story_id, story.company_slugs)
+        # Current links let filtered feed pages and timelines pick up a story they don't show yet
+        linked = result.data["company_ids"]
+        publish_change(STORY_UPDATED, [story_id], [updated.get("category")], company_ids.slugs_for(linked), linked)
+        relinked = result.data["added"] + result.data["removed"]
+        if relinked:
+            publish_change(LINKS_CHANGED, [story_id], [updated.get("category")], company_ids.slugs_for(relinked), relinked)
         
-        return {"message": "Story updated successfully", "story": result.data[0]}
+        return {"message": "Story updated successfully", "story": updated}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/editor/stories/{story_id}")
-def delete_story(story_id: str):
+async def delete_story(story_id: str):
     """Delete a story"""
     try:
-        result = supabase.table("stories").delete().eq("id", story_id).execute()
+        # Read the links first; they are gone once the story is
+        links = await supabase.table("story_companies").select("company_id").eq("story_id", story_id).execute()
+        linked = [link["company_id"] for link in links.data]
+        
+        result = await supabase.table("stories").delete().eq("id", story_id).execute()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Story not found")
         
+        duplicate_index.remove(story_id)
+        publish_change(STORY_DELETED, [story_id], [result.data[0].get("category")], company_ids.slugs_for(linked), linked)
+        
         return {"message": "Story deleted successfully"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/editor/stories")
-def get_stories_for_admin(
+async def get_stories_for_admin(
     status: Optional[str] = None,
     category: Optional[str] = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated story columns; defaults to the list projection")
 ):
     """Get stories for admin management"""
+    after = decode_cursor(cursor) if cursor else None
+    # created_at is needed to build the next cursor
+    columns = parse_fields(fields, ADMIN_FIELDS, required=("id", "created_at"))
     try:
-        query = supabase.table("stories").select("""
-            *,
+        query = supabase.table("stories").select(f"""
+            {", ".join(columns)},
             story_companies(companies(name, slug))
         """)
         
@@ -292,28 +534,43 @@ def get_stories_for_admin(
             query = query.eq("status", status)
         if category:
             query = query.eq("category", category)
-            
-        query = query.order("created_at", desc=True)
-        
-        start = (page - 1) * limit
-        end = start + limit - 1
         
-        result = query.range(start, end).execute()
+        stories, next_cursor = await paginate(query, "created_at", page, limit, after)
         
         return {
-            "stories": result.data,
-            "page": page,
-            "limit": limit
+            "stories": stories,
+            "page": None if after else page,
+            "limit": limit,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/editor/stories/{story_id}")
+async def get_story_for_admin(story_id: str):
+    """Get a single story in any status, including its content"""
+    try:
+        result = await supabase.table("stories").select("""
+            *,
+            story_companies(companies(name, slug))
+        """).eq("id", story_id).execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return {"story": result.data[0]}
+
 # Bulk Import
 @app.post("/editor/stories/import-csv")
 async def import_stories_csv(
     file: UploadFile = File(..., description="CSV file with stories"),
-    dry_run: bool = Form(False, description="Preview import without saving")
+    dry_run: bool = Form(False, description="Preview import without saving"),
+    chunk_size: Optional[int] = Form(None, ge=1, le=5000, description="Rows per insert batch"),
+    stream_progress: bool = Form(False, description="Stream NDJSON progress lines while importing"),
+    background: bool = Form(False, description="Queue the import as a background job and return its id"),
+    skip_duplicates: bool = Form(True, description="Skip rows that look like existing stories instead of only flagging them")
 ):
     """Import stories from CSV file"""
     try:
@@ -321,126 +578,71 @@ async def import_stories_csv(
         if not file.filename.endswith('.csv'):
             raise HTTPException(status_code=400, detail="File must be a CSV")
         
-        # Read file content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        
-        # Parse CSV
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        if background and not dry_run:
+            try:
+                job = await import_jobs.submit(file.file, file.filename, chunk_size, skip_duplicates)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return {
+                "message": "Import queued",
+                "job_id": job.id,
+                "status_url": f"/editor/import-jobs/{job.id}"
+            }
         
-        # Required fields
-        required_fields = ['title', 'summary', 'category']
+        # Parse the upload incrementally instead of decoding it in one piece
+        csv_reader = open_csv(file.file)
         
         # Validate headers
-        if not all(field in csv_reader.fieldnames for field in required_fields):
+        if not all(field in (csv_reader.fieldnames or []) for field in REQUIRED_FIELDS):
             raise HTTPException(
                 status_code=400, 
-                detail=f"CSV must contain these columns: {', '.join(required_fields)}"
+                detail=f"CSV must contain these columns: {', '.join(REQUIRED_FIELDS)}"
             )
         
-        imported_stories = []
-        errors = []
-        row_number = 1
-        
-        for row in csv_reader:
-            row_number += 1
+        csv_import = CsvImport(
+            supabase,
+            csv_reader,
+            dry_run,
+            chunk_size,
+            duplicates=duplicate_index,
+            skip_duplicates=skip_duplicates
+        )
+        
+        if stream_progress:
+            async def progress_events():
+                async for progress in csv_import.run():
+                    yield json.dumps(progress) + "\n"
+                yield json.dumps(csv_import.summary()) + "\n"
             
-            try:
-                # Clean and validate data
-                title = row.get('title', '').strip()
-                summary = row.get('summary', '').strip()
-                category = row.get('category', 'general').strip()
-                
-                if not title or not summary:
-                    errors.append(f"Row {row_number}: Title and summary are required")
-                    continue
-                
-                # Process tags
-                tags_str = row.get('tags', '').strip()
-                try:
-                    tags = json.loads(tags_str) if tags_str else []
-                except:
-                    tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()] if tags_str else []
-                
-                # Process company slugs
-                company_slugs_str = row.get('company_slugs', '').strip()
-                company_slugs = [slug.strip() for slug in company_slugs_str.split(',') if slug.strip()] if company_slugs_str else []
-                
-                # Parse published date
-                published_date_str = row.get('published_date', '').strip()
-                if published_date_str:
-                    try:
-                        published_date = datetime.fromisoformat(published_date_str.replace('Z', '+00:00'))
-                    except:
-                        published_date = datetime.now()
-                else:
-                    published_date = datetime.now()
-                
-                story_data = {
-                    "id": str(uuid.uuid4()),
-                    "title": title,
-                    "summary": summary,
-                    "content": row.get('content', '').strip() or None,
-                    "category": category,
-                    "tags": tags,
-                    "source_url": row.get('source_url', '').strip() or None,
-                    "image_url": row.get('image_url', '').strip() or None,
-                    "status": row.get('status', 'published').strip(),
-                    "created_by": "csv_import",
-                    "published_date": published_date.isoformat(),
-                    "company_slugs": company_slugs,
-                    "company_name": row.get('company_name', '').strip() or None
-                }
-                
-                imported_stories.append(story_data)
-                
-            except Exception as e:
-                errors.append(f"Row {row_number}: {str(e)}")
-        
-        if dry_run:
-            return {
-                "dry_run": True,
-                "total_rows": len(imported_stories),
-                "preview": imported_stories[:5],
-                "errors": errors
-            }
-        
-        # Save stories to database
-        saved_stories = []
-        for story in imported_stories:
-            try:
-                # Extract company data
-                company_slugs = story.pop('company_slugs', [])
-                company_name = story.pop('company_name', None)
-                
-                # Insert story
-                result = supabase.table("stories").insert(story).execute()
-                
-                if result.data:
-                    story_id = result.data[0]["id"]
-                    saved_stories.append(story_id)
-                    
-                    # Link to companies
-                    if company_slugs:
-                        await link_story_to_companies(story_id, company_slugs, company_name)
-                    elif company_name:
-                        await link_story_to_companies(story_id, [], company_name)
-                        
-            except Exception as e:
-                errors.append(f"Failed to save story '{story.get('title', 'Unknown')}': {str(e)}")
+            return StreamingResponse(progress_events(), media_type="application/x-ndjson")
         
-        return {
-            "message": f"Import completed. {len(saved_stories)} stories saved.",
-            "imported_count": len(saved_stories),
-            "error_count": len(errors),
-            "errors": errors[:10]  # Show first 10 errors
-        }
+        async for _ in csv_import.run():
+            pass
         
+        return csv_import.summary()
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/editor/import-jobs/{job_id}")
+async def get_import_job(job_id: str):
+    """Get progress of a background CSV import"""
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.status_report()
+
+@app.post("/editor/reference-data/refresh")
+async def refresh_reference_data():
+    """Tell the read services to reload categories, industries and company filters"""
+    # Those tables are edited directly in Supabase, so editors signal when they're done
+    publish_change(REFERENCE_CHANGED)
+    return {"success": True}
+
 @app.get("/editor/csv-template")
-def get_csv_template():
+async def get_csv_template():
     """Get CSV template for bulk import"""
     template_data = {
         "headers": [
@@ -478,75 +680,74 @@ def get_csv_template():
     
     return template_data
 
-async def link_story_to_companies(story_id: str, company_slugs: List[str], fallback_company_name: str = None):
+async def claim_submissions(submission_ids: List[str], changes: Dict[str, Any], reviewed_at: Optional[str] = None) -> set:
+    """Apply a review to the submissions that are still pending and return their ids.
+
+    The pending check is part of the UPDATE, so of two overlapping reviews
+    of one submission exactly one wins.
+    """
+    if not submission_ids:
+        return set()
+    result = await supabase.table("submissions").update({
+        **changes,
+        "reviewed_by": "admin",
+        "reviewed_at": reviewed_at or datetime.now().isoformat()
+    }).in_("id", submission_ids).eq("status", "pending").execute()
+    return {s["id"] for s in result.data}
+
+async def release_submissions(submission_ids: List[str]):
+    """Return claimed submissions whose story couldn't be saved to the pending queue"""
+    if not submission_ids:
+        return
+    try:
+        await supabase.table("submissions").update({
+            "status": "pending",
+            "reviewed_by": None,
+            "reviewed_at": None
+        }).in_("id", submission_ids).eq("status", "approved").execute()
+    except Exception as e:
+        print(f"Warning: Failed to release submissions {', '.join(submission_ids)}: {str(e)}")
+
+def reject_duplicate(title: str, summary: str, source_url: Optional[str]):
+    """Raise 409 if a story with the same source or near-identical text exists"""
+    duplicate = duplicate_index.find({"title": title, "summary": summary, "source_url": source_url})
+    if duplicate:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Story looks like a duplicate; resend with allow_duplicate to publish anyway", **duplicate}
+        )
+
+async def link_story_to_companies(story_id: str, company_slugs: List[str], fallback_company_name: str = None) -> List[str]:
     """Link a story to companies by slug, create company if needed"""
+    companies_to_link = []
     try:
-        companies_to_link = []
-        
-        # Find existing companies
-        if company_slugs:
-            companies_result = supabase.table("companies").select("id, slug").in_("slug", company_slugs).execute()
-            companies_to_link = companies_result.data
-            
-            # Check if any company slugs are missing
-            found_slugs = [c["slug"] for c in companies_to_link]
-            missing_slugs = [slug for slug in company_slugs if slug not in found_slugs]
-            
-            # Create missing companies (basic entries)
-            for slug in missing_slugs:
-                company_name = slug.replace("-", " ").title()
-                company_data = {
-                    "name": company_name,
-                    "slug": slug,
-                    "company_type": "startup",
-                    "status": "active"
-                }
-                
-                result = supabase.table("companies").insert(company_data).execute()
-                if result.data:
-                    companies_to_link.append({"id": result.data[0]["id"], "slug": slug})
-        
-        # If no slugs provided but have company name, try to create/find company
-        elif fallback_company_name:
+        # Explicit slugs win; otherwise fall back to the submitted company name
+        wanted = {slug: slug.replace("-", " ").title() for slug in company_slugs}
+        if not wanted and fallback_company_name:
             slug = generate_slug(fallback_company_name)
-            
-            # Check if company exists
-            existing = supabase.table("companies").select("id, slug").eq("slug", slug).execute()
-            
-            if existing.data:
-                companies_to_link = existing.data
-            else:
-                # Create new company
-                company_data = {
-                    "name": fallback_company_name,
-                    "slug": slug,
-                    "company_type": "startup",
-                    "status": "active"
+            if slug:
+                wanted[slug] = fallback_company_name
+        
+        # Cached ids first; unknown slugs are looked up (or created) in one batch
+        slug_ids, _ = await company_ids.resolve(supabase, wanted)
+        companies_to_link = [{"id": slug_ids[slug], "slug": slug} for slug in wanted if slug in slug_ids]
+        
+        # Create story-company links in one insert
+        if companies_to_link:
+            await supabase.table("story_companies").insert([
+                {
+                    "story_id": story_id,
+                    "company_id": company["id"],
+                    "relevance_score": 1.0
                 }
-                
-                result = supabase.table("companies").insert(company_data).execute()
-                if result.data:
-                    companies_to_link = [{"id": result.data[0]["id"], "slug": slug}]
-        
-        # Create story-company links
-        for company in companies_to_link:
-            supabase.table("story_companies").insert({
-                "story_id": story_id,
-                "company_id": company["id"],
-                "relevance_score": 1.0
-            }).execute()
+                for company in companies_to_link
+            ]).execute()
             
     except Exception as e:
         # Don't fail the main operation if linking fails
         print(f"Warning: Failed to link story to companies: {str(e)}")
-
-def generate_slug(name: str) -> str:
-    """Generate URL-safe slug from company name"""
-    import re
-    slug = name.lower()
-    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
-    slug = re.sub(r'[\s-]+', '-', slug)
-    return slug.strip('-')
+    
+    return [company["slug"] for company in companies_to_link]
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8002)))
@@ -0,0 +1,165 @@
+import asyncio
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+from events import COMPANY_CREATED
+from invalidation import publish_change
+
+SLUG_INVALID_RE = re.compile(r'[^a-z0-9\s-]')
+SLUG_SEPARATOR_RE = re.compile(r'[\s-]+')
+
+# Slugs per IN (...) lookup, kept short for URL length
+SLUG_LOOKUP_CHUNK_SIZE = 200
+CREATE_CHUNK_SIZE = 500
+
+
+def generate_slug(name: str) -> str:
+    """Generate URL-safe slug from company name"""
+    slug = name.lower()
+    slug = SLUG_INVALID_RE.sub('', slug)
+    slug = SLUG_SEPARATOR_RE.sub('-', slug)
+    return slug.strip('-')
+
+
+class CompanyResolver:
+    """Slug -> company id map, warmed at startup and filled in as companies are created.
+
+    Slugs never change once created, so ids are cached for the life of the
+    process. Concurrent resolves of the same unknown slug share one lookup,
+    and companies are created with an upsert on slug, so two approvals
+    naming the same new startup end up linked to a single company.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, str] = {}
+        self._slugs: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.ready = False
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.created = 0
+
+    async def warm(self, supabase, batch_size: int = 1000):
+        """Load every existing company's slug and id"""
+        start = 0
+        while True:
+            result = await supabase.table("companies").select("id, slug").order("id").range(start, start + batch_size - 1).execute()
+            self._remember({c["slug"]: c["id"] for c in result.data})
+            if len(result.data) < batch_size:
+                break
+            start += batch_size
+        self.ready = True
+
+    async def resolve(self, supabase, wanted: Dict[str, str]) -> Tuple[Dict[str, str], int]:
+        """Map every slug in wanted (slug -> display name) to a company id, creating missing ones.
+
+        Returns the slug -> id map and how many companies this call created.
+        """
+        slug_ids: Dict[str, str] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        owned: Dict[str, asyncio.Future] = {}
+        for slug in wanted:
+            if slug in self._ids:
+                self.hits += 1
+                slug_ids[slug] = self._ids[slug]
+            elif slug in self._inflight:
+                self.collapsed += 1
+                waiting[slug] = self._inflight[slug]
+            else:
+                self.misses += 1
+                owned[slug] = self._inflight[slug] = asyncio.get_running_loop().create_future()
+
+        created = 0
+        if owned:
+            try:
+                fetched, created = await self._fetch_or_create(supabase, {slug: wanted[slug] for slug in owned})
+            except BaseException as e:
+                # Fail (or, if this caller was cancelled, cancel) everyone waiting on these slugs
+                for slug, future in owned.items():
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                        # Nobody else may be waiting; don't warn about an unretrieved exception
+                        future.exception()
+                    else:
+                        future.cancel()
+                    del self._inflight[slug]
+                raise
+            self._remember(fetched)
+            for slug, future in owned.items():
+                future.set_result(fetched.get(slug))
+                del self._inflight[slug]
+            slug_ids.update(fetched)
+
+        for slug, future in waiting.items():
+            # Shielded so a cancelled waiter doesn't cancel the shared lookup
+            company_id = await asyncio.shield(future)
+            if company_id:
+                slug_ids[slug] = company_id
+
+        return slug_ids, created
+
+    def slugs_for(self, company_ids: Iterable[str]) -> List[str]:
+        """Get the known slugs of the given company ids"""
+        return [self._slugs[company_id] for company_id in company_ids if company_id in self._slugs]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size and hit counters"""
+        return {
+            "ready": self.ready,
+            "slugs": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "created": self.created,
+        }
+
+    def _remember(self, slug_ids: Dict[str, str]):
+        for slug, company_id in slug_ids.items():
+            self._ids.setdefault(slug, company_id)
+            self._slugs.setdefault(company_id, slug)
+
+    async def _fetch_or_create(self, supabase, wanted: Dict[str, str]) -> Tuple[Dict[str, str], int]:
+        slug_ids: Dict[str, str] = {}
+        slugs = list(wanted)
+        for batch in _chunks(slugs, SLUG_LOOKUP_CHUNK_SIZE):
+            result = await supabase.table("companies").select("id, slug").in_("slug", batch).execute()
+            slug_ids.update({c["slug"]: c["id"] for c in result.data})
+
+        missing = [slug for slug in slugs if slug not in slug_ids]
+        created = 0
+        for batch in _chunks(missing, CREATE_CHUNK_SIZE):
+            # ignore_duplicates covers companies created concurrently by another process
+            result = await supabase.table("companies").upsert(
+                [
+                    {"name": wanted[slug], "slug": slug, "company_type": "startup", "status": "active"}
+                    for slug in batch
+                ],
+                on_conflict="slug",
+                ignore_duplicates=True
+            ).execute()
+            created += len(result.data)
+            slug_ids.update({c["slug"]: c["id"] for c in result.data})
+            if result.data:
+                publish_change(
+                    COMPANY_CREATED,
+                    company_slugs=[c["slug"] for c in result.data],
+                    company_ids=[c["id"] for c in result.data]
+                )
+        self.created += created
+
+        # Pick up any that lost the race above
+        raced = [slug for slug in missing if slug not in slug_ids]
+        for batch in _chunks(raced, SLUG_LOOKUP_CHUNK_SIZE):
+            result = await supabase.table("companies").select("id, slug").in_("slug", batch).execute()
+            slug_ids.update({c["slug"]: c["id"] for c in result.data})
+
+        return slug_ids, created
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Shared by the API handlers and the CSV importer
+company_ids = CompanyResolver()
@@ -0,0 +1,25 @@
+import os
+import httpx
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+
+supabase_url = os.environ.get("SUPABASE_URL", "")
+supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE", "")
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the pooled keep-alive HTTP client shared by every PostgREST call"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.environ.get("DB_POOL_SIZE", 20)),
+            max_keepalive_connections=int(os.environ.get("DB_POOL_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.environ.get("DB_KEEPALIVE_EXPIRY", 30)),
+        ),
+        timeout=httpx.Timeout(float(os.environ.get("DB_TIMEOUT", 10))),
+    )
+
+
+async def connect(http_client: httpx.AsyncClient) -> AsyncClient:
+    """Create an async Supabase client that multiplexes over http_client"""
+    options = AsyncClientOptions(httpx_client=http_client)
+    return await acreate_client(supabase_url, supabase_key, options=options)
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from array import array
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from has in is it its of on or that the to was were will with".split())
+
+# MinHash signatures over the word set of title + summary, bucketed with LSH:
+# stories are only compared when all ROWS values of some band agree, which
+# happens with probability 1 - (1 - J**ROWS)**BANDS for Jaccard similarity J.
+BANDS = 16
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+DUPLICATE_THRESHOLD = float(os.environ.get("DUPLICATE_THRESHOLD", 0.6))
+
+# Texts shorter than this collide too easily to compare usefully
+MIN_TOKENS = 6
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+# Fixed seed: signatures must be comparable across restarts and processes
+_rng = random.Random(1)
+PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|ref)$")
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """Canonicalize a source URL so trivially different links compare equal"""
+    if not url or not url.strip():
+        return None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, ""))
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def minhash(text: str) -> Optional[array]:
+    """MinHash signature of a text's distinct words, or None if it is too short to compare"""
+    tokens = {t for t in WORD_RE.findall(text.lower()) if t not in STOPWORDS}
+    if len(tokens) < MIN_TOKENS:
+        return None
+    hashes = [_digest(t) for t in tokens]
+    return array("I", (min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in PERMUTATIONS))
+
+
+def story_signature(story: Dict[str, Any]) -> Optional[array]:
+    """MinHash signature of a story's title and summary"""
+    return minhash(f"{story.get('title') or ''} {story.get('summary') or ''}")
+
+
+class DuplicateIndex:
+    """In-memory near-duplicate index over story title + summary and source URL"""
+
+    def __init__(self, loader: Optional[Callable[[], AsyncIterator[List[Dict[str, Any]]]]] = None):
+        self.loader = loader
+        self.ready = False
+        self._signatures: Dict[str, array] = {}
+        self._bands: List[Dict[tuple, Set[str]]] = [{} for _ in range(BANDS)]
+        self._url_owner: Dict[int, str] = {}
+        self._story_url: Dict[str, int] = {}
+        # Pages are signed in a worker thread while writes keep landing
+        self._lock = threading.RLock()
+        self._task = None
+        self.last_build_ms = 0.0
+
+    def start(self):
+        """Start loading existing stories in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._build())
+
+    async def stop(self):
+        """Stop the background load"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _build(self):
+        started = time.perf_counter()
+        try:
+            async for page in self.loader():
+                await asyncio.to_thread(lambda: [self.add(story) for story in page])
+        except Exception as e:
+            print(f"Warning: Failed to build duplicate index: {str(e)}")
+            return
+        self.ready = True
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+    def add(self, story: Dict[str, Any], signature: Optional[array] = None):
+        """Index (or re-index) one story, reusing its signature if already computed"""
+        story_id = str(story["id"])
+        if signature is None:
+            signature = story_signature(story)
+        url = normalize_url(story.get("source_url"))
+        with self._lock:
+            self.remove(story_id)
+            if signature is not None:
+                self._signatures[story_id] = signature
+                for band, buckets in zip(self._band_keys(signature), self._bands):
+                    buckets.setdefault(band, set()).add(story_id)
+            if url:
+                url_hash = _digest(url)
+                self._url_owner.setdefault(url_hash, story_id)
+                self._story_url[story_id] = url_hash
+
+    def remove(self, story_id: str):
+        """Drop a story from the index"""
+        with self._lock:
+            signature = self._signatures.pop(story_id, None)
+            if signature is not None:
+                for band, buckets in zip(self._band_keys(signature), self._bands):
+                    bucket = buckets.get(band)
+                    if bucket is not None:
+                        bucket.discard(story_id)
+                        if not bucket:
+                            del buckets[band]
+            url_hash = self._story_url.pop(story_id, None)
+            if url_hash is not None and self._url_owner.get(url_hash) == story_id:
+                del self._url_owner[url_hash]
+
+    def find(self, story: Dict[str, Any], signature: Optional[array] = None) -> Optional[Dict[str, Any]]:
+        """Get the closest indexed duplicate of story, if any.
+
+        Returns {"story_id", "reason", "similarity"}, where reason is
+        "source_url" for an exact link match or "similar_text" for an
+        estimated word overlap of at least DUPLICATE_THRESHOLD. A match
+        against the story's own id is ignored.
+        """
+        own_id = str(story["id"]) if story.get("id") else None
+        url = normalize_url(story.get("source_url"))
+        if signature is None:
+            signature = story_signature(story)
+        with self._lock:
+            if url:
+                owner = self._url_owner.get(_digest(url))
+                if owner and owner != own_id:
+                    return {"story_id": owner, "reason": "source_url", "similarity": 1.0}
+            if signature is None:
+                return None
+
+            candidates = set()
+            for band, buckets in zip(self._band_keys(signature), self._bands):
+                candidates.update(buckets.get(band, ()))
+            candidates.discard(own_id)
+
+            best = None
+            for candidate in candidates:
+                # Fraction of agreeing positions estimates the Jaccard similarity
+                similarity = sum(map(int.__eq__, signature, self._signatures[candidate])) / NUM_PERM
+                if similarity >= DUPLICATE_THRESHOLD and (best is None or similarity > best[1]):
+                    best = (candidate, similarity)
+            if best is None:
+                return None
+            return {"story_id": best[0], "reason": "similar_text", "similarity": round(best[1], 2)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Get index size and build timing"""
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "signatures": len(self._signatures),
+                "urls": len(self._url_owner),
+                "last_build_ms": round(self.last_build_ms, 2),
+            }
+
+    @staticmethod
+    def _band_keys(signature: array) -> List[tuple]:
+        return [tuple(signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
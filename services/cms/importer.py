@@ -0,0 +1,350 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterable, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from companies import company_ids, generate_slug
+from dedupe import DuplicateIndex, story_signature
+from invalidation import publish_change
+from events import STORY_CREATED
+
+REQUIRED_FIELDS = ['title', 'summary', 'category']
+
+# Rows per INSERT request
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 500))
+
+# Error messages kept for the report; the count keeps going past this
+MAX_REPORTED_ERRORS = 1000
+PREVIEW_ROWS = 5
+
+
+def parse_row(row: Dict[str, str], story_id: Optional[str] = None) -> Dict[str, Any]:
+    """Clean and validate one CSV row into a story record"""
+    title = (row.get('title') or '').strip()
+    summary = (row.get('summary') or '').strip()
+    category = (row.get('category') or 'general').strip()
+
+    if not title or not summary:
+        raise ValueError("Title and summary are required")
+
+    # Process tags
+    tags_str = (row.get('tags') or '').strip()
+    try:
+        tags = json.loads(tags_str) if tags_str else []
+    except ValueError:
+        tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
+
+    # Process company slugs
+    company_slugs_str = (row.get('company_slugs') or '').strip()
+    company_slugs = [slug.strip() for slug in company_slugs_str.split(',') if slug.strip()]
+
+    # Parse published date
+    published_date_str = (row.get('published_date') or '').strip()
+    try:
+        published_date = datetime.fromisoformat(published_date_str.replace('Z', '+00:00')) if published_date_str else datetime.now()
+    except ValueError:
+        published_date = datetime.now()
+
+    return {
+        "id": story_id or str(uuid.uuid4()),
+        "title": title,
+        "summary": summary,
+        "content": (row.get('content') or '').strip() or None,
+        "category": category,
+        "tags": tags,
+        "source_url": (row.get('source_url') or '').strip() or None,
+        "image_url": (row.get('image_url') or '').strip() or None,
+        "status": (row.get('status') or 'published').strip(),
+        "created_by": "csv_import",
+        "published_date": published_date.isoformat(),
+        "company_slugs": company_slugs,
+        "company_name": (row.get('company_name') or '').strip() or None
+    }
+
+
+def wanted_companies(story: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(slug, name) pairs a story should be linked to, same rules as link_story_to_companies"""
+    if story["company_slugs"]:
+        return [(slug, slug.replace("-", " ").title()) for slug in dict.fromkeys(story["company_slugs"])]
+    if story["company_name"]:
+        slug = generate_slug(story["company_name"])
+        return [(slug, story["company_name"])] if slug else []
+    return []
+
+
+def chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def row_error(error: Exception) -> bool:
+    """Whether a write was refused for the rows it carried (bad value or constraint)
+    rather than failing at the database or on the way to it"""
+    # SQLSTATE class 22 is data exceptions, 23 integrity constraint violations
+    return isinstance(error, APIError) and str(error.code or "")[:2] in ("22", "23")
+
+
+async def insert_isolated(supabase, table: str, rows: List[Dict], idempotent: bool = False) -> Tuple[List[Dict], List[Tuple[Dict, str]]]:
+    """Insert rows in one request, splitting the batch to isolate bad rows on failure.
+
+    With idempotent set, rows that already exist are skipped instead of
+    failing, so a replayed chunk is harmless. Returns the inserted rows and
+    (row, error) pairs for the ones that failed. Anything other than a
+    row-level error (timeouts, connection errors, outages) is raised: no
+    half of the batch would fare better, and a timed-out insert may have
+    committed.
+    """
+    if not rows:
+        return [], []
+    try:
+        if idempotent:
+            await supabase.table(table).upsert(rows, ignore_duplicates=True, returning=ReturnMethod.minimal).execute()
+        else:
+            await supabase.table(table).insert(rows, returning=ReturnMethod.minimal).execute()
+        return rows, []
+    except Exception as e:
+        if not row_error(e):
+            raise
+        if len(rows) == 1:
+            return [], [(rows[0], str(e))]
+
+    middle = len(rows) // 2
+    left_ok, left_failed = await insert_isolated(supabase, table, rows[:middle], idempotent)
+    right_ok, right_failed = await insert_isolated(supabase, table, rows[middle:], idempotent)
+    return left_ok + right_ok, left_failed + right_failed
+
+
+async def save_stories(
+    supabase,
+    stories: List[Dict[str, Any]],
+    chunk_size: Optional[int] = None,
+    slug_ids: Optional[Dict[str, str]] = None,
+    idempotent: bool = False
+) -> Dict[str, Any]:
+    """Persist parsed stories and their company links in batches.
+
+    slug_ids carries already-resolved companies between calls and is
+    updated in place.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    slug_ids = slug_ids if slug_ids is not None else {}
+    errors = []
+
+    # One bulk lookup (and at most one bulk create) for every new company in the batch
+    wanted: Dict[str, str] = {}
+    for story in stories:
+        for slug, name in wanted_companies(story):
+            if slug not in slug_ids:
+                wanted.setdefault(slug, name)
+    companies_created = 0
+    if wanted:
+        resolved, companies_created = await company_ids.resolve(supabase, wanted)
+        slug_ids.update(resolved)
+    id_slugs = {company_id: slug for slug, company_id in slug_ids.items()}
+
+    saved_ids = []
+    categories = set()
+    linked_slugs = set()
+    for batch in chunks(stories, chunk_size):
+        rows = [{k: v for k, v in story.items() if k not in ("company_slugs", "company_name")} for story in batch]
+        inserted, failed = await insert_isolated(supabase, "stories", rows, idempotent)
+        for row, error in failed:
+            errors.append(f"Failed to save story '{row.get('title', 'Unknown')}': {error}")
+
+        inserted_ids = {row["id"] for row in inserted}
+        links = []
+        for story in batch:
+            if story["id"] not in inserted_ids:
+                continue
+            saved_ids.append(story["id"])
+            categories.add(story["category"])
+            for slug, _ in wanted_companies(story):
+                if slug in slug_ids:
+                    links.append({"story_id": story["id"], "company_id": slug_ids[slug], "relevance_score": 1.0})
+
+        linked, failed_links = await insert_isolated(supabase, "story_companies", links, idempotent)
+        linked_slugs.update(id_slugs[link["company_id"]] for link in linked)
+        for link, error in failed_links:
+            # Don't fail the story if linking fails
+            print(f"Warning: Failed to link story to companies: {error}")
+
+    return {
+        "saved_ids": saved_ids,
+        "categories": categories,
+        "linked_slugs": linked_slugs,
+        "companies_created": companies_created,
+        "errors": errors
+    }
+
+
+def open_csv(upload: BinaryIO) -> csv.DictReader:
+    """Read CSV rows straight from the uploaded file without loading it whole"""
+    return csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8', newline=''))
+
+
+class CsvImport:
+    """Incremental CSV import: parse a chunk, save it, report progress, repeat.
+
+    The next chunk is parsed in a worker thread while the current one is
+    being written, so at most two chunks of rows are held at a time.
+
+    For resumable runs, pass the number of rows already committed (they
+    must have been consumed from reader already) and an id_namespace. Story
+    ids are then derived from the row number, so a chunk replayed after a
+    crash does not insert duplicates.
+
+    Rows that look like an existing story (per the duplicates index) or an
+    earlier row of the same file are reported, and skipped unless
+    skip_duplicates is off.
+    """
+
+    def __init__(
+        self,
+        supabase,
+        reader: csv.DictReader,
+        dry_run: bool = False,
+        chunk_size: Optional[int] = None,
+        rows_committed: int = 0,
+        id_namespace: Optional[uuid.UUID] = None,
+        duplicates: Optional[DuplicateIndex] = None,
+        skip_duplicates: bool = True
+    ):
+        self.supabase = supabase
+        self.reader = reader
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+        self.id_namespace = id_namespace
+        self.duplicates = duplicates
+        self.skip_duplicates = skip_duplicates
+        self.rows_processed = rows_committed
+        self.rows_committed = rows_committed
+        self.valid_rows = 0
+        self.saved_count = 0
+        self.companies_created = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+        self.preview: List[Dict[str, Any]] = []
+        self.duplicate_count = 0
+        self.duplicate_report: List[Dict[str, Any]] = []
+        self.slug_ids: Dict[str, str] = {}
+        self._exhausted = False
+        # Rows of this file not yet saved (all of them on a dry run), by id -> line
+        self._unsaved = DuplicateIndex()
+        self._unsaved_lines: Dict[str, int] = {}
+
+    async def run(self) -> AsyncIterator[Dict[str, Any]]:
+        """Process the file chunk by chunk, yielding progress after each"""
+        pending = asyncio.create_task(asyncio.to_thread(self._parse_chunk))
+        while pending:
+            stories, rows_read = await pending
+            pending = None if self._exhausted else asyncio.create_task(asyncio.to_thread(self._parse_chunk))
+
+            if self.dry_run:
+                self.preview.extend(stories[:PREVIEW_ROWS - len(self.preview)])
+            elif stories:
+                await self._save(stories)
+            self.rows_committed += rows_read
+            if rows_read:
+                yield self.progress()
+
+    async def _save(self, stories: List[Dict[str, Any]]):
+        saved = await save_stories(self.supabase, stories, self.chunk_size, self.slug_ids, self.id_namespace is not None)
+        self.saved_count += len(saved["saved_ids"])
+        self.companies_created += saved["companies_created"]
+        for error in saved["errors"]:
+            self._error(error)
+        publish_change(STORY_CREATED, saved["saved_ids"], saved["categories"], saved["linked_slugs"])
+        await asyncio.to_thread(self._index_saved, stories, set(saved["saved_ids"]))
+
+    def _index_saved(self, stories: List[Dict[str, Any]], saved_ids: set):
+        # Saved rows are now matched through the shared index instead
+        for story in stories:
+            if self.duplicates is not None and story["id"] in saved_ids:
+                self.duplicates.add(story)
+            self._unsaved.remove(story["id"])
+            self._unsaved_lines.pop(story["id"], None)
+
+    def _parse_chunk(self) -> Tuple[List[Dict[str, Any]], int]:
+        stories = []
+        rows_read = 0
+        for row in self.reader:
+            rows_read += 1
+            self.rows_processed += 1
+            story_id = str(uuid.uuid5(self.id_namespace, str(self.rows_processed))) if self.id_namespace else None
+            try:
+                story = parse_row(row, story_id)
+            except Exception as e:
+                # Header is line 1
+                self._error(f"Row {self.rows_processed + 1}: {str(e)}")
+                continue
+            signature = story_signature(story)
+            if self._check_duplicate(story, signature) and self.skip_duplicates:
+                continue
+            self._unsaved.add(story, signature)
+            self._unsaved_lines[story["id"]] = self.rows_processed + 1
+            stories.append(story)
+            if len(stories) == self.chunk_size:
+                break
+        else:
+            self._exhausted = True
+        self.valid_rows += len(stories)
+        return stories, rows_read
+
+    def _check_duplicate(self, story: Dict[str, Any], signature) -> bool:
+        duplicate = self.duplicates.find(story, signature) if self.duplicates is not None else None
+        if duplicate is None:
+            duplicate = self._unsaved.find(story, signature)
+            if duplicate is not None:
+                duplicate["duplicate_of_row"] = self._unsaved_lines.get(duplicate.pop("story_id"))
+        else:
+            duplicate["duplicate_of"] = duplicate.pop("story_id")
+        if duplicate is None:
+            return False
+
+        self.duplicate_count += 1
+        if len(self.duplicate_report) < MAX_REPORTED_ERRORS:
+            self.duplicate_report.append({"row": self.rows_processed + 1, "title": story["title"], **duplicate})
+        return True
+
+    def _error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def progress(self) -> Dict[str, Any]:
+        """Get rows processed so far"""
+        return {
+            "rows_processed": self.rows_committed,
+            "rows_saved": self.saved_count,
+            "error_count": self.error_count,
+            "duplicate_count": self.duplicate_count
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Get the final import (or dry-run preview) report"""
+        if self.dry_run:
+            return {
+                "dry_run": True,
+                "total_rows": self.valid_rows,
+                "preview": self.preview,
+                "error_count": self.error_count,
+                "errors": self.errors,
+                "duplicate_count": self.duplicate_count,
+                "duplicates": self.duplicate_report
+            }
+        return {
+            "message": f"Import completed. {self.saved_count} stories saved.",
+            "imported_count": self.saved_count,
+            "rows_processed": self.rows_processed,
+            "companies_created": self.companies_created,
+            "error_count": self.error_count,
+            "errors": self.errors[:10],  # Show first 10 errors
+            "duplicate_count": self.duplicate_count,
+            "duplicates_skipped": self.skip_duplicates,
+            "duplicates": self.duplicate_report[:10]
+        }
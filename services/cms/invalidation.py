@@ -0,0 +1,31 @@
+import asyncio
+from typing import Iterable, Optional
+from events import ChangeEvent, bus_from_env
+
+# Change events for the feed and timeline services; EVENT_BUS picks the transport
+bus = bus_from_env()
+_pending = set()
+
+
+def publish_change(
+    event_type: str,
+    story_ids: Iterable[Optional[str]] = (),
+    categories: Iterable[Optional[str]] = (),
+    company_slugs: Iterable[Optional[str]] = (),
+    company_ids: Iterable[Optional[str]] = ()
+):
+    """Tell the read services what a write touched"""
+    event = ChangeEvent(event_type, story_ids, categories, company_ids, company_slugs)
+    if event.is_empty():
+        return
+
+    # Fire and forget so editor writes never wait on the read services
+    task = asyncio.create_task(bus.publish(event))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def drain():
+    """Wait for in-flight events, then close the bus"""
+    await asyncio.gather(*_pending, return_exceptions=True)
+    await bus.close()
@@ -0,0 +1,283 @@
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, List, Optional
+from importer import REQUIRED_FIELDS, CsvImport, open_csv
+
+# Job state and uploaded files; point this at a volume so jobs survive restarts
+IMPORT_JOB_DIR = os.environ.get("IMPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "cms-import-jobs"))
+IMPORT_JOB_WORKERS = int(os.environ.get("IMPORT_JOB_WORKERS", 2))
+
+# Error messages kept on the job record
+MAX_JOB_ERRORS = 100
+
+UNFINISHED = ("queued", "running")
+
+
+class ImportJob:
+    """One background CSV import, persisted after every committed chunk"""
+
+    def __init__(self, job_id: str, filename: str, chunk_size: Optional[int] = None, skip_duplicates: bool = True):
+        self.id = job_id
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.skip_duplicates = skip_duplicates
+        self.status = "queued"
+        self.total_rows: Optional[int] = None
+        self.rows_committed = 0
+        self.rows_saved = 0
+        self.rows_failed = 0
+        self.companies_created = 0
+        self.duplicate_count = 0
+        self.errors: List[str] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Throughput is measured over the current run only, not across restarts
+        self._run_started: Optional[float] = None
+        self._run_start_rows = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ImportJob":
+        job = cls(data["id"], data["filename"], data.get("chunk_size"), data.get("skip_duplicates", True))
+        for field in ("status", "total_rows", "rows_committed", "rows_saved", "rows_failed",
+                      "companies_created", "duplicate_count", "errors", "error", "created_at", "started_at", "finished_at"):
+            if field in data:
+                setattr(job, field, data[field])
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "chunk_size": self.chunk_size,
+            "skip_duplicates": self.skip_duplicates,
+            "status": self.status,
+            "total_rows": self.total_rows,
+            "rows_committed": self.rows_committed,
+            "rows_saved": self.rows_saved,
+            "rows_failed": self.rows_failed,
+            "companies_created": self.companies_created,
+            "duplicate_count": self.duplicate_count,
+            "errors": self.errors,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def status_report(self) -> Dict[str, Any]:
+        """Get progress, throughput and ETA for the status endpoint"""
+        throughput = None
+        eta_seconds = None
+        if self.status == "running" and self._run_started is not None:
+            elapsed = time.monotonic() - self._run_started
+            done = self.rows_committed - self._run_start_rows
+            if elapsed > 0 and done > 0:
+                throughput = done / elapsed
+                if self.total_rows is not None:
+                    eta_seconds = max(self.total_rows - self.rows_committed, 0) / throughput
+        elif self.status == "completed" and self.started_at and self.finished_at > self.started_at:
+            throughput = self.rows_committed / (self.finished_at - self.started_at)
+            eta_seconds = 0
+
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "total_rows": self.total_rows,
+            "rows_done": self.rows_committed,
+            "rows_saved": self.rows_saved,
+            "rows_failed": self.rows_failed,
+            "companies_created": self.companies_created,
+            "duplicate_count": self.duplicate_count,
+            "throughput_rows_per_sec": round(throughput, 1) if throughput is not None else None,
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "errors": self.errors[:10],
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ImportJobQueue:
+    """Local queue of CSV import jobs drained by a fixed number of workers.
+
+    Each job's upload and state live in directory. The state file records
+    how many rows have been committed, so a job interrupted by a crash or
+    restart is re-queued on start and picks up after its last saved chunk.
+    """
+
+    def __init__(self, directory: str = IMPORT_JOB_DIR, workers: int = IMPORT_JOB_WORKERS):
+        self.directory = directory
+        self.workers = max(1, workers)
+        self.jobs: Dict[str, ImportJob] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._supabase = None
+        self._duplicates = None
+
+    async def start(self, supabase, duplicates=None):
+        """Reload persisted jobs, re-queue unfinished ones and start the workers"""
+        self._supabase = supabase
+        self._duplicates = duplicates
+        os.makedirs(self.directory, exist_ok=True)
+        for job in await asyncio.to_thread(self._load_jobs):
+            self.jobs[job.id] = job
+            if job.status in UNFINISHED:
+                job.status = "queued"
+                self._queue.put_nowait(job.id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; running jobs stay unfinished on disk and resume next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        upload: BinaryIO,
+        filename: str,
+        chunk_size: Optional[int] = None,
+        skip_duplicates: bool = True
+    ) -> ImportJob:
+        """Copy the upload next to the job state and queue it.
+
+        Raises ValueError if the CSV is missing required columns.
+        """
+        job = ImportJob(str(uuid.uuid4()), filename, chunk_size, skip_duplicates)
+        await asyncio.to_thread(self._store_upload, job, upload)
+        fieldnames = await asyncio.to_thread(self._read_header, job)
+        if not all(field in fieldnames for field in REQUIRED_FIELDS):
+            await asyncio.to_thread(self._remove_upload, job)
+            raise ValueError(f"CSV must contain these columns: {', '.join(REQUIRED_FIELDS)}")
+        await asyncio.to_thread(self._save, job)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize(), "jobs": counts}
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job and job.status in UNFINISHED:
+                    await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = time.time()
+                await asyncio.to_thread(self._save, job)
+                print(f"Warning: Import job {job.id} failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ImportJob):
+        job.status = "running"
+        job.started_at = job.started_at or time.time()
+        job._run_started = time.monotonic()
+        job._run_start_rows = job.rows_committed
+        if job.total_rows is None:
+            job.total_rows = await asyncio.to_thread(self._count_rows, job)
+        await asyncio.to_thread(self._save, job)
+
+        # Totals from earlier runs; this run's counters are added on top
+        base_saved, base_failed, base_created = job.rows_saved, job.rows_failed, job.companies_created
+        base_duplicates = job.duplicate_count
+        base_errors = list(job.errors)
+
+        with open(self._upload_path(job), "rb") as upload:
+            reader = open_csv(upload)
+            # Skip what earlier runs already committed (itertools "consume" recipe)
+            await asyncio.to_thread(lambda: next(itertools.islice(reader, job.rows_committed, job.rows_committed), None))
+            csv_import = CsvImport(
+                self._supabase,
+                reader,
+                chunk_size=job.chunk_size,
+                rows_committed=job.rows_committed,
+                id_namespace=uuid.UUID(job.id),
+                duplicates=self._duplicates,
+                skip_duplicates=job.skip_duplicates
+            )
+            async for _ in csv_import.run():
+                job.rows_committed = csv_import.rows_committed
+                job.rows_saved = base_saved + csv_import.saved_count
+                job.rows_failed = base_failed + csv_import.error_count
+                job.companies_created = base_created + csv_import.companies_created
+                job.duplicate_count = base_duplicates + csv_import.duplicate_count
+                job.errors = (base_errors + csv_import.errors)[:MAX_JOB_ERRORS]
+                await asyncio.to_thread(self._save, job)
+
+        job.status = "completed"
+        job.finished_at = time.time()
+        await asyncio.to_thread(self._save, job)
+        await asyncio.to_thread(self._remove_upload, job)
+
+    def _upload_path(self, job: ImportJob) -> str:
+        return os.path.join(self.directory, f"{job.id}.csv")
+
+    def _state_path(self, job: ImportJob) -> str:
+        return os.path.join(self.directory, f"{job.id}.json")
+
+    def _store_upload(self, job: ImportJob, upload: BinaryIO):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._upload_path(job), "wb") as f:
+            shutil.copyfileobj(upload, f)
+
+    def _read_header(self, job: ImportJob) -> List[str]:
+        with open(self._upload_path(job), "rb") as upload:
+            return open_csv(upload).fieldnames or []
+
+    def _save(self, job: ImportJob):
+        # Write-then-rename so a crash never leaves a half-written state file
+        path = self._state_path(job)
+        with open(path + ".tmp", "w") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(path + ".tmp", path)
+
+    def _remove_upload(self, job: ImportJob):
+        try:
+            os.remove(self._upload_path(job))
+        except OSError:
+            pass
+
+    def _count_rows(self, job: ImportJob) -> int:
+        with open(self._upload_path(job), "rb") as upload:
+            return sum(1 for _ in open_csv(upload))
+
+    def _load_jobs(self) -> List[ImportJob]:
+        jobs = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    job = ImportJob.from_dict(json.load(f))
+            except Exception as e:
+                print(f"Warning: Skipping unreadable import job {name}: {str(e)}")
+                continue
+            if job.status in UNFINISHED and not os.path.exists(self._upload_path(job)):
+                job.status = "failed"
+                job.error = "Uploaded file is missing"
+            jobs.append(job)
+        return jobs
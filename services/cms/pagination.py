@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from typing import Any, Dict, List, Optional, Tuple
+
+Cursor = Tuple[str, str]
+
+
+def encode_cursor(row: Dict[str, Any], sort_column: str) -> Optional[str]:
+    """Build an opaque keyset cursor pointing just past row"""
+    if row.get(sort_column) is None:
+        return None
+    payload = json.dumps([row[sort_column], str(row["id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Decode an opaque cursor into its (sort value, id) pair"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Values end up inside a PostgREST filter string, so keep them plain
+    for part in (value, row_id):
+        if not isinstance(part, str) or any(c in part for c in '"\\()'):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, row_id
+
+
+async def paginate(query, sort_column: str, page: int, limit: int, after: Optional[Cursor] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Fetch one page ordered by (sort_column, id) descending.
+
+    With a cursor the page is selected by keyset, otherwise by offset. One
+    extra row is requested so has_more/next_cursor are exact.
+    """
+    query = query.order(sort_column, desc=True).order("id", desc=True)
+
+    if after:
+        value, row_id = after
+        query = query.or_(
+            f'{sort_column}.lt."{value}",and({sort_column}.eq."{value}",id.lt."{row_id}")'
+        )
+        result = await query.limit(limit + 1).execute()
+    else:
+        start = (page - 1) * limit
+        result = await query.range(start, start + limit).execute()
+
+    rows = result.data[:limit]
+    next_cursor = encode_cursor(rows[-1], sort_column) if len(result.data) > limit else None
+    return rows, next_cursor
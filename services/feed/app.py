@@ -1,10 +1,25 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import os
-from supabase import create_client, Client
+import asyncio
+from supabase import AsyncClient
 import uvicorn
+import uuid
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
+from cache import ResponseCache, SingleFlight
+from pagination import decode_cursor, paginate
+from fields import CARD_FIELDS, LIST_FIELDS, parse_fields, project
+from responses import EncodedBody, json_response
+from counters import EngagementBuffer
+from trending import TIMEFRAMES, TrendingEngine
+from search import SearchIndex, tokenize
+from reference import ReferenceData
+from stream import StoryStream
+from snapshots import SnapshotGenerator, SnapshotStore
+from events import COMPANY_CREATED, REFERENCE_CHANGED, STORY_CREATED, SOCKET_DIR, ChangeEvent, bus_from_env
+import db
 
 app = FastAPI(title="Feed Service", version="1.0.0")
 
@@ -16,39 +31,225 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Supabase connection
-supabase_url = os.environ.get("SUPABASE_URL", "")
-supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE", "")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Supabase connection, opened on startup over a pooled keep-alive HTTP client
+http_client = db.create_http_client()
+supabase: AsyncClient = None
+
+internal_token = os.environ.get("INTERNAL_API_TOKEN", "")
+
+# Read-through cache for GET /stories, keyed on the normalized filter tuple
+stories_cache = ResponseCache(
+    max_entries=int(os.environ.get("FEED_CACHE_MAX_ENTRIES", 512)),
+    ttl=float(os.environ.get("FEED_CACHE_TTL", 30)),
+    stale_ttl=float(os.environ.get("FEED_CACHE_STALE_TTL", 120)),
+)
+
+# Identical uncached queries in flight at the same time share one round trip
+flight = SingleFlight()
+
+async def flush_engagement(rows: List[Dict[str, Any]]):
+    """Apply coalesced like/view deltas in one atomic server-side update"""
+    await supabase.rpc("increment_story_counters", {"deltas": rows}).execute()
+
+# Write-behind like/view counters, flushed on a timer or when the buffer fills up
+engagement = EngagementBuffer(
+    flush_engagement,
+    flush_interval=float(os.environ.get("ENGAGEMENT_FLUSH_INTERVAL", 2)),
+    max_pending=int(os.environ.get("ENGAGEMENT_MAX_PENDING", 1000)),
+    max_backlog=int(os.environ.get("ENGAGEMENT_MAX_BACKLOG", 50000)),
+)
+
+async def load_trending_stories() -> List[Dict[str, Any]]:
+    """Load every published story inside the widest trending window"""
+    since = datetime.now() - timedelta(days=30)
+    stories = []
+    batch_size = 1000
+    start = 0
+    while True:
+        result = await supabase.table("stories").select(f"""
+            {", ".join(sorted(LIST_FIELDS))},
+            story_companies(
+                companies(name, slug, industry, logo_url)
+            )
+        """).eq("status", "published").gte(
+            "published_date", since.isoformat()
+        ).order("published_date", desc=True).order("id", desc=True).range(start, start + batch_size - 1).execute()
+        stories.extend(format_story(story) for story in result.data)
+        if len(result.data) < batch_size:
+            return stories
+        start += batch_size
+
+# Decay-weighted day/week/month leaderboards, rebuilt in the background
+trending = TrendingEngine(
+    load_trending_stories,
+    pending=engagement.pending,
+    refresh_interval=float(os.environ.get("TRENDING_REFRESH_INTERVAL", 60)),
+)
+
+async def load_search_documents() -> List[Dict[str, Any]]:
+    """Load the indexed fields of every published story"""
+    documents = []
+    batch_size = 1000
+    start = 0
+    while True:
+        result = await supabase.table("stories").select("""
+            id, title, summary, tags, category, published_date,
+            story_companies(
+                companies(slug, industry)
+            )
+        """).eq("status", "published").order("id").range(start, start + batch_size - 1).execute()
+        documents.extend(format_story(story) for story in result.data)
+        if len(result.data) < batch_size:
+            return documents
+        start += batch_size
+
+# Inverted index for ?search=, built at startup and patched from CMS writes
+search_index = SearchIndex(
+    load_search_documents,
+    rebuild_interval=float(os.environ.get("SEARCH_REBUILD_INTERVAL", 600)),
+)
+
+async def load_reference_data() -> Dict[str, List[Dict[str, Any]]]:
+    """Load the category and industry lookup tables"""
+    categories, industries = await asyncio.gather(
+        supabase.table("categories").select("*").order("sort_order").execute(),
+        supabase.table("industries").select("*").order("sort_order").execute(),
+    )
+    return {"categories": categories.data, "industries": industries.data}
+
+# Categories and industries change about monthly; served from memory
+reference = ReferenceData(
+    load_reference_data,
+    refresh_interval=float(os.environ.get("REFERENCE_REFRESH_INTERVAL", 3600)),
+    max_age=int(os.environ.get("REFERENCE_MAX_AGE", 3600)),
+)
+
+# Page size the frontend requests, so snapshot files match its API calls
+SNAPSHOT_PAGE_SIZE = 20
+
+def snapshot_columns():
+    """Projection the frontend gets from GET /stories when it passes no fields"""
+    return parse_fields(None, required=("id", "published_date"))
+
+async def list_snapshot_paths() -> List[str]:
+    """Snapshot every category's first page and each trending timeframe"""
+    categories = await reference.rows("categories")
+    paths = ["stories/category/all"] + [f"stories/category/{c['id']}" for c in categories]
+    paths += [f"stories/trending/{timeframe}" for timeframe in TIMEFRAMES]
+    return paths
+
+async def render_snapshot(path: str) -> Optional[EncodedBody]:
+    """Build a snapshot body exactly as the matching API endpoint would serve it"""
+    _, kind, name = path.split("/")
+    if kind == "category":
+        key = stories_cache_key(name, None, None, None, 1, SNAPSHOT_PAGE_SIZE, None, snapshot_columns())
+        return await stories_cache.get_or_load_encoded(key, lambda: fetch_stories(*key), EncodedBody)
+    if not trending.ready:
+        raise RuntimeError("Trending leaderboards not loaded yet")
+    return trending_body(name, SNAPSHOT_PAGE_SIZE, parse_fields(None))
+
+def trending_body(timeframe: str, limit: int, columns) -> EncodedBody:
+    """Get a trending page from the leaderboards, serialized and compressed once per refresh"""
+    def build():
+        stories = [project(story, columns) for story in trending.top(timeframe, limit)]
+        return EncodedBody({"stories": stories, "timeframe": timeframe})
+    
+    return trending.derived(("page", timeframe, limit, columns), build)
+
+# Static copies of the hot read paths for a CDN; off unless SNAPSHOT_DIR is set
+snapshots = SnapshotGenerator(
+    SnapshotStore(os.environ["SNAPSHOT_DIR"], "feed"),
+    list_snapshot_paths,
+    render_snapshot,
+    interval=float(os.environ.get("SNAPSHOT_INTERVAL", 60)),
+) if os.environ.get("SNAPSHOT_DIR") else None
+
+# Open GET /stories/stream connections, fed from the CMS change events below
+story_stream = StoryStream(
+    max_subscribers=int(os.environ.get("STREAM_MAX_SUBSCRIBERS", 1000)),
+    max_pending=int(os.environ.get("STREAM_MAX_PENDING", 100)),
+    max_tracked=int(os.environ.get("STREAM_MAX_TRACKED", 10000)),
+)
+
+# CMS change events; the unix transport listens on EVENT_SOCKET
+bus = bus_from_env(os.environ.get("EVENT_SOCKET", f"{SOCKET_DIR}/feed.sock"))
+
+@app.on_event("startup")
+async def start_background_workers():
+    global supabase
+    supabase = await db.connect(http_client)
+    engagement.start()
+    trending.start()
+    search_index.start()
+    reference.start()
+    if snapshots:
+        snapshots.start()
+    await bus.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await bus.close()
+    if snapshots:
+        await snapshots.stop()
+    await reference.stop()
+    await search_index.stop()
+    await trending.stop()
+    await engagement.stop()
+    await http_client.aclose()
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Feed Service is running!", "version": "1.0.0"}
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 @app.get("/stories")
-def get_stories(
+async def get_stories(
+    request: Request,
     category: Optional[str] = None,
     industry: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
-    company_slug: Optional[str] = None
+    company_slug: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated story columns; defaults to the card projection")
 ):
     """Get stories with filtering and pagination"""
+    after = decode_cursor(cursor) if cursor else None
+    # published_date is needed to build the next cursor
+    columns = parse_fields(fields, required=("id", "published_date"))
+    key = stories_cache_key(category, industry, search, company_slug, page, limit, after, columns)
+    # The serialized page (and its ETag and compressed forms) live as long as the cache entry
+    body = await stories_cache.get_or_load_encoded(key, lambda: fetch_stories(*key), EncodedBody)
+    return json_response(request, body)
+
+def stories_cache_key(category, industry, search, company_slug, page, limit, after=None, columns=CARD_FIELDS):
+    """Normalize story filters into a cache key"""
+    category = category if category and category != 'all' else 'all'
+    search = search.strip().lower() if search and search.strip() else None
+    # Keyset pages ignore the page number
+    if after:
+        page = None
+    return (category, industry or None, search, company_slug or None, page, limit, after, columns)
+
+async def fetch_stories(category, industry, search, company_slug, page, limit, after=None, columns=CARD_FIELDS):
+    """Query a page of published stories from Supabase"""
+    if search and not after and search_index.ready and tokenize(search):
+        return await search_stories(category, industry, search, company_slug, page, limit, columns)
+    
     try:
-        query = supabase.table("stories").select("""
-            *,
+        query = supabase.table("stories").select(f"""
+            {", ".join(columns)},
             story_companies!inner(
                 companies(name, slug, industry, logo_url)
             )
         """)
         
         # Apply filters
-        if category and category != 'all':
+        if category != 'all':
             query = query.eq("category", category)
             
         if search:
@@ -61,40 +262,38 @@ def get_stories(
             query = query.eq("story_companies.companies.industry", industry)
         
         query = query.eq("status", "published")
-        query = query.order("published_date", desc=True)
         
-        # Pagination
-        start = (page - 1) * limit
-        end = start + limit - 1
-        
-        result = query.range(start, end).execute()
+        # Pagination (keyset when a cursor is given, offset otherwise)
+        rows, next_cursor = await paginate(query, "published_date", page or 1, limit, after)
         
         # Format response
-        stories = []
-        for story in result.data:
-            companies = [sc["companies"] for sc in story.get("story_companies", [])]
-            story_data = {**story}
-            story_data["companies"] = companies
-            del story_data["story_companies"]
-            stories.append(story_data)
+        stories = [format_story(story) for story in rows]
         
         return {
             "stories": stories,
             "page": page,
             "limit": limit,
             "total": len(stories),
-            "has_more": len(stories) == limit
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/stories/trending")
-def get_trending_stories(
+async def get_trending_stories(
+    request: Request,
     limit: int = Query(20, ge=1, le=50),
-    timeframe: str = Query("week", regex="^(day|week|month)$")
+    timeframe: str = Query("week", regex="^(day|week|month)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated story columns; defaults to the card projection")
 ):
     """Get trending stories based on engagement"""
+    columns = parse_fields(fields)
+    if trending.ready:
+        return json_response(request, trending_body(timeframe, limit, columns))
+    
+    # Leaderboards not loaded yet, fall back to sorting in the database
     try:
         # Calculate date threshold
         now = datetime.now()
@@ -105,90 +304,226 @@ def get_trending_stories(
         else:  # month
             since = now - timedelta(days=30)
         
-        result = supabase.table("stories").select("""
-            *,
+        query = supabase.table("stories").select(f"""
+            {", ".join(columns)},
             story_companies(
                 companies(name, slug, industry, logo_url)
             )
         """).eq("status", "published").gte(
             "published_date", since.isoformat()
-        ).order("likes", desc=True).order("views", desc=True).limit(limit).execute()
+        ).order("likes", desc=True).order("views", desc=True).limit(limit)
+        result = await flight.do(("trending", timeframe, limit, columns), query.execute)
+        
+        stories = [format_story(story) for story in result.data]
+        
+        return json_response(request, {"stories": stories, "timeframe": timeframe})
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stories/stream")
+async def stream_stories(
+    category: Optional[str] = None,
+    industry: Optional[str] = None,
+    company_slug: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated story columns; defaults to the card projection")
+):
+    """Push newly published and updated stories matching the filters as server-sent events"""
+    columns = parse_fields(fields)
+    if story_stream.full():
+        raise HTTPException(status_code=503, detail="Too many open streams, poll GET /stories instead")
+    subscriber = story_stream.subscribe(category, industry, company_slug, columns)
+    return StreamingResponse(
+        story_stream.events(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/stories/{story_id}")
+async def get_story(request: Request, story_id: str):
+    """Get a single published story with its full content"""
+    validate_story_id(story_id)
+    try:
+        query = supabase.table("stories").select("""
+            *,
+            story_companies(
+                companies(name, slug, industry, logo_url)
+            )
+        """).eq("id", story_id).eq("status", "published")
+        result = await flight.do(("story", story_id), query.execute)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return json_response(request, {"story": format_story(result.data[0])})
+
+async def search_stories(category, industry, search, company_slug, page, limit, columns=CARD_FIELDS):
+    """Rank matches in the search index, then hydrate only the requested page"""
+    try:
+        story_ids = search_index.search(search, category, industry, company_slug)
+        start = (page - 1) * limit
+        page_ids = story_ids[start:start + limit]
         
-        # Format response
         stories = []
-        for story in result.data:
-            companies = [sc["companies"] for sc in story.get("story_companies", [])]
-            story_data = {**story}
-            story_data["companies"] = companies
-            del story_data["story_companies"]
-            stories.append(story_data)
+        if page_ids:
+            result = await supabase.table("stories").select(f"""
+                {", ".join(columns)},
+                story_companies(
+                    companies(name, slug, industry, logo_url)
+                )
+            """).in_("id", page_ids).eq("status", "published").execute()
+            
+            by_id = {str(story["id"]): format_story(story) for story in result.data}
+            stories = [by_id[i] for i in page_ids if i in by_id]
         
-        return {"stories": stories, "timeframe": timeframe}
+        return {
+            "stories": stories,
+            "page": page,
+            "limit": limit,
+            "total": len(stories),
+            "has_more": len(story_ids) > start + limit,
+            "next_cursor": None
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_story(story: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten the story_companies join into a companies list"""
+    story_data = {**story}
+    story_data["companies"] = [sc["companies"] for sc in story_data.pop("story_companies", [])]
+    return story_data
+
 @app.get("/categories")
-def get_categories():
+async def get_categories(request: Request):
     """Get all available categories"""
     try:
-        result = supabase.table("categories").select("*").order("sort_order").execute()
-        return {"categories": result.data}
+        return json_response(request, await reference.body("categories"), reference.cache_headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/industries")
-def get_industries():
+async def get_industries(request: Request):
     """Get all available industries"""
     try:
-        result = supabase.table("industries").select("*").order("sort_order").execute()
-        return {"industries": result.data}
+        return json_response(request, await reference.body("industries"), reference.cache_headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/stories/{story_id}/like")
-def like_story(story_id: str):
+async def like_story(story_id: str):
     """Increment like count for a story"""
-    try:
-        # Get current likes
-        story_result = supabase.table("stories").select("likes").eq("id", story_id).execute()
-        
-        if not story_result.data:
-            raise HTTPException(status_code=404, detail="Story not found")
-        
-        current_likes = story_result.data[0]["likes"] or 0
-        
-        # Update likes
-        result = supabase.table("stories").update({
-            "likes": current_likes + 1
-        }).eq("id", story_id).execute()
-        
-        return {"success": True, "likes": current_likes + 1}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    validate_story_id(story_id)
+    pending = engagement.increment(story_id, "likes")
+    trending.record(story_id, "likes")
+    return {"success": True, "pending_likes": pending}
 
 @app.post("/stories/{story_id}/view")
-def track_view(story_id: str):
+async def track_view(story_id: str):
     """Increment view count for a story"""
+    validate_story_id(story_id)
+    pending = engagement.increment(story_id, "views")
+    trending.record(story_id, "views")
+    return {"success": True, "pending_views": pending}
+
+def validate_story_id(story_id: str):
+    """Reject ids that can't belong to a story before they reach the buffer"""
     try:
-        # Get current views
-        story_result = supabase.table("stories").select("views").eq("id", story_id).execute()
-        
-        if not story_result.data:
-            raise HTTPException(status_code=404, detail="Story not found")
-        
-        current_views = story_result.data["views"] or 0
-        
-        # Update views
-        result = supabase.table("stories").update({
-            "views": current_views + 1
-        }).eq("id", story_id).execute()
-        
-        return {"success": True, "views": current_views + 1}
+        uuid.UUID(story_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Story not found")
+
+@app.post("/internal/events")
+async def receive_change_event(payload: Dict[str, Any], x_internal_token: Optional[str] = Header(None)):
+    """Receive a CMS change event over the HTTP transport"""
+    if internal_token and x_internal_token != internal_token:
+        raise HTTPException(status_code=403, detail="Invalid internal token")
+    try:
+        event = ChangeEvent.from_dict(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await bus.dispatch(event)
+    return {"success": True}
+
+async def on_change(event: ChangeEvent):
+    """Evict cached story pages and patch the search index after a CMS write"""
+    if event.type == REFERENCE_CHANGED:
+        reference.request_refresh()
+        return
+    # A company with no stories yet can't appear on any page
+    if event.type == COMPANY_CREATED:
+        return
+
+    story_ids = set(event.story_ids)
+    categories = set(event.categories)
+    company_slugs = set(event.company_slugs)
+
+    def affected(key, value):
+        category, industry, search, company_slug, page, limit, after, columns = key
+        # Pages already showing one of the stories
+        if any(story["id"] in story_ids for story in value["stories"]):
+            return True
+        # Pages whose filters could now include one of the stories
+        if categories and category != 'all' and category not in categories:
+            return False
+        if company_slug and company_slug not in company_slugs:
+            return False
+        if industry and not company_slugs:
+            return False
+        return True
+
+    stories_cache.invalidate(affected)
+    trending.request_refresh()
+    if snapshots:
+        snapshots.mark(
+            ["stories/category/all"]
+            + [f"stories/category/{category}" for category in categories]
+            + [f"stories/trending/{timeframe}" for timeframe in TIMEFRAMES]
+        )
+    await apply_story_changes(story_ids, created=event.type == STORY_CREATED)
+
+bus.subscribe(on_change)
+
+async def apply_story_changes(story_ids, created: bool = False):
+    """Patch the search index and notify open streams with the current state of the given stories"""
+    if not story_ids or not (search_index.ready or search_index.building or len(story_stream)):
+        return
+    try:
+        # One read serves both the index and every stream subscriber
+        result = await supabase.table("stories").select(f"""
+            {", ".join(sorted(LIST_FIELDS))},
+            story_companies(
+                companies(name, slug, industry, logo_url)
+            )
+        """).in_("id", list(story_ids)).execute()
         
+        published = {str(story["id"]): format_story(story) for story in result.data if story["status"] == "published"}
+        for story_id in story_ids:
+            if story_id in published:
+                search_index.upsert(published[story_id])
+                story_stream.publish(published[story_id], created=created)
+            else:
+                search_index.remove(story_id)
+                story_stream.publish({"id": story_id}, removed=True, created=created)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # The periodic rebuild will catch up; streams miss this change
+        print(f"Warning: Failed to apply story changes: {str(e)}")
+
+@app.get("/internal/stats")
+async def get_internal_stats():
+    """Get cache and engagement buffer counters"""
+    return {
+        "stories_cache": stories_cache.stats(),
+        "engagement": engagement.metrics(),
+        "trending": trending.stats(),
+        "search": search_index.stats(),
+        "reference": reference.stats(),
+        "stream": story_stream.stats(),
+        "snapshots": snapshots.stats() if snapshots else None,
+        "events": bus.stats(),
+        "single_flight": flight.stats()
+    }
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
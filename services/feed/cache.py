@@ -0,0 +1,150 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "encoded")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+        # Serialized form of value, built the first time it is served
+        self.encoded = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one upstream call"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn(), or the identical call already in flight for key"""
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.collapsed += 1
+        # Shielded so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Retrieve it so an error nobody waited for isn't logged as unhandled
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get call and collapse counters"""
+        return {"in_flight": len(self._calls), "calls": self.calls, "collapsed": self.collapsed}
+
+
+class ResponseCache:
+    """Bounded TTL/LRU cache with stale-while-revalidate"""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 30.0, stale_ttl: float = 120.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        # Concurrent misses on one key share a single load
+        self._loads = SingleFlight()
+        # Bumped on every invalidation so in-flight loads don't re-store stale data
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return cached value for key, loading it on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, loader, self._generation))
+                return entry.value
+        self.misses += 1
+        # Requests arriving after an invalidation don't join a load that started before it
+        return await self._loads.do((key, self._generation), lambda: self._load(key, loader))
+
+    async def get_or_load_encoded(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Any]
+    ) -> Any:
+        """Like get_or_load, but return encode(value), computed once per cached entry"""
+        value = await self.get_or_load(key, loader)
+        entry = self._entries.get(key)
+        if entry is None or entry.value is not value:
+            # Not (or no longer) cached; encode just for this request
+            return encode(value)
+        if entry.encoded is None:
+            entry.encoded = encode(value)
+        return entry.encoded
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        value = await loader()
+        self._store(key, value, generation)
+        return value
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: int):
+        try:
+            value = await loader()
+            self._store(key, value, generation)
+        except Exception as e:
+            # Keep serving the stale entry; the next miss will surface the error
+            print(f"Warning: Background cache refresh failed: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any, generation: int):
+        if generation != self._generation:
+            return
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Evict every entry for which predicate(key, value) is true"""
+        self._generation += 1
+        doomed = [key for key, entry in self._entries.items() if predicate(key, entry.value)]
+        for key in doomed:
+            del self._entries[key]
+        return len(doomed)
+
+    def clear(self) -> int:
+        """Evict all entries"""
+        return self.invalidate(lambda key, value: True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "collapsed": self._loads.collapsed,
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+COUNTER_FIELDS = ("likes", "views")
+
+
+class EngagementBuffer:
+    """Write-behind buffer that coalesces like/view increments per story.
+
+    Failed flushes are retried, but the buffer never holds more than
+    max_backlog stories: while the database is unreachable, increments for
+    stories beyond that are dropped and counted rather than kept.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        max_backlog: int = 50000
+    ):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backlog = max(max_backlog, max_pending)
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = None
+        self.increments = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.consecutive_failures = 0
+        self.dropped_increments = 0
+        self.rows_flushed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def start(self):
+        """Start the background flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def increment(self, story_id: str, field: str, amount: int = 1) -> int:
+        """Queue an increment and return the story's pending delta for field"""
+        self.increments += 1
+        deltas = self._pending.get(story_id)
+        if deltas is None:
+            if len(self._pending) >= self.max_backlog:
+                self.dropped_increments += amount
+                return 0
+            deltas = self._pending[story_id] = dict.fromkeys(COUNTER_FIELDS, 0)
+        deltas[field] += amount
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+        return deltas[field]
+
+    async def flush(self) -> int:
+        """Write coalesced deltas in one bulk call, returning rows written"""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            rows = [{"id": story_id, **deltas} for story_id, deltas in batch.items()]
+            started = time.perf_counter()
+            try:
+                await self.flush_fn(rows)
+            except Exception as e:
+                # Put the deltas back so the next flush retries them, up to max_backlog stories
+                for story_id, deltas in batch.items():
+                    merged = self._pending.get(story_id)
+                    if merged is None:
+                        if len(self._pending) >= self.max_backlog:
+                            self.dropped_increments += sum(deltas.values())
+                            continue
+                        merged = self._pending[story_id] = dict.fromkeys(COUNTER_FIELDS, 0)
+                    for field, amount in deltas.items():
+                        merged[field] += amount
+                self.flush_failures += 1
+                self.consecutive_failures += 1
+                print(f"Warning: Failed to flush engagement counters: {str(e)}")
+                return 0
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+            self.flushes += 1
+            self.consecutive_failures = 0
+            self.rows_flushed += len(rows)
+            return len(rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def pending(self) -> Dict[str, Dict[str, int]]:
+        """Get a copy of the deltas not yet flushed"""
+        return {story_id: dict(deltas) for story_id, deltas in self._pending.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get queue depth and flush counters"""
+        return {
+            "queue_depth": len(self._pending),
+            "max_backlog": self.max_backlog,
+            "pending_increments": sum(sum(d.values()) for d in self._pending.values()),
+            "increments": self.increments,
+            "dropped_increments": self.dropped_increments,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "consecutive_failures": self.consecutive_failures,
+            "rows_flushed": self.rows_flushed,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+# What a CMS write did. Read services pick the events they cache data for.
+STORY_CREATED = "story.created"
+STORY_UPDATED = "story.updated"
+STORY_DELETED = "story.deleted"
+COMPANY_CREATED = "company.created"
+LINKS_CHANGED = "links.changed"
+# Categories, industries or other lookup tables were edited
+REFERENCE_CHANGED = "reference.changed"
+EVENT_TYPES = (STORY_CREATED, STORY_UPDATED, STORY_DELETED, COMPANY_CREATED, LINKS_CHANGED, REFERENCE_CHANGED)
+
+# Default socket locations for the unix transport, one per subscribing service
+SOCKET_DIR = os.environ.get("EVENT_SOCKET_DIR", "/tmp/startup-news-events")
+
+
+class ChangeEvent:
+    """A typed change notification with the ids it affects"""
+
+    __slots__ = ("type", "story_ids", "categories", "company_ids", "company_slugs", "id", "occurred_at")
+
+    def __init__(
+        self,
+        type: str,
+        story_ids: Iterable[Optional[str]] = (),
+        categories: Iterable[Optional[str]] = (),
+        company_ids: Iterable[Optional[str]] = (),
+        company_slugs: Iterable[Optional[str]] = (),
+        id: Optional[str] = None,
+        occurred_at: Optional[float] = None
+    ):
+        if type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {type}")
+        self.type = type
+        self.story_ids = sorted({str(s) for s in story_ids if s})
+        self.categories = sorted({c for c in categories if c})
+        self.company_ids = sorted({str(c) for c in company_ids if c})
+        self.company_slugs = sorted({s for s in company_slugs if s})
+        self.id = id or str(uuid.uuid4())
+        self.occurred_at = occurred_at or time.time()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChangeEvent":
+        """Build an event from its wire form, raising ValueError if it is malformed"""
+        if not isinstance(data, dict) or "type" not in data:
+            raise ValueError("Event must be an object with a type")
+        return cls(
+            data["type"],
+            data.get("story_ids") or (),
+            data.get("categories") or (),
+            data.get("company_ids") or (),
+            data.get("company_slugs") or (),
+            data.get("id"),
+            data.get("occurred_at"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def is_empty(self) -> bool:
+        # Reference data is reloaded whole, so those events carry no ids
+        if self.type == REFERENCE_CHANGED:
+            return False
+        return not (self.story_ids or self.company_ids or self.company_slugs)
+
+
+Handler = Callable[[ChangeEvent], Awaitable[None]]
+
+
+class EventBus(ABC):
+    """Publish/subscribe for change events; subclasses provide the transport.
+
+    Every service creates one bus. Publishers call publish(); subscribers
+    register handlers with subscribe() and receive events via dispatch(),
+    which the transport (or an HTTP endpoint) calls on arrival.
+    """
+
+    def __init__(self):
+        self._handlers: List[Handler] = []
+        self.published = 0
+        self.publish_failures = 0
+        self.received = 0
+        self.handler_failures = 0
+
+    def subscribe(self, handler: Handler):
+        """Register an async handler called with every received event"""
+        self._handlers.append(handler)
+
+    async def start(self):
+        """Start receiving events, if the transport needs a listener"""
+
+    async def close(self):
+        """Release transport resources"""
+
+    @abstractmethod
+    async def publish(self, event: ChangeEvent):
+        """Send event to every subscriber"""
+
+    async def dispatch(self, event: ChangeEvent):
+        """Hand a received event to every handler; one failing doesn't stop the others"""
+        self.received += 1
+        for handler in self._handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                self.handler_failures += 1
+                print(f"Warning: Failed to handle {event.type} event: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get publish and delivery counters"""
+        return {
+            "transport": type(self).__name__,
+            "published": self.published,
+            "publish_failures": self.publish_failures,
+            "received": self.received,
+            "handler_failures": self.handler_failures,
+        }
+
+
+class LocalBus(EventBus):
+    """In-process bus for tests and single-process dev setups"""
+
+    async def publish(self, event: ChangeEvent):
+        self.published += 1
+        await self.dispatch(event)
+
+
+class HttpBus(EventBus):
+    """Posts events to each subscriber's POST /internal/events endpoint"""
+
+    def __init__(self, subscriber_urls: Iterable[str], token: str = ""):
+        super().__init__()
+        self.subscriber_urls = [url.rstrip("/") for url in subscriber_urls if url]
+        self.token = token
+        # Separate from the Supabase client so its service-role headers never leave the service
+        self._client = httpx.AsyncClient(timeout=5)
+
+    async def publish(self, event: ChangeEvent):
+        self.published += 1
+        payload = event.to_dict()
+        await asyncio.gather(*(self._post(url, payload) for url in self.subscriber_urls))
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def _post(self, url: str, payload: Dict[str, Any]):
+        try:
+            response = await self._client.post(
+                f"{url}/internal/events",
+                json=payload,
+                headers={"X-Internal-Token": self.token},
+            )
+            response.raise_for_status()
+        except Exception as e:
+            self.publish_failures += 1
+            print(f"Warning: Failed to publish event to {url}: {str(e)}")
+
+
+class UnixSocketBus(EventBus):
+    """Newline-delimited JSON events over Unix sockets, for services sharing a host.
+
+    Subscribers listen on listen_path; publishers keep one connection open
+    to each of subscriber_paths and reconnect when a subscriber restarts.
+    """
+
+    def __init__(self, listen_path: Optional[str] = None, subscriber_paths: Iterable[str] = ()):
+        super().__init__()
+        self.listen_path = listen_path
+        self.subscriber_paths = [path for path in subscriber_paths if path]
+        self._server = None
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        self._connections = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def start(self):
+        if not self.listen_path:
+            return
+        os.makedirs(os.path.dirname(self.listen_path) or ".", exist_ok=True)
+        if os.path.exists(self.listen_path):
+            # Left over from a previous run of this service
+            os.remove(self.listen_path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.listen_path)
+
+    async def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        # Server.close() leaves accepted connections open; publishers must see EOF and reconnect
+        for writer in list(self._connections):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def publish(self, event: ChangeEvent):
+        self.published += 1
+        line = (json.dumps(event.to_dict()) + "\n").encode()
+        await asyncio.gather(*(self._send(path, line) for path in self.subscriber_paths))
+
+    async def _send(self, path: str, line: bytes):
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            # One retry covers a subscriber that restarted since the last event
+            for attempt in range(2):
+                try:
+                    writer = self._writers.get(path)
+                    if writer is None or writer.is_closing():
+                        _, writer = await asyncio.open_unix_connection(path)
+                        self._writers[path] = writer
+                    writer.write(line)
+                    await writer.drain()
+                    return
+                except (OSError, ConnectionError) as e:
+                    self._writers.pop(path, None)
+                    if attempt:
+                        self.publish_failures += 1
+                        print(f"Warning: Failed to publish event to {path}: {str(e)}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    event = ChangeEvent.from_dict(json.loads(line))
+                except ValueError as e:
+                    print(f"Warning: Dropping malformed event: {str(e)}")
+                    continue
+                await self.dispatch(event)
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+
+def bus_from_env(listen_path: Optional[str] = None) -> EventBus:
+    """Create the bus selected by EVENT_BUS (http, unix or local).
+
+    listen_path is where this service receives events on the unix
+    transport; publishers leave it unset.
+    """
+    transport = os.environ.get("EVENT_BUS", "http")
+    if transport == "local":
+        return LocalBus()
+    if transport == "unix":
+        subscribers = os.environ.get(
+            "EVENT_SUBSCRIBER_SOCKETS",
+            f"{SOCKET_DIR}/feed.sock,{SOCKET_DIR}/timeline.sock"
+        )
+        return UnixSocketBus(listen_path, subscribers.split(","))
+    if transport == "http":
+        subscribers = os.environ.get("EVENT_SUBSCRIBER_URLS") or ",".join([
+            os.environ.get("FEED_SERVICE_URL", "http://localhost:8000"),
+            os.environ.get("TIMELINE_SERVICE_URL", "http://localhost:8001"),
+        ])
+        return HttpBus(subscribers.split(","), os.environ.get("INTERNAL_API_TOKEN", ""))
+    raise ValueError(f"Unknown EVENT_BUS transport: {transport}")
@@ -0,0 +1,48 @@
+from fastapi import HTTPException
+from typing import Iterable, Optional, Tuple
+
+# Story columns list endpoints may return. content is deliberately absent:
+# it is only served by the single-story endpoints.
+LIST_FIELDS = frozenset({
+    "id", "title", "summary", "category", "tags", "source_url", "image_url",
+    "status", "created_by", "published_date", "created_at", "updated_at",
+    "likes", "views",
+})
+
+# Default projection for story cards in the reader UI
+CARD_FIELDS = (
+    "id", "title", "summary", "category", "tags", "source_url", "image_url",
+    "published_date", "likes", "views",
+)
+
+# Default projection for the editor's story list
+ADMIN_FIELDS = CARD_FIELDS + ("status", "created_by", "created_at", "updated_at")
+
+
+def parse_fields(
+    fields: Optional[str],
+    default: Tuple[str, ...] = CARD_FIELDS,
+    required: Iterable[str] = ("id",)
+) -> Tuple[str, ...]:
+    """Turn a comma-separated fields parameter into a sorted column tuple"""
+    if not fields or not fields.strip():
+        columns = set(default)
+    else:
+        columns = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = columns - LIST_FIELDS
+        if unknown:
+            detail = f"Unknown fields: {', '.join(sorted(unknown))}"
+            if "content" in unknown:
+                detail += " (content is only returned by the single-story endpoint)"
+            raise HTTPException(status_code=400, detail=detail)
+    # Columns the handler itself needs, e.g. for cursors
+    columns.update(required)
+    return tuple(sorted(columns))
+
+
+def project(row: dict, columns: Tuple[str, ...]) -> dict:
+    """Keep only columns (plus the companies list) from an already-loaded story"""
+    projected = {column: row[column] for column in columns if column in row}
+    if "companies" in row:
+        projected["companies"] = row["companies"]
+    return projected
@@ -0,0 +1,269 @@
+import asyncio
+import bisect
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from has in is it its of on or that the to was were will with".split())
+
+# Relative weight of a term occurrence in each indexed field
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "summary": 1.0}
+
+# Prefix matches rank below exact ones and expand to a bounded number of terms
+PREFIX_DISCOUNT = 0.7
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase and split text into indexable tokens"""
+    if not text:
+        return []
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _Document:
+    __slots__ = ("terms", "length", "category", "published_date", "company_slugs", "industries")
+
+    def __init__(self, terms, length, category, published_date, company_slugs, industries):
+        self.terms = terms
+        self.length = length
+        self.category = category
+        self.published_date = published_date
+        self.company_slugs = company_slugs
+        self.industries = industries
+
+
+def _document(story: Dict[str, Any]) -> _Document:
+    """Tokenize a story's indexed fields"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = story.get(field)
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        for token in tokenize(value):
+            terms[token] += weight
+
+    companies = [c for c in story.get("companies", []) if c]
+    return _Document(
+        terms=dict(terms),
+        length=sum(terms.values()),
+        category=story.get("category"),
+        published_date=story.get("published_date") or "",
+        company_slugs={c.get("slug") for c in companies},
+        industries={c.get("industry") for c in companies},
+    )
+
+
+class SearchIndex:
+    """In-memory inverted index over story title, summary and tags with BM25 ranking"""
+
+    def __init__(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]], rebuild_interval: float = 600.0, k1: float = 1.2, b: float = 0.75):
+        self.loader = loader
+        self.rebuild_interval = rebuild_interval
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._docs: Dict[str, _Document] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._total_length = 0.0
+        # Index builds run in a worker thread, so mutations still take a lock
+        self._lock = threading.RLock()
+        # Ids written while a rebuild is loading, replayed onto the new index before the swap
+        self._touched: Optional[set] = None
+        self._wake = asyncio.Event()
+        self._task = None
+        self.last_build_ms = 0.0
+
+    @property
+    def building(self) -> bool:
+        """Whether a build is loading; writes made now are replayed onto its result"""
+        return self._touched is not None
+
+    def start(self):
+        """Start the background build task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background build task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def rebuild(self):
+        """Replace the whole index with the loader's stories"""
+        started = time.perf_counter()
+        with self._lock:
+            self._touched = set()
+        try:
+            rows = await self.loader()
+            fresh = SearchIndex(self.loader, k1=self.k1, b=self.b)
+            # Tokenizing the whole table is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(fresh._load, rows)
+
+            with self._lock:
+                # Stories published, edited or deleted since the load began
+                for story_id in self._touched:
+                    doc = self._docs.get(story_id)
+                    if doc is None:
+                        fresh.remove(story_id)
+                    else:
+                        fresh._put(story_id, doc)
+                self._docs = fresh._docs
+                self._postings = fresh._postings
+                self._vocabulary = fresh._vocabulary
+                self._total_length = fresh._total_length
+                self.ready = True
+        finally:
+            with self._lock:
+                self._touched = None
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+    def upsert(self, story: Dict[str, Any]):
+        """Index (or re-index) a single published story"""
+        self._put(str(story["id"]), _document(story))
+
+    def remove(self, story_id: str):
+        """Drop a story from the index"""
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(story_id)
+            doc = self._docs.pop(story_id, None)
+            if doc is None:
+                return
+            self._total_length -= doc.length
+            for token in doc.terms:
+                postings = self._postings[token]
+                del postings[story_id]
+                if not postings:
+                    del self._postings[token]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        industry: Optional[str] = None,
+        company_slug: Optional[str] = None
+    ) -> List[str]:
+        """Get ids of stories matching every query term, best match first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            scores: Optional[Dict[str, float]] = None
+            for term in terms:
+                term_scores = self._score_term(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    # Every term has to match (exactly or by prefix)
+                    scores = {i: s + term_scores[i] for i, s in scores.items() if i in term_scores}
+                if not scores:
+                    return []
+
+            matches = [i for i in scores if self._matches(self._docs[i], category, industry, company_slug)]
+            matches.sort(key=lambda i: (scores[i], self._docs[i].published_date), reverse=True)
+            return matches
+
+    def stats(self) -> Dict[str, Any]:
+        """Get index size and build timing"""
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._docs),
+                "terms": len(self._vocabulary),
+                "last_build_ms": round(self.last_build_ms, 2),
+            }
+
+    def _load(self, rows: List[Dict[str, Any]]):
+        """Fill an empty index, sorting the vocabulary once at the end"""
+        documents = {str(story["id"]): _document(story) for story in rows}
+        with self._lock:
+            for story_id, doc in documents.items():
+                self._add(story_id, doc)
+            self._vocabulary = sorted(self._postings)
+
+    def _put(self, story_id: str, doc: _Document):
+        with self._lock:
+            self.remove(story_id)
+            for token in self._add(story_id, doc):
+                bisect.insort(self._vocabulary, token)
+
+    def _add(self, story_id: str, doc: _Document) -> List[str]:
+        """Add a document's postings, returning the tokens new to the index"""
+        self._docs[story_id] = doc
+        self._total_length += doc.length
+        new_tokens = []
+        for token, tf in doc.terms.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                new_tokens.append(token)
+            postings[story_id] = tf
+        return new_tokens
+
+    def _score_term(self, term: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for token in self._expand(term):
+            weight = 1.0 if token == term else PREFIX_DISCOUNT
+            for story_id, contribution in self._bm25(token).items():
+                scores[story_id] = max(scores.get(story_id, 0.0), weight * contribution)
+        return scores
+
+    def _expand(self, term: str) -> Iterable[str]:
+        if len(term) < 2:
+            return [term] if term in self._postings else []
+        start = bisect.bisect_left(self._vocabulary, term)
+        expansions = []
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            expansions.append(token)
+        return expansions
+
+    def _bm25(self, token: str) -> Dict[str, float]:
+        postings = self._postings.get(token, {})
+        doc_count = len(self._docs)
+        avg_length = self._total_length / doc_count if doc_count else 1.0
+        idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+        scores = {}
+        for story_id, tf in postings.items():
+            norm = 1 - self.b + self.b * self._docs[story_id].length / (avg_length or 1.0)
+            scores[story_id] = idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return scores
+
+    @staticmethod
+    def _matches(doc: _Document, category: Optional[str], industry: Optional[str], company_slug: Optional[str]) -> bool:
+        # Same shape as GET /stories, which inner-joins companies
+        if not doc.company_slugs:
+            return False
+        if category and category != "all" and doc.category != category:
+            return False
+        if industry and industry not in doc.industries:
+            return False
+        if company_slug and company_slug not in doc.company_slugs:
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                print(f"Warning: Failed to build search index: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.rebuild_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
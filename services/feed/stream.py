@@ -0,0 +1,190 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, FrozenSet, Optional, Set, Tuple
+from fastapi.encoders import jsonable_encoder
+from fields import project
+
+# Seconds between keep-alive comments, so proxies don't drop idle streams
+KEEPALIVE_INTERVAL = 15.0
+
+# What the GET /stories filters look at: category, company slugs, company industries
+FilterKeys = Tuple[Optional[str], FrozenSet[str], FrozenSet[str]]
+
+
+def filter_keys(story: Dict[str, Any]) -> FilterKeys:
+    """Get the values of a story that the stream filters match against"""
+    companies = [c for c in story.get("companies") or [] if c]
+    return (
+        story.get("category"),
+        frozenset(c.get("slug") for c in companies),
+        frozenset(c.get("industry") for c in companies),
+    )
+
+
+class StoryChange:
+    """One change pushed to subscribers, serialized at most once per projection"""
+
+    __slots__ = ("seq", "event", "story", "_frames")
+
+    def __init__(self, seq: int, event: str, story: Dict[str, Any]):
+        self.seq = seq
+        # "story" for new/updated published stories, "removed" for ones that left the feed
+        self.event = event
+        self.story = story
+        self._frames: Dict[Tuple[str, ...], bytes] = {}
+
+    def frame(self, columns: Tuple[str, ...]) -> bytes:
+        """Get the SSE frame for subscribers asking for columns"""
+        data = self._frames.get(columns)
+        if data is None:
+            payload = project(self.story, columns) if self.event == "story" else {"id": self.story["id"]}
+            body = json.dumps(payload, separators=(",", ":"), default=jsonable_encoder)
+            data = self._frames[columns] = f"id: {self.seq}\nevent: {self.event}\ndata: {body}\n\n".encode("utf-8")
+        return data
+
+
+class Subscriber:
+    """One open stream: its filters and a bounded queue of pending changes"""
+
+    def __init__(self, category: Optional[str], industry: Optional[str], company_slug: Optional[str], columns: Tuple[str, ...], max_pending: int):
+        self.category = category if category and category != 'all' else None
+        self.industry = industry or None
+        self.company_slug = company_slug or None
+        self.columns = columns
+        self.queue: asyncio.Queue = asyncio.Queue(max_pending)
+        # Set when the queue overflowed; the client is told to refetch instead
+        self.lagged = False
+
+    def matches(self, keys: FilterKeys) -> bool:
+        """Apply the same filters as GET /stories"""
+        category, company_slugs, industries = keys
+        # GET /stories inner-joins companies, so unlinked stories never show
+        if not company_slugs:
+            return False
+        if self.category and category != self.category:
+            return False
+        if self.company_slug and self.company_slug not in company_slugs:
+            return False
+        if self.industry and self.industry not in industries:
+            return False
+        return True
+
+    def offer(self, change: StoryChange) -> bool:
+        """Queue a change without blocking; returns False if this overflowed the queue"""
+        try:
+            self.queue.put_nowait(change)
+            return True
+        except asyncio.QueueFull:
+            # Drop the backlog rather than grow it: one resync replaces everything missed
+            self.lagged = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+
+class StoryStream:
+    """Fans story changes out to every open GET /stories/stream connection.
+
+    The feed service loads each changed story once and publishes it here.
+    Every subscriber holds at most max_pending queued references to shared
+    changes, and each change is serialized once per projection. A subscriber
+    that can't keep up is sent a single resync event telling it to refetch
+    GET /stories, instead of letting its queue grow.
+
+    The filter keys last seen for up to max_tracked stories are kept, so a
+    subscriber whose filters an update moves a story out of is sent
+    "removed" for it.
+    """
+
+    def __init__(self, max_subscribers: int = 1000, max_pending: int = 100, max_tracked: int = 10000):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.max_tracked = max_tracked
+        self._subscribers: Set[Subscriber] = set()
+        self._last_seen: "OrderedDict[str, FilterKeys]" = OrderedDict()
+        self._seq = 0
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def subscribe(self, category: Optional[str], industry: Optional[str], company_slug: Optional[str], columns: Tuple[str, ...]) -> Subscriber:
+        """Create a subscriber; it starts receiving changes once events() is iterated"""
+        return Subscriber(category, industry, company_slug, columns, self.max_pending)
+
+    def publish(self, story: Dict[str, Any], removed: bool = False, created: bool = False):
+        """Queue a story change for every subscriber it matches, and "removed" for those it stopped matching.
+
+        When the story's previous state isn't known, every subscriber it
+        doesn't match is sent "removed", unless the story is new.
+        """
+        story_id = str(story["id"])
+        previous = self._last_seen.pop(story_id, None)
+        current = None if removed else filter_keys(story)
+        if current is not None:
+            self._last_seen[story_id] = current
+            while len(self._last_seen) > self.max_tracked:
+                self._last_seen.popitem(last=False)
+        if not self._subscribers:
+            return
+
+        self._seq += 1
+        self.published += 1
+        update = StoryChange(self._seq, "story", story) if current is not None else None
+        removal = StoryChange(self._seq, "removed", {"id": story_id})
+        for subscriber in self._subscribers:
+            # A lagged subscriber refetches everything anyway
+            if subscriber.lagged:
+                continue
+            if update is not None and subscriber.matches(current):
+                change = update
+            elif previous is not None and subscriber.matches(previous):
+                change = removal
+            elif previous is None and not created:
+                change = removal
+            else:
+                continue
+            if subscriber.offer(change):
+                self.delivered += 1
+            else:
+                self.resyncs += 1
+
+    async def events(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """Yield SSE frames for one connection until it disconnects"""
+        self._subscribers.add(subscriber)
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if change is None:
+                    # Changes from here on follow whatever the refetch returns
+                    subscriber.lagged = False
+                    yield b"event: resync\ndata: {}\n\n"
+                    continue
+                # Awaited by the server until the socket accepts it, so slow
+                # clients back up into their own bounded queue
+                yield change.frame(subscriber.columns)
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get subscriber and delivery counters"""
+        return {
+            "subscribers": len(self._subscribers),
+            "tracked_stories": len(self._last_seen),
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+        }
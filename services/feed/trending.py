@@ -0,0 +1,206 @@
+import asyncio
+import bisect
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+DAY = 24 * 60 * 60
+
+# timeframe -> (window seconds, score half-life seconds)
+TIMEFRAMES = {
+    "day": (DAY, 6 * 60 * 60),
+    "week": (7 * DAY, 2 * DAY),
+    "month": (30 * DAY, 7 * DAY),
+}
+
+# Derived values (encoded pages) kept per refresh before the oldest are dropped
+MAX_DERIVED = 256
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parse a PostgREST timestamp into epoch seconds"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class Leaderboard:
+    """Stories in one timeframe, ranked by exponentially decayed engagement.
+
+    score(t) = engagement * exp(-decay * (t - published)), so the ranking at
+    any t only depends on log(engagement) + decay * published. That key is
+    time-invariant, which lets events update one entry in place instead of
+    rescoring the whole window.
+    """
+
+    def __init__(self, window: float, half_life: float):
+        self.window = window
+        self.decay = math.log(2) / half_life
+        self._keys: Dict[str, float] = {}
+        self._ranked: List[tuple] = []
+
+    def __contains__(self, story_id: str) -> bool:
+        return story_id in self._keys
+
+    def upsert(self, story_id: str, engagement: float, published_ts: float):
+        self.remove(story_id)
+        key = math.log(engagement) + self.decay * published_ts
+        self._keys[story_id] = key
+        bisect.insort(self._ranked, (-key, story_id))
+
+    def remove(self, story_id: str):
+        key = self._keys.pop(story_id, None)
+        if key is not None:
+            index = bisect.bisect_left(self._ranked, (-key, story_id))
+            del self._ranked[index]
+
+    def top(self, limit: int, now: float, published: Dict[str, float]) -> List[str]:
+        ids = []
+        expired = []
+        for _, story_id in self._ranked:
+            if published[story_id] < now - self.window:
+                expired.append(story_id)
+                continue
+            ids.append(story_id)
+            if len(ids) == limit:
+                break
+        for story_id in expired:
+            self.remove(story_id)
+        return ids
+
+
+class TrendingEngine:
+    """In-memory day/week/month leaderboards kept current from like/view events"""
+
+    def __init__(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]], pending: Optional[Callable[[], Dict[str, Dict[str, int]]]] = None, refresh_interval: float = 60.0, like_weight: float = 3.0, view_weight: float = 1.0):
+        self.loader = loader
+        # Counts accepted but not yet persisted, layered over what the loader returns
+        self.pending = pending
+        self.refresh_interval = refresh_interval
+        self.like_weight = like_weight
+        self.view_weight = view_weight
+        self.ready = False
+        self._stories: Dict[str, Dict[str, Any]] = {}
+        self._published: Dict[str, float] = {}
+        self._boards = {name: Leaderboard(*spec) for name, spec in TIMEFRAMES.items()}
+        # Values built from the leaderboards, e.g. encoded pages; replaced on every refresh
+        self._derived: Dict[Any, Any] = {}
+        self._wake = asyncio.Event()
+        self._task = None
+        self.last_refresh_ms = 0.0
+
+    def start(self):
+        """Start the background refresh task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refresh(self):
+        """Rebuild the leaderboards soon, e.g. after a CMS write"""
+        self._wake.set()
+
+    async def refresh(self):
+        """Rebuild every leaderboard from the loader's stories"""
+        started = time.perf_counter()
+        rows = await self.loader()
+        pending = self.pending() if self.pending else {}
+        now = time.time()
+
+        stories = {}
+        published = {}
+        boards = {name: Leaderboard(*spec) for name, spec in TIMEFRAMES.items()}
+        for story in rows:
+            published_ts = parse_timestamp(story.get("published_date"))
+            if published_ts is None:
+                continue
+            story_id = str(story["id"])
+            deltas = pending.get(story_id, {})
+            stories[story_id] = {
+                "story": story,
+                "likes": (story.get("likes") or 0) + deltas.get("likes", 0),
+                "views": (story.get("views") or 0) + deltas.get("views", 0),
+            }
+            published[story_id] = published_ts
+            for board in boards.values():
+                if published_ts >= now - board.window:
+                    board.upsert(story_id, self._engagement(stories[story_id]), published_ts)
+
+        self._stories = stories
+        self._published = published
+        self._boards = boards
+        self._derived = {}
+        self.ready = True
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    def record(self, story_id: str, field: str, amount: int = 1):
+        """Apply a like/view event to every leaderboard holding the story"""
+        entry = self._stories.get(story_id)
+        if entry is None:
+            return
+        entry[field] += amount
+        engagement = self._engagement(entry)
+        for board in self._boards.values():
+            if story_id in board:
+                board.upsert(story_id, engagement, self._published[story_id])
+
+    def top(self, timeframe: str, limit: int) -> List[Dict[str, Any]]:
+        """Get the current top stories for a timeframe"""
+        ids = self._boards[timeframe].top(limit, time.time(), self._published)
+        return [
+            {**self._stories[i]["story"], "likes": self._stories[i]["likes"], "views": self._stories[i]["views"]}
+            for i in ids
+        ]
+
+    def derived(self, key: Any, build: Callable[[], Any]) -> Any:
+        """Get a value built from the leaderboards, building it at most once per refresh.
+
+        Like/view events reorder the leaderboards right away, but values
+        served from here pick them up at the next refresh.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            if len(self._derived) >= MAX_DERIVED:
+                del self._derived[next(iter(self._derived))]
+            value = self._derived[key] = build()
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Get leaderboard sizes and refresh timing"""
+        return {
+            "ready": self.ready,
+            "stories": len(self._stories),
+            "boards": {name: len(board._keys) for name, board in self._boards.items()},
+            "derived": len(self._derived),
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+        }
+
+    def _engagement(self, entry: Dict[str, Any]) -> float:
+        return 1 + self.like_weight * entry["likes"] + self.view_weight * entry["views"]
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Warning: Failed to refresh trending leaderboards: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
@@ -0,0 +1,9 @@
+import pytest
+
+# Sets up the environment before any service is imported
+import support  # noqa: F401
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,204 @@
+"""Test helpers: each service's app runs against a FakeSupabase over httpx's ASGI transport.
+
+The services are separate deployables whose modules share names (app, db,
+events, cache, ...), so each is imported fresh with the others' modules
+dropped from sys.modules. Modules imported earlier keep working through
+their own references, which lets one test drive the CMS and a read service
+against the same fake database.
+"""
+import asyncio
+import csv
+import importlib
+import io
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import httpx
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.dirname(TESTS_DIR)
+SERVICE_NAMES = ("feed", "timeline", "cms")
+
+# Keep every service self-contained: in-process events, scratch job dir, no snapshot files
+os.environ["EVENT_BUS"] = "local"
+os.environ["IMPORT_JOB_DIR"] = tempfile.mkdtemp(prefix="test-import-jobs-")
+os.environ.pop("SNAPSHOT_DIR", None)
+os.environ.pop("INTERNAL_API_TOKEN", None)
+
+sys.path.insert(0, os.path.join(SERVICES_DIR, "benchmarks"))
+
+from fake_supabase import FakeSupabase
+
+# Longest wait for a service's background loaders
+READY_TIMEOUT = 10.0
+
+NOW = datetime.now(timezone.utc)
+
+
+def import_module(service: str, name: str, fresh: bool = True):
+    """Import one of a service's modules by its plain name (db, events, search, ...)"""
+    if fresh:
+        prefixes = tuple(os.path.join(SERVICES_DIR, other) + os.sep for other in SERVICE_NAMES)
+        for module_name, module in list(sys.modules.items()):
+            if (getattr(module, "__file__", None) or "").startswith(prefixes):
+                del sys.modules[module_name]
+
+    service_dir = os.path.join(SERVICES_DIR, service)
+    sys.path.insert(0, service_dir)
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(service_dir)
+
+
+def import_service(name: str, fake: FakeSupabase):
+    """Import a service's app module with db.connect returning fake"""
+    db = import_module(name, "db")
+
+    async def connect(http_client):
+        return fake
+
+    db.connect = connect
+    return import_module(name, "app", fresh=False)
+
+
+@asynccontextmanager
+async def running(service):
+    """Start a service and yield an HTTP client for it"""
+    await service.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=service.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+    finally:
+        await service.app.router.shutdown()
+
+
+async def wait_for(condition, timeout: float = READY_TIMEOUT):
+    """Poll condition() until it is true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def forward_events(cms, *subscribers):
+    """Deliver the CMS's change events to the read services, through the wire format"""
+    async def forward(event):
+        for service in subscribers:
+            await service.bus.dispatch(service.ChangeEvent.from_dict(event.to_dict()))
+
+    cms.invalidation.bus.subscribe(forward)
+
+
+async def settle(cms):
+    """Wait until every change event the CMS has published so far is handled"""
+    while cms.invalidation._pending:
+        await asyncio.gather(*list(cms.invalidation._pending))
+
+
+# Row builders
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def make_company(slug: str, **fields) -> Dict[str, Any]:
+    return {
+        "id": new_id(),
+        "name": slug.replace("-", " ").title(),
+        "slug": slug,
+        "description": "",
+        "industry": "fintech",
+        "company_type": "startup",
+        "location": "Berlin, Germany",
+        "logo_url": None,
+        "status": "active",
+        "created_at": NOW.isoformat(),
+        "updated_at": NOW.isoformat(),
+        "story_count": 0,
+        **fields,
+    }
+
+
+def make_story(title: str, minutes_ago: int = 0, **fields) -> Dict[str, Any]:
+    published = (NOW - timedelta(minutes=minutes_ago)).isoformat()
+    return {
+        "id": new_id(),
+        "title": title,
+        "summary": f"{title} summary",
+        "content": "",
+        "category": "funding",
+        "tags": [],
+        "source_url": None,
+        "image_url": None,
+        "status": "published",
+        "created_by": "test",
+        "published_date": published,
+        "created_at": published,
+        "updated_at": published,
+        "likes": 0,
+        "views": 0,
+        **fields,
+    }
+
+
+def make_tables(
+    companies: List[Dict[str, Any]] = (),
+    stories: List[Dict[str, Any]] = (),
+    links: List[tuple] = (),
+    **tables
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Build the fake's tables; links are (story, company) row pairs"""
+    return {
+        "companies": list(companies),
+        "stories": list(stories),
+        "story_companies": [{"story_id": s["id"], "company_id": c["id"]} for s, c in links],
+        "funding_rounds": [],
+        "company_events": [],
+        "categories": [{"id": "funding", "name": "Funding", "sort_order": 0}, {"id": "product", "name": "Product", "sort_order": 1}],
+        "industries": [{"id": "fintech", "name": "Fintech", "sort_order": 0}, {"id": "ai", "name": "AI", "sort_order": 1}],
+        "submissions": [],
+        **tables,
+    }
+
+
+# CSV imports
+
+CSV_HEADER = ["title", "summary", "category", "company_slugs", "source_url"]
+
+
+def csv_upload(*rows) -> bytes:
+    """A CSV upload of csv_row() rows"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    writer.writerows(rows)
+    return out.getvalue().encode()
+
+
+def csv_row(i: int, slugs: str = "acme", **fields) -> List[str]:
+    """Row i of a CSV_HEADER upload, distinct enough from other rows not to look like a duplicate"""
+    values = {
+        "title": f"Story number {i} about a different subject",
+        "summary": f"Body {i} " + " ".join(f"word{i}x{j}" for j in range(20)),
+        "category": "funding",
+        "company_slugs": slugs,
+        "source_url": f"https://import.example.com/{i}",
+        **fields,
+    }
+    return [values[field] for field in CSV_HEADER]
+
+
+async def post_csv(client, content: bytes, **form):
+    """Post content to the CSV import endpoint with form fields"""
+    data = {key: str(value).lower() if isinstance(value, bool) else str(value) for key, value in form.items()}
+    return await client.post("/editor/stories/import-csv", files={"file": ("stories.csv", content, "text/csv")}, data=data)
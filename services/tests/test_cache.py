@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+from fake_supabase import Latency
+from support import FakeSupabase, import_module, import_service, make_company, make_tables, running, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache():
+    return import_module("feed", "cache")
+
+
+class Loader:
+    """Counts loads and can hold them until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        value = {"version": self.calls}
+        await self.release.wait()
+        return value
+
+
+async def test_hits_are_served_from_memory(cache):
+    responses = cache.ResponseCache(ttl=60)
+    load = Loader()
+    assert await responses.get_or_load("k", load) == {"version": 1}
+    assert await responses.get_or_load("k", load) == {"version": 1}
+    assert load.calls == 1
+    assert responses.stats()["hits"] == 1
+
+
+async def test_concurrent_misses_share_one_load(cache):
+    responses = cache.ResponseCache(ttl=60)
+    load = Loader()
+    load.release.clear()
+    waiting = [asyncio.create_task(responses.get_or_load("k", load)) for _ in range(5)]
+    await asyncio.sleep(0)
+    load.release.set()
+    assert [await task for task in waiting] == [{"version": 1}] * 5
+    assert load.calls == 1
+
+
+async def test_stale_entries_are_served_while_refreshing(cache):
+    responses = cache.ResponseCache(ttl=0, stale_ttl=60)
+    load = Loader()
+    await responses.get_or_load("k", load)
+    # Expired but within the stale window: old value now, new one stored in the background
+    assert await responses.get_or_load("k", load) == {"version": 1}
+    await asyncio.sleep(0.01)
+    assert load.calls == 2
+    assert responses._entries["k"].value == {"version": 2}
+    assert responses.stats()["stale_hits"] == 1
+
+
+async def test_loads_started_before_an_invalidation_are_not_stored(cache):
+    responses = cache.ResponseCache(ttl=60)
+    load = Loader()
+    load.release.clear()
+    before = asyncio.create_task(responses.get_or_load("k", load))
+    while not load.calls:
+        await asyncio.sleep(0)
+    assert responses.invalidate(lambda key, value: True) == 0
+    after = asyncio.create_task(responses.get_or_load("k", load))
+    await asyncio.sleep(0)
+    load.release.set()
+
+    # The request after the invalidation did its own load, and only that one was kept
+    assert (await before, await after) == ({"version": 1}, {"version": 2})
+    assert await responses.get_or_load("k", load) == {"version": 2}
+
+
+async def test_entries_are_bounded_and_evicted_by_predicate(cache):
+    responses = cache.ResponseCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        await responses.get_or_load(key, Loader())
+    assert sorted(responses._entries) == ["b", "c"]
+    assert responses.stats()["evictions"] == 1
+    assert responses.invalidate(lambda key, value: key == "b") == 1
+    assert list(responses._entries) == ["c"]
+
+
+async def test_encoded_bodies_are_built_once_per_entry(cache):
+    responses = cache.ResponseCache(ttl=60)
+    encodes = []
+
+    def encode(value):
+        encodes.append(value)
+        return repr(value)
+
+    load = Loader()
+    first = await responses.get_or_load_encoded("k", load, encode)
+    second = await responses.get_or_load_encoded("k", load, encode)
+    assert first is second
+    assert len(encodes) == 1
+
+
+async def test_single_flight_collapses_identical_calls(cache):
+    flight = cache.SingleFlight()
+    load = Loader()
+    load.release.clear()
+    waiting = [asyncio.create_task(flight.do("k", load)) for _ in range(3)]
+    other = asyncio.create_task(flight.do("other", load))
+    await asyncio.sleep(0)
+    load.release.set()
+
+    assert [await task for task in waiting] == [{"version": 1}] * 3
+    assert await other == {"version": 2}
+    assert flight.stats() == {"in_flight": 0, "calls": 2, "collapsed": 2}
+    # Finished calls aren't reused
+    assert await flight.do("k", load) == {"version": 3}
+
+
+async def test_single_flight_shares_errors_and_survives_cancelled_callers(cache):
+    flight = cache.SingleFlight()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise ConnectionError("upstream down")
+
+    cancelled = asyncio.create_task(flight.do("k", failing))
+    waiting = asyncio.create_task(flight.do("k", failing))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    with pytest.raises(ConnectionError):
+        await waiting
+    assert cancelled.cancelled()
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_identical_concurrent_requests_share_one_query():
+    fake = FakeSupabase(make_tables([make_company("acme")]), Latency(base_ms=5))
+    timeline = import_service("timeline", fake)
+    async with running(timeline) as client:
+        await wait_for(lambda: timeline.company_filters.ready)
+        fake.reset_calls()
+        responses = await asyncio.gather(*(client.get("/companies/acme") for _ in range(10)))
+
+    assert {response.status_code for response in responses} == {200}
+    assert fake.call_counts() == {"companies.select": 1}
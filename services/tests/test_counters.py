@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from support import FakeSupabase, import_module, import_service, make_company, make_story, make_tables, running
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def counters():
+    return import_module("feed", "counters")
+
+
+class FlakyDatabase:
+    def __init__(self):
+        self.down = False
+        self.batches = []
+
+    async def write(self, rows):
+        if self.down:
+            raise ConnectionError("database unreachable")
+        self.batches.append(rows)
+
+
+async def test_increments_coalesce_into_one_row_per_story(counters):
+    database = FlakyDatabase()
+    buffer = counters.EngagementBuffer(database.write)
+    buffer.increment("s1", "likes")
+    buffer.increment("s1", "views")
+    assert buffer.increment("s1", "likes") == 2
+    buffer.increment("s2", "views")
+
+    assert await buffer.flush() == 2
+    assert sorted(database.batches[0], key=lambda row: row["id"]) == [
+        {"id": "s1", "likes": 2, "views": 1},
+        {"id": "s2", "likes": 0, "views": 1},
+    ]
+    assert buffer.metrics()["queue_depth"] == 0
+
+
+async def test_failed_flushes_retry_within_the_backlog_cap(counters):
+    database = FlakyDatabase()
+    buffer = counters.EngagementBuffer(database.write, max_pending=2, max_backlog=3)
+    database.down = True
+    for story_id in ("s1", "s2", "s3"):
+        buffer.increment(story_id, "views")
+    assert await buffer.flush() == 0
+
+    # Known stories keep counting; new ones are dropped while the backlog is full
+    assert buffer.increment("s1", "views") == 2
+    assert buffer.increment("s4", "views") == 0
+    metrics = buffer.metrics()
+    assert (metrics["queue_depth"], metrics["dropped_increments"], metrics["consecutive_failures"]) == (3, 1, 1)
+
+    database.down = False
+    assert await buffer.flush() == 3
+    assert {row["id"]: row["views"] for row in database.batches[0]} == {"s1": 2, "s2": 1, "s3": 1}
+    assert buffer.metrics()["consecutive_failures"] == 0
+
+
+async def test_deltas_arriving_during_a_failed_flush_are_capped_too(counters):
+    database = FlakyDatabase()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_failure(rows):
+        started.set()
+        await release.wait()
+        raise ConnectionError("database unreachable")
+
+    buffer = counters.EngagementBuffer(slow_failure, max_pending=1, max_backlog=2)
+    buffer.increment("s1", "likes")
+    buffer.increment("s2", "likes")
+    flush = asyncio.create_task(buffer.flush())
+    await started.wait()
+    buffer.increment("s3", "likes")
+    buffer.increment("s4", "likes")
+    release.set()
+    await flush
+
+    assert buffer.metrics()["queue_depth"] == 2
+    assert buffer.metrics()["dropped_increments"] == 2
+
+
+async def test_likes_reach_the_database_through_the_rpc():
+    acme = make_company("acme")
+    story = make_story("Acme launches")
+    fake = FakeSupabase(make_tables([acme], [story], [(story, acme)]))
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        for _ in range(3):
+            assert (await client.post(f"/stories/{story['id']}/like")).status_code == 200
+        stats = (await client.get("/internal/stats")).json()["engagement"]
+        assert stats["queue_depth"] == 1
+        assert stats["max_backlog"] == 50000
+    # Shutdown flushes what is still pending
+    assert fake.tables["stories"][0]["likes"] == 3
@@ -0,0 +1,74 @@
+import pytest
+from support import FakeSupabase, import_module, import_service, make_story, make_tables, running, wait_for
+
+pytestmark = pytest.mark.anyio
+
+ORIGINAL = {
+    "id": "s1",
+    "title": "Acme raises a $12M Series A led by Example Ventures",
+    "summary": "Acme, the Berlin payments startup, will use the new funding to hire engineers and expand into France.",
+    "source_url": "https://www.news.example.com/acme-series-a/?utm_source=newsletter",
+}
+
+
+@pytest.fixture
+def dedupe():
+    return import_module("cms", "dedupe")
+
+
+def test_urls_normalize_away_tracking_and_cosmetic_differences(dedupe):
+    assert dedupe.normalize_url("https://WWW.News.example.com/acme-series-a/?utm_source=x&b=2&a=1") == \
+        dedupe.normalize_url("http://news.example.com/acme-series-a?a=1&b=2&fbclid=y")
+    assert dedupe.normalize_url("   ") is None
+
+
+def test_same_source_url_is_a_duplicate(dedupe):
+    index = dedupe.DuplicateIndex()
+    index.add(ORIGINAL)
+    match = index.find({"title": "Different", "summary": "", "source_url": "https://news.example.com/acme-series-a"})
+    assert match == {"story_id": "s1", "reason": "source_url", "similarity": 1.0}
+
+
+def test_reworded_copy_is_a_duplicate_and_unrelated_text_is_not(dedupe):
+    index = dedupe.DuplicateIndex()
+    index.add(ORIGINAL)
+    reworded = {
+        "title": "Acme raises $12M Series A led by Example Ventures",
+        "summary": "Acme, the Berlin payments startup, will use the funding to hire engineers and expand into France.",
+    }
+    unrelated = {
+        "title": "Globex opens a robotics lab in Austin",
+        "summary": "The hardware company plans to double its research staff over the next two years.",
+    }
+    match = index.find(reworded)
+    assert match["story_id"] == "s1" and match["reason"] == "similar_text"
+    assert match["similarity"] >= dedupe.DUPLICATE_THRESHOLD
+    assert index.find(unrelated) is None
+
+
+def test_a_story_never_duplicates_itself_and_removal_forgets_it(dedupe):
+    index = dedupe.DuplicateIndex()
+    index.add(ORIGINAL)
+    assert index.find(ORIGINAL) is None
+    index.remove("s1")
+    assert index.find({**ORIGINAL, "id": "s2"}) is None
+    assert index.stats()["signatures"] == 0
+
+
+def test_short_texts_are_not_compared(dedupe):
+    assert dedupe.minhash("Acme raises money") is None
+
+
+async def test_create_story_rejects_duplicates_unless_allowed():
+    fake = FakeSupabase(make_tables(stories=[make_story(ORIGINAL["title"], summary=ORIGINAL["summary"])]))
+    cms = import_service("cms", fake)
+    payload = {"title": ORIGINAL["title"], "summary": ORIGINAL["summary"]}
+    async with running(cms) as client:
+        await wait_for(lambda: cms.duplicate_index.ready)
+        rejected = await client.post("/editor/stories", json=payload)
+        allowed = await client.post("/editor/stories", json={**payload, "allow_duplicate": True})
+
+    assert rejected.status_code == 409
+    assert rejected.json()["detail"]["reason"] == "similar_text"
+    assert allowed.status_code == 200
+    assert len(fake.tables["stories"]) == 2
@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import pytest
+from support import import_module, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def events():
+    return import_module("feed", "events")
+
+
+def test_event_round_trips_through_wire_form(events):
+    event = events.ChangeEvent(events.STORY_UPDATED, ["s2", "s1", "s1"], ["funding"], ["c1"], ["acme"])
+    copy = events.ChangeEvent.from_dict(event.to_dict())
+    assert copy.to_dict() == event.to_dict()
+    assert copy.story_ids == ["s1", "s2"]
+
+
+def test_unknown_or_malformed_events_are_rejected(events):
+    with pytest.raises(ValueError):
+        events.ChangeEvent("story.renamed")
+    with pytest.raises(ValueError):
+        events.ChangeEvent.from_dict({"story_ids": ["s1"]})
+
+
+def test_bus_without_publish_fails_when_constructed(events):
+    class Incomplete(events.EventBus):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+async def test_local_bus_delivers_to_every_handler_despite_failures(events):
+    bus = events.LocalBus()
+    received = []
+
+    async def failing(event):
+        raise RuntimeError("boom")
+
+    async def recording(event):
+        received.append(event.type)
+
+    bus.subscribe(failing)
+    bus.subscribe(recording)
+    await bus.publish(events.ChangeEvent(events.STORY_CREATED, ["s1"]))
+
+    assert received == ["story.created"]
+    assert bus.stats()["handler_failures"] == 1
+
+
+async def test_unix_socket_bus_delivers_events(events):
+    path = os.path.join(tempfile.mkdtemp(), "feed.sock")
+    subscriber = events.UnixSocketBus(listen_path=path)
+    publisher = events.UnixSocketBus(subscriber_paths=[path])
+    received = []
+
+    async def recording(event):
+        received.append(event.story_ids)
+
+    subscriber.subscribe(recording)
+    await subscriber.start()
+    try:
+        await publisher.publish(events.ChangeEvent(events.STORY_DELETED, ["s1"]))
+        await wait_for(lambda: received)
+    finally:
+        await publisher.close()
+        await subscriber.close()
+
+    assert received == [["s1"]]
+    assert publisher.stats()["publish_failures"] == 0
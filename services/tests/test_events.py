@@ -0,0 +1,91 @@
+import pytest
+from support import FakeSupabase, forward_events, import_service, make_company, make_story, make_tables, running, settle
+
+pytestmark = pytest.mark.anyio
+
+
+def story_ids(response):
+    assert response.status_code == 200
+    return [story["id"] for story in response.json()["stories"]]
+
+
+@pytest.fixture
+def catalog():
+    acme = make_company("acme", industry="fintech")
+    live = make_story("Acme launches a card", minutes_ago=10)
+    draft = make_story("Acme raises a seed round", status="draft")
+    fake = FakeSupabase(make_tables([acme], [live, draft], [(live, acme), (draft, acme)]))
+    return fake, live, draft
+
+
+async def test_publishing_a_draft_refreshes_company_and_industry_pages(catalog):
+    fake, live, draft = catalog
+    cms = import_service("cms", fake)
+    feed = import_service("feed", fake)
+    forward_events(cms, feed)
+    async with running(cms) as cms_client, running(feed) as feed_client:
+        filters = [{"company_slug": "acme"}, {"industry": "fintech"}]
+        for params in filters:
+            assert story_ids(await feed_client.get("/stories", params=params)) == [live["id"]]
+
+        response = await cms_client.put(f"/editor/stories/{draft['id']}", json={"status": "published"})
+        assert response.status_code == 200
+        await settle(cms)
+
+        for params in filters:
+            assert story_ids(await feed_client.get("/stories", params=params)) == [draft["id"], live["id"]]
+
+
+async def test_story_edits_evict_timeline_windows_not_showing_the_story(catalog):
+    fake, live, draft = catalog
+    cms = import_service("cms", fake)
+    timeline = import_service("timeline", fake)
+    forward_events(cms, timeline)
+    async with running(cms) as cms_client, running(timeline) as timeline_client:
+        # The newest entry is the draft, so this window doesn't show the live story
+        response = await timeline_client.get("/companies/acme/timeline", params={"limit": 1})
+        assert [item["id"] for item in response.json()["timeline"]] == [draft["id"]]
+        assert timeline.timeline_cache.stats()["entries"] == 1
+
+        await cms_client.put(f"/editor/stories/{live['id']}", json={"title": "Acme launches a debit card"})
+        await settle(cms)
+
+        assert timeline.timeline_cache.stats()["entries"] == 0
+
+
+async def test_update_and_delete_events_name_the_linked_companies(catalog):
+    fake, live, draft = catalog
+    cms = import_service("cms", fake)
+    events = []
+
+    async def record(event):
+        events.append(event)
+
+    cms.invalidation.bus.subscribe(record)
+    async with running(cms) as client:
+        await client.put(f"/editor/stories/{live['id']}", json={"title": "Acme ships"})
+        await client.delete(f"/editor/stories/{draft['id']}")
+        await settle(cms)
+
+    assert [(event.type, event.story_ids, event.company_slugs) for event in events] == [
+        ("story.updated", [live["id"]], ["acme"]),
+        ("story.deleted", [draft["id"]], ["acme"]),
+    ]
+
+
+async def test_updating_a_missing_story_creates_no_companies(catalog):
+    fake, live, draft = catalog
+    cms = import_service("cms", fake)
+    events = []
+
+    async def record(event):
+        events.append(event)
+
+    cms.invalidation.bus.subscribe(record)
+    async with running(cms) as client:
+        response = await client.put("/editor/stories/missing", json={"company_slugs": ["newco"]})
+        await settle(cms)
+
+    assert response.status_code == 404
+    assert [company["slug"] for company in fake.tables["companies"]] == ["acme"]
+    assert events == []
@@ -0,0 +1,160 @@
+import io
+import json
+
+import httpx
+import pytest
+from support import (
+    FakeSupabase, csv_row, csv_upload, import_module, import_service, make_company, make_story, make_tables, post_csv, running, wait_for
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def acme():
+    return make_company("acme")
+
+
+async def test_import_saves_stories_and_links_in_chunked_batches(acme):
+    fake = FakeSupabase(make_tables(companies=[acme]))
+    cms = import_service("cms", fake)
+    content = csv_upload(*(csv_row(i) for i in range(7)), csv_row(7, slugs="acme,newco"))
+    async with running(cms) as client:
+        await wait_for(lambda: cms.duplicate_index.ready)
+        fake.reset_calls()
+        response = await post_csv(client, content, chunk_size=3)
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["imported_count"] == 8
+    assert body["companies_created"] == 1
+    assert len(fake.tables["stories"]) == 8
+    # Every story links to acme, the last one to the company created for it as well
+    assert len(fake.tables["story_companies"]) == 9
+    assert [c["slug"] for c in fake.tables["companies"]] == ["acme", "newco"]
+    # One insert per chunk of stories and one for its links
+    calls = fake.call_counts()
+    assert calls["stories.insert"] == 3
+    assert calls["story_companies.insert"] == 3
+
+
+async def test_dry_run_previews_without_writing(acme):
+    fake = FakeSupabase(make_tables(companies=[acme]))
+    cms = import_service("cms", fake)
+    async with running(cms) as client:
+        await wait_for(lambda: cms.duplicate_index.ready)
+        response = await post_csv(client, csv_upload(*(csv_row(i) for i in range(8))), dry_run=True)
+
+    body = response.json()
+    assert body["dry_run"] is True
+    assert body["total_rows"] == 8
+    assert len(body["preview"]) == import_module("cms", "importer", fresh=False).PREVIEW_ROWS
+    assert fake.tables["stories"] == []
+    assert fake.tables["story_companies"] == []
+
+
+async def test_bad_rows_are_reported_and_the_rest_imported(acme):
+    fake = FakeSupabase(make_tables(companies=[acme]))
+    cms = import_service("cms", fake)
+    content = csv_upload(csv_row(0), csv_row(1, title=""), csv_row(2, summary="  "), csv_row(3))
+    async with running(cms) as client:
+        await wait_for(lambda: cms.duplicate_index.ready)
+        response = await post_csv(client, content)
+        missing_column = await client.post(
+            "/editor/stories/import-csv", files={"file": ("stories.csv", b"title,summary\nA,B\n", "text/csv")}
+        )
+
+    body = response.json()
+    assert body["imported_count"] == 2
+    assert body["error_count"] == 2
+    # Header is line 1, so data rows start at 2
+    assert [error.split(":")[0] for error in body["errors"]] == ["Row 3", "Row 4"]
+    assert missing_column.status_code == 400
+
+
+async def test_duplicates_of_existing_stories_and_earlier_rows_are_skipped(acme):
+    existing = make_story("Existing story", source_url="https://import.example.com/existing")
+    fake = FakeSupabase(make_tables(companies=[acme], stories=[existing]))
+    cms = import_service("cms", fake)
+    content = csv_upload(csv_row(0), csv_row(1, source_url="https://import.example.com/existing/"), csv_row(0))
+    async with running(cms) as client:
+        await wait_for(lambda: cms.duplicate_index.ready)
+        skipped = await post_csv(client, content)
+        flagged = await post_csv(client, csv_upload(csv_row(5), csv_row(5)), skip_duplicates=False, dry_run=True)
+
+    body = skipped.json()
+    assert body["imported_count"] == 1
+    assert body["duplicate_count"] == 2
+    assert body["duplicates"][0] == {
+        "row": 3, "title": csv_row(1)[0], "reason": "source_url", "similarity": 1.0, "duplicate_of": existing["id"]
+    }
+    assert body["duplicates"][1]["duplicate_of_row"] == 2
+    assert len(fake.tables["stories"]) == 2
+    # Flagged but kept when skipping is off
+    assert flagged.json()["duplicate_count"] == 1
+    assert flagged.json()["total_rows"] == 2
+
+
+async def test_insert_isolated_splits_a_failing_batch_down_to_the_bad_row():
+    importer = import_module("cms", "importer")
+    fake = FakeSupabase(make_tables(stories=[{"id": "taken"}]))
+    rows = [{"id": f"s{i}"} for i in range(3)] + [{"id": "taken"}] + [{"id": f"s{i}"} for i in range(3, 6)]
+
+    inserted, failed = await importer.insert_isolated(fake, "stories", rows)
+
+    assert [r["id"] for r in inserted] == [f"s{i}" for i in range(6)]
+    assert [r["id"] for r, _ in failed] == ["taken"]
+    assert len(fake.tables["stories"]) == 7
+
+
+async def test_insert_isolated_fails_once_when_the_database_is_unreachable():
+    class Unreachable:
+        async def wait(self):
+            raise httpx.ConnectError("connection refused")
+
+    importer = import_module("cms", "importer")
+    fake = FakeSupabase(make_tables(), latency=Unreachable())
+
+    with pytest.raises(httpx.ConnectError):
+        await importer.insert_isolated(fake, "stories", [{"id": f"s{i}"} for i in range(8)])
+    assert fake.call_counts() == {"stories.insert": 1}
+
+
+async def test_idempotent_insert_skips_rows_that_already_exist():
+    importer = import_module("cms", "importer")
+    fake = FakeSupabase(make_tables(stories=[{"id": "s0", "title": "Kept"}]))
+
+    inserted, failed = await importer.insert_isolated(fake, "stories", [{"id": "s0", "title": "Replayed"}, {"id": "s1"}], idempotent=True)
+
+    assert failed == []
+    assert fake.call_counts() == {"stories.upsert": 1}
+    assert [r.get("title") for r in fake.tables["stories"]] == ["Kept", None]
+
+
+async def test_stream_progress_sends_a_line_per_chunk_then_the_summary(acme):
+    fake = FakeSupabase(make_tables(companies=[acme]))
+    cms = import_service("cms", fake)
+    async with running(cms) as client:
+        await wait_for(lambda: cms.duplicate_index.ready)
+        response = await post_csv(client, csv_upload(*(csv_row(i) for i in range(5)), csv_row(5, title="")), chunk_size=2, stream_progress=True)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["rows_processed"] for line in lines[:-1]] == [2, 4, 6]
+    assert [line["rows_saved"] for line in lines[:-1]] == [2, 4, 5]
+    assert lines[-1]["imported_count"] == 5
+    assert lines[-1]["error_count"] == 1
+
+
+async def test_parsing_reads_one_chunk_ahead_of_the_writes(acme):
+    importer = import_module("cms", "importer")
+    reader = importer.open_csv(io.BytesIO(csv_upload(*(csv_row(i) for i in range(10)))))
+    csv_import = importer.CsvImport(FakeSupabase(make_tables(companies=[acme])), reader, chunk_size=4)
+
+    committed = []
+    async for progress in csv_import.run():
+        committed.append(progress["rows_processed"])
+        # At most the chunk after the one just written has been read from the file
+        assert reader.line_num - 1 <= progress["rows_processed"] + 4
+
+    assert committed == [4, 8, 10]
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import uuid
+
+import pytest
+from support import FakeSupabase, csv_row, csv_upload, import_module, import_service, make_company, make_tables, post_csv, running, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def jobs():
+    return import_module("cms", "jobs")
+
+
+@pytest.fixture
+def fake():
+    return FakeSupabase(make_tables(companies=[make_company("acme")]))
+
+
+def write_job(directory, content: bytes, **state) -> str:
+    """Leave a job on disk as a crashed worker would"""
+    job_id = str(uuid.uuid4())
+    with open(os.path.join(directory, f"{job_id}.csv"), "wb") as f:
+        f.write(content)
+    with open(os.path.join(directory, f"{job_id}.json"), "w") as f:
+        json.dump({"id": job_id, "filename": "stories.csv", "status": "running", **state}, f)
+    return job_id
+
+
+async def test_background_import_is_queued_and_polled_to_completion(fake):
+    cms = import_service("cms", fake)
+    async with running(cms) as client:
+        queued = await post_csv(client, csv_upload(*(csv_row(i) for i in range(6)), csv_row(6, title="")), background=True, chunk_size=4)
+        status_url = queued.json()["status_url"]
+        await wait_for(lambda: cms.import_jobs.get(queued.json()["job_id"]).status == "completed")
+        status = (await client.get(status_url)).json()
+        missing = await client.get("/editor/import-jobs/unknown")
+        rejected = await client.post(
+            "/editor/stories/import-csv",
+            files={"file": ("stories.csv", b"title,summary\nA,B\n", "text/csv")},
+            data={"background": "true"}
+        )
+
+    assert status["status"] == "completed"
+    assert status["total_rows"] == status["rows_done"] == 7
+    assert status["rows_saved"] == 6
+    assert status["rows_failed"] == 1
+    assert status["eta_seconds"] == 0
+    assert len(fake.tables["stories"]) == 6
+    assert missing.status_code == 404
+    assert rejected.status_code == 400
+
+
+async def test_unfinished_job_resumes_after_its_last_committed_chunk(jobs, fake, tmp_path):
+    job_id = write_job(tmp_path, csv_upload(*(csv_row(i) for i in range(10))), rows_committed=4, rows_saved=4, total_rows=10)
+    queue = jobs.ImportJobQueue(str(tmp_path), workers=1)
+    await queue.start(fake)
+    try:
+        # Finished jobs drop their upload but keep their state
+        await wait_for(lambda: queue.get(job_id).status == "completed" and not os.path.exists(tmp_path / f"{job_id}.csv"))
+    finally:
+        await queue.stop()
+
+    job = queue.get(job_id)
+    assert job.rows_committed == 10
+    assert job.rows_saved == 10
+    assert [story["title"] for story in fake.tables["stories"]] == [csv_row(i)[0] for i in range(4, 10)]
+    with open(tmp_path / f"{job_id}.json") as f:
+        assert json.load(f)["status"] == "completed"
+
+
+async def test_replayed_chunk_does_not_insert_duplicates(jobs, fake, tmp_path):
+    content = csv_upload(*(csv_row(i) for i in range(6)))
+    job_id = write_job(tmp_path, content, rows_committed=0, chunk_size=4)
+    # The first chunk was written but the worker died before recording it
+    importer = import_module("cms", "importer", fresh=False)
+    reader = importer.open_csv(io.BytesIO(content))
+    first_chunk = importer.CsvImport(fake, reader, chunk_size=4, id_namespace=uuid.UUID(job_id))
+    async for _ in first_chunk.run():
+        break
+
+    queue = jobs.ImportJobQueue(str(tmp_path), workers=1)
+    await queue.start(fake)
+    try:
+        await wait_for(lambda: queue.get(job_id).status == "completed")
+    finally:
+        await queue.stop()
+
+    assert sorted(story["title"] for story in fake.tables["stories"]) == sorted(csv_row(i)[0] for i in range(6))
+    assert len(fake.tables["story_companies"]) == 6
+
+
+async def test_job_without_its_upload_is_marked_failed(jobs, fake, tmp_path):
+    job_id = write_job(tmp_path, b"title,summary,category\n")
+    os.remove(tmp_path / f"{job_id}.csv")
+    queue = jobs.ImportJobQueue(str(tmp_path), workers=1)
+    await queue.start(fake)
+    await queue.stop()
+
+    assert queue.get(job_id).status == "failed"
+    assert queue.get(job_id).error == "Uploaded file is missing"
+    assert queue.stats()["jobs"] == {"failed": 1}
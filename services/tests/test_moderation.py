@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fake_supabase import Latency
+from support import FakeSupabase, import_service, make_tables, new_id, running
+
+pytestmark = pytest.mark.anyio
+
+
+def submission(title, company_name="Acme"):
+    return {
+        "id": new_id(),
+        "founder_name": "Ada",
+        "founder_email": "ada@example.com",
+        "company_name": company_name,
+        "company_website": None,
+        "proposed_title": title,
+        "proposed_summary": f"{title}, in the founder's words",
+        "proposed_category": "funding",
+        "proposed_tags": [],
+        "status": "pending",
+        "submitted_at": "2026-10-01T00:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def queue():
+    submissions = [submission("Acme raises a seed round"), submission("Globex opens in Berlin", "Globex")]
+    # A little latency so overlapping requests interleave between their reads and writes
+    fake = FakeSupabase(make_tables(submissions=submissions), Latency(base_ms=1))
+    return fake, [s["id"] for s in submissions]
+
+
+def statuses(body):
+    return {result["submission_id"]: result["status"] for result in body["results"]}
+
+
+async def test_overlapping_bulk_approvals_create_each_story_once(queue):
+    fake, ids = queue
+    cms = import_service("cms", fake)
+    payload = {"items": [{"submission_id": submission_id} for submission_id in ids]}
+    async with running(cms) as client:
+        first, second = await asyncio.gather(
+            client.post("/submissions/bulk-approve", json=payload),
+            client.post("/submissions/bulk-approve", json=payload),
+        )
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["approved_count"] + second.json()["approved_count"] == 2
+    assert len(fake.tables["stories"]) == 2
+    for submission_id in ids:
+        outcomes = sorted([statuses(first.json())[submission_id], statuses(second.json())[submission_id]])
+        assert outcomes == ["approved", "skipped"]
+
+
+async def test_repeated_and_single_approvals_after_bulk_are_skipped(queue):
+    fake, ids = queue
+    cms = import_service("cms", fake)
+    payload = {"items": [{"submission_id": submission_id} for submission_id in ids]}
+    async with running(cms) as client:
+        assert (await client.post("/submissions/bulk-approve", json=payload)).json()["approved_count"] == 2
+        again = await client.post("/submissions/bulk-approve", json=payload)
+        single = await client.post(f"/submissions/{ids[0]}/approve", json={
+            "title": "Acme raises again", "summary": "Different words entirely", "category": "funding"
+        })
+
+    assert set(statuses(again.json()).values()) == {"skipped"}
+    assert single.status_code == 409
+    assert len(fake.tables["stories"]) == 2
+
+
+async def test_bulk_reject_leaves_approved_submissions_alone(queue):
+    fake, ids = queue
+    cms = import_service("cms", fake)
+    async with running(cms) as client:
+        await client.post("/submissions/bulk-approve", json={"items": [{"submission_id": ids[0]}]})
+        response = await client.post("/submissions/bulk-reject", json={"submission_ids": ids + ["missing"]})
+
+    assert statuses(response.json()) == {ids[0]: "skipped", ids[1]: "rejected", "missing": "not_found"}
+    assert {s["id"]: s["status"] for s in fake.tables["submissions"]} == {ids[0]: "approved", ids[1]: "rejected"}
+
+
+async def test_single_reject_only_applies_to_pending_submissions(queue):
+    fake, ids = queue
+    cms = import_service("cms", fake)
+    async with running(cms) as client:
+        await client.post("/submissions/bulk-approve", json={"items": [{"submission_id": ids[0]}]})
+        approved = await client.post(f"/submissions/{ids[0]}/reject", params={"reason": "Too late"})
+        rejected = await client.post(f"/submissions/{ids[1]}/reject", params={"reason": "Off topic"})
+        again = await client.post(f"/submissions/{ids[1]}/reject")
+        missing = await client.post("/submissions/missing/reject")
+
+    assert approved.status_code == 409
+    assert rejected.status_code == 200
+    assert again.status_code == 409
+    assert missing.status_code == 404
+    by_id = {s["id"]: s for s in fake.tables["submissions"]}
+    assert by_id[ids[0]]["status"] == "approved"
+    assert (by_id[ids[1]]["status"], by_id[ids[1]]["admin_notes"]) == ("rejected", "Off topic")
@@ -0,0 +1,84 @@
+import pytest
+from support import FakeSupabase, import_service, make_company, make_story, make_tables, running
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def fake():
+    acme = make_company("acme")
+    # Pairs of stories share a timestamp, so the id tiebreaker matters
+    stories = [make_story(f"Story {i}", minutes_ago=i // 2) for i in range(23)]
+    stories.append(make_story("Draft", status="draft"))
+    submissions = [
+        {"id": story["id"], "proposed_title": story["title"], "status": "pending", "submitted_at": story["published_date"]}
+        for story in stories
+    ]
+    return FakeSupabase(make_tables([acme], stories, [(story, acme) for story in stories], submissions=submissions))
+
+
+async def walk(client, url, key, limit, **params):
+    """Follow next_cursor from the first page to the last, returning the ids in order"""
+    ids = []
+    response = await client.get(url, params={"limit": limit, **params})
+    while True:
+        assert response.status_code == 200
+        body = response.json()
+        ids.extend(row["id"] for row in body[key])
+        if not body["next_cursor"]:
+            return ids
+        response = await client.get(url, params={"limit": limit, "cursor": body["next_cursor"], **params})
+
+
+async def offset_pages(client, url, key, limit, **params):
+    ids = []
+    page = 1
+    while True:
+        rows = (await client.get(url, params={"limit": limit, "page": page, **params})).json()[key]
+        if not rows:
+            return ids
+        ids.extend(row["id"] for row in rows)
+        page += 1
+
+
+@pytest.mark.parametrize("limit", [1, 5, 22, 23, 100])
+async def test_feed_cursor_pages_match_offset_pages(fake, limit):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        by_cursor = await walk(client, "/stories", "stories", limit)
+        by_offset = await offset_pages(client, "/stories", "stories", limit)
+
+    assert len(by_cursor) == 23
+    assert by_cursor == by_offset
+
+
+async def test_cursor_pages_stay_put_when_stories_are_published(fake):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        first = (await client.get("/stories", params={"limit": 5})).json()
+        fake.tables["stories"].append(make_story("Breaking news"))
+        feed.stories_cache.clear()
+        second = (await client.get("/stories", params={"limit": 5, "cursor": first["next_cursor"]})).json()
+
+    ids = [story["id"] for story in first["stories"] + second["stories"]]
+    assert len(set(ids)) == 10
+
+
+@pytest.mark.parametrize("url, key", [("/editor/stories", "stories"), ("/submissions", "submissions")])
+async def test_cms_cursor_pages_match_offset_pages(fake, url, key):
+    cms = import_service("cms", fake)
+    params = {"status": "all"} if key == "submissions" else {}
+    async with running(cms) as client:
+        by_cursor = await walk(client, url, key, 4, **params)
+        by_offset = await offset_pages(client, url, key, 4, **params)
+
+    assert len(by_cursor) == 24
+    assert by_cursor == by_offset
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "WyJhIl0", "WyJhIiwiYikiXQ"])
+async def test_malformed_cursors_are_rejected(fake, cursor):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        response = await client.get("/stories", params={"cursor": cursor})
+    assert response.status_code == 400
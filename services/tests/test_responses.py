@@ -0,0 +1,93 @@
+import pytest
+from support import FakeSupabase, forward_events, import_service, make_company, make_story, make_tables, running, settle, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def fake():
+    acme = make_company("acme")
+    stories = [make_story(f"Acme story {i}", minutes_ago=i) for i in range(20)]
+    return FakeSupabase(make_tables([acme], stories, [(story, acme) for story in stories]))
+
+
+async def test_matching_etag_gets_an_empty_304(fake):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        first = await client.get("/stories")
+        etag = first.headers["etag"]
+        repeat = await client.get("/stories", headers={"If-None-Match": etag})
+        weak = await client.get("/stories", headers={"If-None-Match": f'"other", W/{etag}'})
+        stale = await client.get("/stories", headers={"If-None-Match": '"other"'})
+
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert (repeat.status_code, repeat.content, repeat.headers["etag"]) == (304, b"", etag)
+    assert weak.status_code == 304
+    assert stale.status_code == 200
+
+
+async def test_etag_changes_after_a_cms_write(fake):
+    cms = import_service("cms", fake)
+    feed = import_service("feed", fake)
+    forward_events(cms, feed)
+    story_id = fake.tables["stories"][0]["id"]
+    async with running(cms) as cms_client, running(feed) as feed_client:
+        etag = (await feed_client.get("/stories")).headers["etag"]
+        await cms_client.put(f"/editor/stories/{story_id}", json={"title": "Acme story, corrected"})
+        await settle(cms)
+        response = await feed_client.get("/stories", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["stories"][0]["title"] == "Acme story, corrected"
+
+
+@pytest.mark.parametrize("accept, encoding", [("gzip", "gzip"), ("gzip, br", "br"), ("br;q=0, gzip", "gzip"), ("identity", None)])
+async def test_bodies_are_compressed_by_accept_encoding(fake, accept, encoding):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        response = await client.get("/stories", headers={"Accept-Encoding": accept})
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.json()["stories"]) == 20
+
+
+async def test_small_bodies_are_sent_uncompressed(fake):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        response = await client.get("/categories", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+
+async def test_timeline_serves_etags(fake):
+    timeline = import_service("timeline", fake)
+    async with running(timeline) as client:
+        first = await client.get("/companies/acme/timeline", headers={"Accept-Encoding": "gzip"})
+        repeat = await client.get("/companies/acme/timeline", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert len(first.json()["timeline"]) == 20
+    assert repeat.status_code == 304
+
+
+async def test_trending_pages_are_encoded_once_per_refresh(fake):
+    feed = import_service("feed", fake)
+    async with running(feed) as client:
+        await wait_for(lambda: feed.trending.ready)
+        first = await client.get("/stories/trending", params={"timeframe": "day"}, headers={"Accept-Encoding": "gzip"})
+        body = feed.trending_body("day", 20, feed.parse_fields(None))
+        second = await client.get("/stories/trending", params={"timeframe": "day"}, headers={"Accept-Encoding": "gzip"})
+        assert feed.trending_body("day", 20, feed.parse_fields(None)) is body
+        assert second.headers["etag"] == first.headers["etag"]
+
+        fake.tables["stories"][5]["likes"] = 100
+        await feed.trending.refresh()
+        refreshed = await client.get("/stories/trending", params={"timeframe": "day"})
+
+    assert refreshed.headers["etag"] != first.headers["etag"]
+    assert refreshed.json()["stories"][0]["id"] == fake.tables["stories"][5]["id"]
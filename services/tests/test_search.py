@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from support import FakeSupabase, forward_events, import_module, import_service, make_company, make_story, make_tables, running, settle, wait_for
+
+pytestmark = pytest.mark.anyio
+
+ACME = {"slug": "acme", "industry": "fintech"}
+GLOBEX = {"slug": "globex", "industry": "ai"}
+
+
+def story(story_id, title, summary="", tags=(), category="funding", companies=(ACME,), published_date="2026-01-01"):
+    return {
+        "id": story_id,
+        "title": title,
+        "summary": summary,
+        "tags": list(tags),
+        "category": category,
+        "published_date": published_date,
+        "companies": list(companies),
+    }
+
+
+@pytest.fixture
+def search():
+    return import_module("feed", "search")
+
+
+async def built_index(search, stories):
+    async def load():
+        return stories
+
+    index = search.SearchIndex(load)
+    await index.rebuild()
+    return index
+
+
+async def test_title_matches_outrank_summary_matches(search):
+    index = await built_index(search, [
+        story("s1", "Quarterly results", summary="payments growth"),
+        story("s2", "Payments startup raises"),
+    ])
+    assert index.search("payments") == ["s2", "s1"]
+    # Every term has to match
+    assert index.search("payments raises") == ["s2"]
+
+
+async def test_prefixes_expand_and_filters_apply(search):
+    index = await built_index(search, [
+        story("s1", "Payments platform"),
+        story("s2", "Payment rails", companies=[GLOBEX], category="product"),
+        story("s3", "Paywall", companies=[]),
+    ])
+    assert set(index.search("pay")) == {"s1", "s2"}
+    assert index.search("pay", industry="ai") == ["s2"]
+    assert index.search("pay", category="funding") == ["s1"]
+    assert index.search("pay", company_slug="acme") == ["s1"]
+
+
+async def test_vocabulary_stays_sorted_through_upserts_and_removes(search):
+    index = await built_index(search, [story("s1", "zeta alpha"), story("s2", "mid alpha")])
+    index.upsert(story("s3", "beta omega"))
+    index.remove("s2")
+    assert index._vocabulary == sorted(index._postings)
+    assert index.search("mid") == []
+    assert index.search("bet") == ["s3"]
+
+
+async def test_writes_during_a_rebuild_survive_the_swap(search):
+    loading = asyncio.Event()
+    release = asyncio.Event()
+    rows = [story("s1", "Acme payments"), story("s2", "Acme lending")]
+
+    async def slow_load():
+        loading.set()
+        await release.wait()
+        # The snapshot read before the writes below
+        return rows
+
+    index = search.SearchIndex(slow_load)
+    index.upsert(rows[0])
+    index.upsert(rows[1])
+    rebuild = asyncio.create_task(index.rebuild())
+    await loading.wait()
+
+    index.upsert(story("s3", "Acme insurance"))
+    index.remove("s2")
+    index.upsert(story("s1", "Acme savings"))
+    release.set()
+    await rebuild
+
+    assert index.search("insurance") == ["s3"]
+    assert index.search("lending") == []
+    assert index.search("savings") == ["s1"]
+    assert index.search("payments") == []
+    assert index.stats()["documents"] == 2
+
+
+async def test_cms_writes_during_the_first_build_reach_the_index():
+    acme = make_company("acme")
+    live = make_story("Acme launches a card")
+    fake = FakeSupabase(make_tables([acme], [live], [(live, acme)]))
+    cms = import_service("cms", fake)
+    feed = import_service("feed", fake)
+    forward_events(cms, feed)
+    loading = asyncio.Event()
+    release = asyncio.Event()
+    load = feed.search_index.loader
+
+    async def slow_load():
+        rows = await load()
+        loading.set()
+        await release.wait()
+        return rows
+
+    feed.search_index.loader = slow_load
+    async with running(cms) as cms_client, running(feed):
+        await loading.wait()
+        await cms_client.post("/editor/stories", json={"title": "Acme opens in Paris", "summary": "Expansion", "company_slugs": ["acme"]})
+        await cms_client.put(f"/editor/stories/{live['id']}", json={"status": "draft"})
+        await settle(cms)
+        release.set()
+        await wait_for(lambda: feed.search_index.ready)
+
+        assert len(feed.search_index.search("paris")) == 1
+        assert feed.search_index.search("card") == []
@@ -0,0 +1,13 @@
+import pytest
+from support import FakeSupabase, import_service, make_tables, running
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("name", ["feed", "timeline", "cms"])
+async def test_service_starts_on_fake_database(name):
+    service = import_service(name, FakeSupabase(make_tables()))
+    async with running(service) as client:
+        response = await client.get("/")
+        assert response.status_code == 200
+        assert response.json()["version"] == "1.0.0"
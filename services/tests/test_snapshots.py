@@ -0,0 +1,140 @@
+import gzip
+import json
+import os
+
+import pytest
+from support import FakeSupabase, forward_events, import_module, import_service, make_company, make_story, make_tables, running, settle, wait_for
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def snapshots():
+    return import_module("feed", "snapshots")
+
+
+@pytest.fixture
+def body():
+    return import_module("feed", "responses", fresh=False).EncodedBody
+
+
+def read(store, relative: str) -> bytes:
+    with open(os.path.join(store.directory, relative), "rb") as f:
+        return f.read()
+
+
+def test_write_publishes_hashed_file_alias_and_compressed_siblings(snapshots, body, tmp_path):
+    store = snapshots.SnapshotStore(str(tmp_path), "feed")
+    payload = body({"stories": [1, 2, 3]})
+
+    assert store.write("stories/category/all", payload) is True
+    assert store.write("stories/category/all", body({"stories": [1, 2, 3]})) is False
+
+    entry = store.manifest["files"]["stories/category/all"]
+    assert entry["hash"] == payload.etag.strip('"')
+    assert read(store, entry["file"]) == read(store, "stories/category/all.json") == payload.raw
+    assert gzip.decompress(read(store, entry["file"] + ".gz")) == payload.raw
+    with pytest.raises(ValueError):
+        store.write("stories/../secrets", payload)
+
+
+def test_older_versions_are_kept_then_pruned(snapshots, body, tmp_path):
+    store = snapshots.SnapshotStore(str(tmp_path), "feed", keep=2)
+    versions = [body({"version": i}) for i in range(4)]
+    for version in versions:
+        store.write("stories/trending/day", version)
+
+    kept = {name for name in os.listdir(tmp_path / "feed" / "stories" / "trending") if name.endswith(".json")}
+    digests = [version.etag.strip('"') for version in versions]
+    assert kept == {"day.json"} | {f"day.{digest}.json" for digest in digests[1:]}
+    assert store.manifest["files"]["stories/trending/day"]["history"] == [digests[2], digests[1]]
+
+    store.remove("stories/trending/day")
+    assert os.listdir(tmp_path / "feed" / "stories" / "trending") == []
+
+
+def test_returning_to_an_old_version_keeps_its_file(snapshots, body, tmp_path):
+    store = snapshots.SnapshotStore(str(tmp_path), "feed", keep=2)
+    a, b, c = body("A"), body("B"), body("C")
+    for version in (a, b, c, a):
+        store.write("stories/trending/day", version)
+
+    entry = store.manifest["files"]["stories/trending/day"]
+    digests = [version.etag.strip('"') for version in (a, b, c)]
+    assert entry["hash"] == digests[0]
+    assert entry["history"] == [digests[2], digests[1]]
+    assert read(store, entry["file"]) == read(store, "stories/trending/day.json") == a.raw
+    assert gzip.decompress(read(store, entry["file"] + ".gz")) == a.raw
+
+
+def test_commit_bumps_the_manifest_version_and_survives_a_restart(snapshots, body, tmp_path):
+    store = snapshots.SnapshotStore(str(tmp_path), "feed")
+    store.write("stories/category/all", body({"stories": []}))
+    store.commit()
+    store.commit()
+
+    reopened = snapshots.SnapshotStore(str(tmp_path), "feed")
+    assert reopened.manifest["version"] == 2
+    assert json.loads(read(reopened, "manifest.json"))["files"].keys() == {"stories/category/all"}
+    assert reopened.write("stories/category/all", body({"stories": []})) is False
+
+
+async def test_build_drops_stale_paths_and_keeps_files_that_fail_to_render(snapshots, body, tmp_path):
+    store = snapshots.SnapshotStore(str(tmp_path), "feed")
+    paths = ["a", "b", "c"]
+    broken = set()
+
+    async def list_paths():
+        return paths
+
+    async def render(path):
+        if path in broken:
+            raise RuntimeError("database unavailable")
+        return body({"path": path})
+
+    generator = snapshots.SnapshotGenerator(store, list_paths, render)
+    await generator.build()
+    assert store.paths() == {"a", "b", "c"}
+    assert store.manifest["version"] == 1
+
+    # Nothing changed: no new manifest
+    await generator.build()
+    assert store.manifest["version"] == 1
+
+    paths = ["a", "b"]
+    broken.add("a")
+    await generator.build()
+    assert store.paths() == {"a", "b"}
+    assert read(store, "a.json") == body({"path": "a"}).raw
+    assert generator.stats()["failures"] == 1
+    assert store.manifest["version"] == 2
+
+
+def funding_titles(store):
+    return [story["title"] for story in json.loads(read(store, "stories/category/funding.json"))["stories"]]
+
+
+async def test_feed_snapshots_match_the_api_and_follow_cms_writes(tmp_path, monkeypatch):
+    acme = make_company("acme")
+    live = make_story("Acme launches a card", minutes_ago=10)
+    fake = FakeSupabase(make_tables([acme], [live], [(live, acme)]))
+    monkeypatch.setenv("SNAPSHOT_DIR", str(tmp_path))
+    feed = import_service("feed", fake)
+    cms = import_service("cms", fake)
+    forward_events(cms, feed)
+    feed.snapshots.debounce = 0.01
+    store = feed.snapshots.store
+
+    async with running(feed) as feed_client, running(cms) as cms_client:
+        await wait_for(lambda: "stories/category/funding" in store.paths())
+        api = await feed_client.get("/stories", params={"category": "funding", "limit": 20})
+        assert read(store, "stories/category/funding.json") == api.content
+
+        created = await cms_client.post("/editor/stories", json={
+            "title": "Acme raises a seed round", "summary": "New money", "category": "funding", "company_slugs": ["acme"]
+        })
+        await settle(cms)
+        await wait_for(lambda: len(funding_titles(store)) == 2)
+
+    assert created.status_code == 200
+    assert funding_titles(store) == ["Acme raises a seed round", "Acme launches a card"]
@@ -0,0 +1,84 @@
+import pytest
+from support import import_module
+
+pytestmark = pytest.mark.anyio
+
+COLUMNS = ("id", "title")
+ACME = {"slug": "acme", "industry": "fintech"}
+GLOBEX = {"slug": "globex", "industry": "ai"}
+
+
+def story(story_id="s1", category="funding", companies=(ACME,)):
+    return {"id": story_id, "title": "Title", "category": category, "companies": list(companies)}
+
+
+@pytest.fixture
+def stream():
+    return import_module("feed", "stream").StoryStream(max_pending=3)
+
+
+def open_stream(stream, category=None, industry=None, company_slug=None):
+    subscriber = stream.subscribe(category, industry, company_slug, COLUMNS)
+    # events() registers the subscriber when iteration starts; do it directly here
+    stream._subscribers.add(subscriber)
+    return subscriber
+
+
+def drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        change = subscriber.queue.get_nowait()
+        events.append("resync" if change is None else (change.event, change.story["id"]))
+    return events
+
+
+async def test_stories_without_companies_are_not_streamed(stream):
+    everything = open_stream(stream)
+    stream.publish(story(companies=[]), created=True)
+    stream.publish(story("s2"), created=True)
+    assert drain(everything) == [("story", "s2")]
+
+
+async def test_leaving_a_filter_sends_removed_to_its_subscribers_only(stream):
+    fintech = open_stream(stream, industry="fintech")
+    globex = open_stream(stream, company_slug="globex")
+    funding = open_stream(stream, category="funding")
+    stream.publish(story(), created=True)
+    assert [drain(s) for s in (fintech, globex, funding)] == [[("story", "s1")], [], [("story", "s1")]]
+
+    # Relinked to Globex and moved to another category
+    stream.publish(story(category="product", companies=[GLOBEX]))
+    assert drain(fintech) == [("removed", "s1")]
+    assert drain(globex) == [("story", "s1")]
+    assert drain(funding) == [("removed", "s1")]
+
+    # Unpublished: only the subscriber that was showing it hears about it
+    stream.publish({"id": "s1"}, removed=True)
+    assert [drain(s) for s in (fintech, globex, funding)] == [[], [("removed", "s1")], []]
+
+
+async def test_changes_to_unseen_stories_remove_them_everywhere_else(stream):
+    fintech = open_stream(stream, industry="fintech")
+    ai = open_stream(stream, industry="ai")
+    # Not seen by this process before, so the fintech list may be showing it
+    stream.publish(story(companies=[GLOBEX]))
+    assert drain(fintech) == [("removed", "s1")]
+    assert drain(ai) == [("story", "s1")]
+    # New stories are never on anyone's list yet
+    stream.publish(story("s2", companies=[GLOBEX]), created=True)
+    assert drain(fintech) == []
+
+
+async def test_slow_subscriber_gets_one_resync_instead_of_a_backlog(stream):
+    subscriber = open_stream(stream)
+    for i in range(5):
+        stream.publish(story(f"s{i}"), created=True)
+    assert drain(subscriber) == ["resync"]
+    assert stream.stats()["resyncs"] == 1
+
+
+async def test_frames_use_the_subscriber_projection(stream):
+    subscriber = open_stream(stream)
+    stream.publish(story(), created=True)
+    frame = subscriber.queue.get_nowait().frame(("id",))
+    assert frame == b'id: 1\nevent: story\ndata: {"id":"s1","companies":[{"slug":"acme","industry":"fintech"}]}\n\n'
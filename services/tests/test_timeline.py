@@ -0,0 +1,120 @@
+import pytest
+from support import FakeSupabase, import_service, make_company, make_story, make_tables, new_id, running
+
+pytestmark = pytest.mark.anyio
+
+DAY = "2026-03-02"
+
+
+def funding_round(company, announced_date):
+    return {
+        "id": new_id(),
+        "company_id": company["id"],
+        "round_type": "seed",
+        "amount_raised": 1_000_000,
+        "currency": "USD",
+        "announced_date": announced_date,
+        "investors": [],
+        "valuation": None,
+        "source_url": None,
+        "description": "",
+    }
+
+
+def company_event(company, event_date):
+    return {
+        "id": new_id(),
+        "company_id": company["id"],
+        "event_type": "launch",
+        "event_date": event_date,
+        "title": "Launch",
+        "description": "",
+        "amount": None,
+        "source_url": None,
+        "metadata": {},
+    }
+
+
+@pytest.fixture
+def backfilled():
+    """A company whose imported history lands mostly on one day"""
+    acme = make_company("acme")
+    rounds = [funding_round(acme, DAY) for _ in range(7)] + [funding_round(acme, "2025-01-01")]
+    events = [company_event(acme, DAY) for _ in range(3)]
+    stories = [make_story(f"Acme story {i}", published_date=f"{DAY}T0{i}:00:00+00:00") for i in range(4)]
+    tables = make_tables([acme], stories, [(story, acme) for story in stories], funding_rounds=rounds, company_events=events)
+    expected = {item["id"] for item in rounds + events + stories}
+    return FakeSupabase(tables), expected
+
+
+async def read_all_pages(client, limit):
+    pages = []
+    params = {"limit": limit}
+    while True:
+        response = await client.get("/companies/acme/timeline", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["timeline"]) <= limit
+        pages.append(body["timeline"])
+        if not body["has_more"]:
+            return pages
+        assert body["next_cursor"]
+        params = {"limit": limit, "cursor": body["next_cursor"]}
+
+
+@pytest.mark.parametrize("limit", [1, 3, 5, 50])
+async def test_cursor_pages_cover_a_dense_day_exactly_once(backfilled, limit):
+    fake, expected = backfilled
+    timeline = import_service("timeline", fake)
+    async with running(timeline) as client:
+        pages = await read_all_pages(client, limit)
+        full = (await client.get("/companies/acme/timeline")).json()["timeline"]
+
+    ids = [item["id"] for page in pages for item in page]
+    assert len(ids) == len(expected)
+    assert set(ids) == expected
+    dates = [item["date"] for page in pages for item in page]
+    assert dates == sorted(dates, reverse=True)
+    assert {item["id"] for item in full} == expected
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+async def test_cursor_pages_reach_undated_entries(backfilled, limit):
+    fake, expected = backfilled
+    acme = fake.tables["companies"][0]
+    undated_story = make_story("Acme story without a date", published_date=None)
+    undated = [funding_round(acme, None) for _ in range(2)] + [company_event(acme, None) for _ in range(2)] + [undated_story]
+    fake.tables["funding_rounds"] += undated[:2]
+    fake.tables["company_events"] += undated[2:4]
+    fake.tables["stories"].append(undated_story)
+    fake.tables["story_companies"].append({"story_id": undated_story["id"], "company_id": acme["id"]})
+    timeline = import_service("timeline", fake)
+    async with running(timeline) as client:
+        pages = await read_all_pages(client, limit)
+
+    items = [item for page in pages for item in page]
+    assert sorted(item["id"] for item in items) == sorted(expected | {item["id"] for item in undated})
+    # Undated entries come last
+    dates = [item["date"] for item in items]
+    assert dates[-len(undated):] == [None] * len(undated)
+
+
+async def test_window_honours_before_and_after(backfilled):
+    fake, _ = backfilled
+    timeline = import_service("timeline", fake)
+    async with running(timeline) as client:
+        older = (await client.get("/companies/acme/timeline", params={"before": DAY})).json()
+        newer = (await client.get("/companies/acme/timeline", params={"after": "2025-01-01"})).json()
+
+    assert [item["date"] for item in older["timeline"]] == ["2025-01-01"]
+    assert len(newer["timeline"]) == 14
+    assert not newer["has_more"]
+
+
+async def test_invalid_cursor_is_rejected(backfilled):
+    fake, _ = backfilled
+    timeline = import_service("timeline", fake)
+    async with running(timeline) as client:
+        response = await client.get("/companies/acme/timeline", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
@@ -1,11 +1,22 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from supabase import create_client, Client
+import asyncio
+from supabase import AsyncClient
 import uvicorn
 from typing import List, Dict, Any, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from itertools import islice
+import heapq
 import json
+import db
+from timing import StageTimings, stage_stats
+from pagination import decode_cursor, encode_cursor
+from cache import ResponseCache, SingleFlight
+from responses import EncodedBody, json_response
+from reference import ReferenceData
+from snapshots import SnapshotGenerator, SnapshotStore
+from events import COMPANY_CREATED, REFERENCE_CHANGED, SOCKET_DIR, ChangeEvent, bus_from_env
 
 app = FastAPI(title="Timeline Service", version="1.0.0")
 
@@ -17,20 +28,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-supabase_url = os.environ.get("SUPABASE_URL", "")
-supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE", "")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Supabase connection, opened on startup over a pooled keep-alive HTTP client
+http_client = db.create_http_client()
+supabase: AsyncClient = None
+
+internal_token = os.environ.get("INTERNAL_API_TOKEN", "")
+
+# Materialized timeline + stats per company slug. CMS writes evict exactly the
+# companies they touch; the TTL only covers rounds/events edited outside the CMS.
+timeline_cache = ResponseCache(
+    max_entries=int(os.environ.get("TIMELINE_CACHE_MAX_ENTRIES", 1000)),
+    ttl=float(os.environ.get("TIMELINE_CACHE_TTL", 300)),
+    stale_ttl=float(os.environ.get("TIMELINE_CACHE_STALE_TTL", 600)),
+)
+
+# Identical uncached queries in flight at the same time share one round trip
+flight = SingleFlight()
+
+async def load_company_filters() -> Dict[str, List[Any]]:
+    """Load the values offered by the GET /companies filters"""
+    industries = await supabase.table("industries").select("*").order("sort_order").execute()
+    # PostgREST has no DISTINCT, so read the two columns and dedupe here
+    locations = set()
+    company_types = set()
+    batch_size = 1000
+    start = 0
+    while True:
+        result = await supabase.table("companies").select("location, company_type").eq(
+            "status", "active"
+        ).order("id").range(start, start + batch_size - 1).execute()
+        for company in result.data:
+            if company.get("location"):
+                locations.add(company["location"])
+            if company.get("company_type"):
+                company_types.add(company["company_type"])
+        if len(result.data) < batch_size:
+            break
+        start += batch_size
+    return {
+        "industries": industries.data,
+        "company_types": sorted(company_types),
+        "locations": sorted(locations),
+    }
+
+# Filter values change rarely; reloaded hourly, on new companies and on reference.changed
+company_filters = ReferenceData(
+    load_company_filters,
+    refresh_interval=float(os.environ.get("REFERENCE_REFRESH_INTERVAL", 3600)),
+    max_age=int(os.environ.get("REFERENCE_MAX_AGE", 3600)),
+)
+
+async def list_snapshot_paths() -> List[str]:
+    """Snapshot the full timelines of the companies with the most stories"""
+    result = await supabase.table("companies").select("slug").eq("status", "active").order(
+        "story_count", desc=True
+    ).order("slug").limit(int(os.environ.get("SNAPSHOT_TOP_COMPANIES", 50))).execute()
+    return [f"companies/{company['slug']}/timeline" for company in result.data]
+
+async def render_snapshot(path: str) -> Optional[EncodedBody]:
+    """Build a timeline snapshot exactly as GET /companies/{slug}/timeline would serve it"""
+    company_slug = path.split("/")[1]
+    return await timeline_cache.get_or_load_encoded(
+        (company_slug, None, None, None, None),
+        lambda: build_company_timeline(company_slug, StageTimings()),
+        EncodedBody
+    )
+
+# Static copies of the top company timelines for a CDN; off unless SNAPSHOT_DIR is set
+snapshots = SnapshotGenerator(
+    SnapshotStore(os.environ["SNAPSHOT_DIR"], "timeline"),
+    list_snapshot_paths,
+    render_snapshot,
+    interval=float(os.environ.get("SNAPSHOT_INTERVAL", 300)),
+) if os.environ.get("SNAPSHOT_DIR") else None
+
+# CMS change events; the unix transport listens on EVENT_SOCKET
+bus = bus_from_env(os.environ.get("EVENT_SOCKET", f"{SOCKET_DIR}/timeline.sock"))
+
+@app.on_event("startup")
+async def connect_supabase():
+    global supabase
+    supabase = await db.connect(http_client)
+    company_filters.start()
+    if snapshots:
+        snapshots.start()
+    await bus.start()
+
+@app.on_event("shutdown")
+async def close_supabase():
+    await bus.close()
+    if snapshots:
+        await snapshots.stop()
+    await company_filters.stop()
+    await http_client.aclose()
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Timeline Service is running!", "version": "1.0.0"}
 
 @app.get("/companies/{company_slug}/timeline")
-def get_company_timeline(company_slug: str):
-    """Get complete timeline for a company"""
+async def get_company_timeline(
+    company_slug: str,
+    request: Request,
+    before: Optional[date] = Query(None, description="Only entries dated before this day"),
+    after: Optional[date] = Query(None, description="Only entries dated after this day"),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page")
+):
+    """Get complete timeline for a company, or one date window of it"""
+    timings = StageTimings()
+    if before or after or limit or cursor:
+        limit = limit or 50
+        position = decode_timeline_cursor(cursor) if cursor else None
+        body = await timeline_cache.get_or_load_encoded(
+            (company_slug, before, after, limit, position),
+            lambda: build_timeline_window(company_slug, before, after, limit, position, timings),
+            EncodedBody
+        )
+    else:
+        body = await timeline_cache.get_or_load_encoded(
+            (company_slug, None, None, None, None),
+            lambda: build_company_timeline(company_slug, timings),
+            EncodedBody
+        )
+    return json_response(request, body, {"Server-Timing": timings.server_timing() or "cache;desc=hit"})
+
+async def build_company_timeline(company_slug: str, timings: StageTimings):
+    """Assemble a company's merged timeline and stats from the database"""
     try:
         # Get company details
-        company_result = supabase.table("companies").select("*").eq("slug", company_slug).execute()
+        company_result = await timings.measure(
+            "company",
+            supabase.table("companies").select("*").eq("slug", company_slug).execute()
+        )
         
         if not company_result.data:
             raise HTTPException(status_code=404, detail="Company not found")
@@ -38,87 +168,39 @@ def get_company_timeline(company_slug: str):
         company = company_result.data[0]
         company_id = company["id"]
         
-        # Get funding rounds
-        funding_result = supabase.table("funding_rounds").select("*").eq(
-            "company_id", company_id
-        ).order("announced_date", desc=True).execute()
-        
-        # Get company events
-        events_result = supabase.table("company_events").select("*").eq(
-            "company_id", company_id
-        ).order("event_date", desc=True).execute()
-        
-        # Get related stories
-        stories_result = supabase.table("story_companies").select("""
-            *,
-            stories(id, title, summary, published_date, category, tags, source_url, likes, views)
-        """).eq("company_id", company_id).execute()
+        # Funding rounds, events and related stories only depend on the id,
+        # so fetch them concurrently
+        funding_result, events_result, stories_result = await asyncio.gather(
+            timings.measure(
+                "funding_rounds",
+                supabase.table("funding_rounds").select("*").eq(
+                    "company_id", company_id
+                ).order("announced_date", desc=True).execute()
+            ),
+            timings.measure(
+                "company_events",
+                supabase.table("company_events").select("*").eq(
+                    "company_id", company_id
+                ).order("event_date", desc=True).execute()
+            ),
+            timings.measure(
+                "stories",
+                supabase.table("story_companies").select("""
+                    *,
+                    stories(id, title, summary, published_date, category, tags, source_url, likes, views)
+                """).eq("company_id", company_id).execute()
+            ),
+        )
         
         # Build timeline
-        timeline = []
-        
-        # Add funding rounds
-        for funding in funding_result.data:
-            timeline.append({
-                "id": funding["id"],
-                "type": "funding",
-                "date": funding["announced_date"],
-                "title": f'{funding["round_type"].replace("-", " ").title()} Round',
-                "description": f'Raised {format_amount(funding["amount_raised"], funding["currency"])}' if funding["amount_raised"] else f'{funding["round_type"].title()} funding round',
-                "amount": funding["amount_raised"],
-                "currency": funding["currency"],
-                "investors": funding["investors"],
-                "valuation": funding["valuation"],
-                "source_url": funding["source_url"],
-                "metadata": {
-                    "round_type": funding["round_type"],
-                    "description": funding.get("description", "")
-                }
-            })
-        
-        # Add events
-        for event in events_result.data:
-            timeline.append({
-                "id": event["id"],
-                "type": "event",
-                "date": event["event_date"],
-                "title": event["title"],
-                "description": event["description"],
-                "amount": event["amount"],
-                "source_url": event["source_url"],
-                "metadata": {
-                    "event_type": event["event_type"],
-                    **event.get("metadata", {})
-                }
-            })
-            
-        # Add stories
-        for story_link in stories_result.data:
-            if story_link["stories"]:
-                story = story_link["stories"]
-                published_date = story["published_date"]
-                if isinstance(published_date, str):
-                    # Extract just the date part
-                    published_date = published_date[:10]
-                
-                timeline.append({
-                    "id": story["id"],
-                    "type": "story",
-                    "date": published_date,
-                    "title": story["title"],
-                    "description": truncate_text(story["summary"], 150),
-                    "source_url": story["source_url"],
-                    "metadata": {
-                        "category": story["category"],
-                        "tags": story["tags"],
-                        "likes": story["likes"],
-                        "views": story["views"],
-                        "full_summary": story["summary"]
-                    }
-                })
+        timeline = [funding_item(funding) for funding in funding_result.data]
+        timeline.extend(event_item(event) for event in events_result.data)
+        timeline.extend(
+            story_item(story_link["stories"]) for story_link in stories_result.data if story_link["stories"]
+        )
         
         # Sort timeline by date (newest first)
-        timeline.sort(key=lambda x: x["date"] if x["date"] else "", reverse=True)
+        timeline.sort(key=timeline_date, reverse=True)
         
         # Get funding summary
         funding_summary = get_funding_summary(funding_result.data)
@@ -139,23 +221,30 @@ def get_company_timeline(company_slug: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Rollup columns on companies, returned under "stats" in listings
+COMPANY_ROLLUP_FIELDS = (
+    "total_funding",
+    "funding_rounds_count",
+    "last_funding_round",
+    "last_funding_date",
+    "story_count"
+)
+
 @app.get("/companies")
-def get_companies(
+async def get_companies(
+    request: Request,
     industry: Optional[str] = None,
     company_type: Optional[str] = None,
     location: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
-    sort: str = Query("name", regex="^(name|founded_date|updated_at)$")
+    sort: str = Query("name", regex="^(name|founded_date|updated_at|total_funding|story_count)$")
 ):
     """Get companies with filtering and pagination"""
     try:
-        query = supabase.table("companies").select("""
-            *,
-            funding_rounds(round_type, amount_raised, announced_date),
-            story_companies(stories(id))
-        """)
+        # Funding and story stats are rollup columns kept current by triggers
+        query = supabase.table("companies").select("*")
         
         # Apply filters
         if industry:
@@ -174,6 +263,8 @@ def get_companies(
             query = query.order("founded_date", desc=True)
         elif sort == "updated_at":
             query = query.order("updated_at", desc=True)
+        elif sort in ("total_funding", "story_count"):
+            query = query.order(sort, desc=True).order("name", desc=False)
         else:
             query = query.order("name", desc=False)
         
@@ -181,55 +272,54 @@ def get_companies(
         start = (page - 1) * limit
         end = start + limit - 1
         
-        result = query.range(start, end).execute()
+        result = await flight.do(
+            ("companies", industry, company_type, location, search, sort, page, limit),
+            query.range(start, end).execute
+        )
         
         # Enhance company data
         companies = []
         for company in result.data:
-            # Calculate funding stats
-            funding_rounds = company.get("funding_rounds", [])
-            total_funding = sum(r["amount_raised"] or 0 for r in funding_rounds)
-            last_funding = max(funding_rounds, key=lambda x: x["announced_date"]) if funding_rounds else None
-            
-            # Count related stories
-            story_count = len([sc for sc in company.get("story_companies", []) if sc["stories"]])
-            
             company_data = {**company}
             company_data["stats"] = {
-                "total_funding": total_funding,
-                "funding_rounds_count": len(funding_rounds),
-                "last_funding_round": last_funding["round_type"] if last_funding else None,
-                "last_funding_date": last_funding["announced_date"] if last_funding else None,
-                "story_count": story_count
+                field: company_data.pop(field, None) for field in COMPANY_ROLLUP_FIELDS
             }
-            
-            # Clean up nested data
-            del company_data["funding_rounds"]
-            del company_data["story_companies"]
-            
             companies.append(company_data)
         
-        return {
+        return json_response(request, {
             "companies": companies,
             "page": page,
             "limit": limit,
             "total": len(companies),
             "has_more": len(companies) == limit
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/companies/filters")
+async def get_company_filters(request: Request):
+    """Get the industries, company types and locations companies can be filtered by"""
+    try:
+        return json_response(
+            request,
+            await company_filters.body("industries", "company_types", "locations"),
+            company_filters.cache_headers()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/companies/{company_slug}")
-def get_company(company_slug: str):
+async def get_company(request: Request, company_slug: str):
     """Get single company with basic stats"""
     try:
-        result = supabase.table("companies").select("""
+        query = supabase.table("companies").select("""
             *,
             funding_rounds(*),
             company_events(*),
             story_companies(stories(id, title, category, published_date))
-        """).eq("slug", company_slug).execute()
+        """).eq("slug", company_slug)
+        result = await flight.do(("company", company_slug), query.execute)
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Company not found")
@@ -252,11 +342,252 @@ def get_company(company_slug: str):
             "latest_story_date": max([s["published_date"] for s in stories]) if stories else None
         }
         
-        return {"company": company_data}
+        return json_response(request, {"company": company_data})
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def build_timeline_window(
+    company_slug: str,
+    before: Optional[date],
+    after: Optional[date],
+    limit: int,
+    position: Optional[tuple],
+    timings: StageTimings
+):
+    """Assemble one page of a company's timeline.
+
+    Each source is already ordered, so at most limit + 1 rows are read from
+    each and combined with a lazy k-way merge. Entries are ordered by
+    (day, type, date, id), newest first, and position is the key of the
+    last entry on the previous page, so pages can end mid-day without
+    skipping anything. Stats are left out since they need the company's
+    whole history.
+    """
+    try:
+        company_result = await timings.measure(
+            "company",
+            supabase.table("companies").select("*").eq("slug", company_slug).execute()
+        )
+        
+        if not company_result.data:
+            raise HTTPException(status_code=404, detail="Company not found")
+        
+        company = company_result.data[0]
+        company_id = company["id"]
+        
+        funding_query = supabase.table("funding_rounds").select("*").eq("company_id", company_id)
+        events_query = supabase.table("company_events").select("*").eq("company_id", company_id)
+        stories_query = supabase.table("stories").select("""
+            id, title, summary, published_date, category, tags, source_url, likes, views,
+            story_companies!inner(company_id)
+        """).eq("story_companies.company_id", company_id)
+        
+        # before/after are exclusive on the calendar day
+        if before:
+            funding_query = funding_query.lt("announced_date", before.isoformat())
+            events_query = events_query.lt("event_date", before.isoformat())
+            stories_query = stories_query.lt("published_date", before.isoformat())
+        if after:
+            funding_query = funding_query.gt("announced_date", after.isoformat())
+            events_query = events_query.gt("event_date", after.isoformat())
+            stories_query = stories_query.gte("published_date", (after + timedelta(days=1)).isoformat())
+        if position:
+            funding_query = after_position(funding_query, "funding", "announced_date", position)
+            events_query = after_position(events_query, "event", "event_date", position)
+            stories_query = after_position(stories_query, "story", "published_date", position)
+        
+        funding_rows, event_rows, story_rows = await asyncio.gather(
+            window_rows(timings, "funding_rounds", funding_query, "announced_date", limit),
+            window_rows(timings, "company_events", events_query, "event_date", limit),
+            window_rows(timings, "stories", stories_query, "published_date", limit),
+        )
+        
+        merged = heapq.merge(
+            window_entries(funding_rows, funding_item, "announced_date"),
+            window_entries(event_rows, event_item, "event_date"),
+            window_entries(story_rows, story_item, "published_date"),
+            key=lambda entry: entry[0],
+            reverse=True
+        )
+        page = list(islice(merged, limit + 1))
+        
+        has_more = len(page) > limit
+        page = page[:limit]
+        
+        return {
+            "company": company,
+            "timeline": [item for _, item in page],
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": encode_cursor([part or UNDATED for part in page[-1][0]]) if has_more and page else None
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def window_rows(timings: StageTimings, name: str, query, column: str, limit: int) -> List[Dict]:
+    """Read up to limit + 1 rows of one source in window order, undated rows last"""
+    if query is None:
+        return []
+    result = await timings.measure(
+        name,
+        query.order(column, desc=True, nullsfirst=False).order("id", desc=True).limit(limit + 1).execute()
+    )
+    return result.data
+
+def window_entries(rows: List[Dict], make_item, date_column: str):
+    """Pair each row's timeline entry with its window sort key: day, type, full date, id"""
+    for row in rows:
+        item = make_item(row)
+        yield (timeline_date(item), item["type"], row[date_column] or "", str(item["id"])), item
+
+# Stands in for the empty day and date of an undated entry in a cursor
+UNDATED = "undated"
+
+def decode_timeline_cursor(cursor: str) -> tuple:
+    """Decode a timeline cursor, rejecting keys no entry could have"""
+    day, entry_type, stamp, row_id = decode_cursor(cursor, 4)
+    if entry_type not in ("funding", "event", "story"):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if day == UNDATED and stamp == UNDATED:
+        return "", entry_type, "", row_id
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return day, entry_type, stamp, row_id
+
+def after_position(query, entry_type: str, column: str, position: tuple):
+    """Restrict one source to the entries that sort after position, or None if none can"""
+    day, position_type, stamp, row_id = position
+    if not day:
+        # Past every dated entry; undated ones are ordered by type, then id
+        if entry_type == position_type:
+            return query.is_(column, "null").lt("id", row_id)
+        return query.is_(column, "null") if entry_type < position_type else None
+    # Undated entries come after every dated one
+    if entry_type == position_type:
+        return query.or_(f'{column}.lt."{stamp}",and({column}.eq."{stamp}",id.lt."{row_id}"),{column}.is.null')
+    # Other types are ordered by type within a day
+    if entry_type < position_type:
+        next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+        return query.or_(f'{column}.lt."{next_day}",{column}.is.null')
+    return query.or_(f'{column}.lt."{day}",{column}.is.null')
+
+def funding_item(funding: Dict) -> Dict:
+    """Format a funding round as a timeline entry"""
+    return {
+        "id": funding["id"],
+        "type": "funding",
+        "date": funding["announced_date"],
+        "title": f'{funding["round_type"].replace("-", " ").title()} Round',
+        "description": f'Raised {format_amount(funding["amount_raised"], funding["currency"])}' if funding["amount_raised"] else f'{funding["round_type"].title()} funding round',
+        "amount": funding["amount_raised"],
+        "currency": funding["currency"],
+        "investors": funding["investors"],
+        "valuation": funding["valuation"],
+        "source_url": funding["source_url"],
+        "metadata": {
+            "round_type": funding["round_type"],
+            "description": funding.get("description", "")
+        }
+    }
+
+def event_item(event: Dict) -> Dict:
+    """Format a company event as a timeline entry"""
+    return {
+        "id": event["id"],
+        "type": "event",
+        "date": event["event_date"],
+        "title": event["title"],
+        "description": event["description"],
+        "amount": event["amount"],
+        "source_url": event["source_url"],
+        "metadata": {
+            "event_type": event["event_type"],
+            **event.get("metadata", {})
+        }
+    }
+
+def story_item(story: Dict) -> Dict:
+    """Format a related story as a timeline entry"""
+    published_date = story["published_date"]
+    if isinstance(published_date, str):
+        # Extract just the date part
+        published_date = published_date[:10]
+    
+    return {
+        "id": story["id"],
+        "type": "story",
+        "date": published_date,
+        "title": story["title"],
+        "description": truncate_text(story["summary"], 150),
+        "source_url": story["source_url"],
+        "metadata": {
+            "category": story["category"],
+            "tags": story["tags"],
+            "likes": story["likes"],
+            "views": story["views"],
+            "full_summary": story["summary"]
+        }
+    }
+
+def timeline_date(item: Dict) -> str:
+    """Sort key for timeline entries, undated ones last"""
+    return item["date"] if item["date"] else ""
+
+@app.post("/internal/events")
+async def receive_change_event(payload: Dict[str, Any], x_internal_token: Optional[str] = Header(None)):
+    """Receive a CMS change event over the HTTP transport"""
+    if internal_token and x_internal_token != internal_token:
+        raise HTTPException(status_code=403, detail="Invalid internal token")
+    try:
+        event = ChangeEvent.from_dict(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await bus.dispatch(event)
+    return {"success": True}
+
+async def on_change(event: ChangeEvent):
+    """Evict cached timelines for companies touched by a CMS write"""
+    if event.type in (COMPANY_CREATED, REFERENCE_CHANGED):
+        company_filters.request_refresh()
+    if event.type == REFERENCE_CHANGED:
+        return
+    story_ids = set(event.story_ids)
+    company_slugs = set(event.company_slugs)
+    touched = set(company_slugs)
+    
+    def affected(key, value):
+        # Companies named by the event, plus any timeline already showing the story
+        if key[0] in company_slugs:
+            return True
+        if any(item["type"] == "story" and item["id"] in story_ids for item in value["timeline"]):
+            touched.add(key[0])
+            return True
+        return False
+    
+    timeline_cache.invalidate(affected)
+    if snapshots:
+        # Only re-render timelines that are already snapshotted; the periodic pass picks up new top companies
+        paths = {f"companies/{slug}/timeline" for slug in touched}
+        snapshots.mark(paths & snapshots.store.paths())
+
+bus.subscribe(on_change)
+
+@app.get("/internal/stats")
+async def get_internal_stats():
+    """Get per-stage query timings and cache counters"""
+    return {
+        "stages": stage_stats(),
+        "timeline_cache": timeline_cache.stats(),
+        "company_filters": company_filters.stats(),
+        "snapshots": snapshots.stats() if snapshots else None,
+        "events": bus.stats(),
+        "single_flight": flight.stats()
+    }
+
 def format_amount(amount: float, currency: str = "USD") -> str:
     """Format monetary amount"""
     if not amount:
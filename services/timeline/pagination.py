@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from typing import Optional, Sequence, Tuple
+
+
+def encode_cursor(key: Sequence[Optional[str]]) -> Optional[str]:
+    """Build an opaque keyset cursor from a row's sort key"""
+    if not all(key):
+        return None
+    payload = json.dumps(list(key), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[str, ...]:
+    """Decode an opaque cursor into its sort key of size parts"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Values end up inside a PostgREST filter string, so keep them plain
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for part in key:
+        if not isinstance(part, str) or not part or any(c in part for c in '"\\()'):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key)
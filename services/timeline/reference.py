@@ -0,0 +1,132 @@
+import asyncio
+import time
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from responses import EncodedBody
+
+
+class Snapshot:
+    """One immutable load of every reference section, with its response bodies"""
+
+    __slots__ = ("sections", "version", "loaded_at", "_bodies")
+
+    def __init__(self, sections: Dict[str, Iterable[Any]], version: int):
+        self.sections: Mapping[str, Tuple[Any, ...]] = MappingProxyType(
+            {name: tuple(rows) for name, rows in sections.items()}
+        )
+        self.version = version
+        self.loaded_at = time.time()
+        self._bodies: Dict[Tuple[str, ...], EncodedBody] = {}
+
+    def body(self, names: Tuple[str, ...]) -> EncodedBody:
+        """Get the encoded {name: rows} payload for the given sections, built once per snapshot"""
+        body = self._bodies.get(names)
+        if body is None:
+            body = self._bodies[names] = EncodedBody({name: list(self.sections[name]) for name in names})
+        return body
+
+
+class ReferenceData:
+    """Slow-changing lookup tables served from memory instead of per request.
+
+    The loader returns every section at once. Each refresh builds a new
+    Snapshot and swaps it in whole, so readers never see a mix of old and
+    new tables. A failed refresh keeps serving the previous snapshot.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Dict[str, List[Any]]]], refresh_interval: float = 3600.0, max_age: int = 3600):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        # Browser/CDN lifetime for the served bodies
+        self.max_age = max_age
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_ms = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def start(self):
+        """Start the background refresh task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refresh(self):
+        """Reload soon, e.g. after a reference.changed event"""
+        self._wake.set()
+
+    async def refresh(self):
+        """Load every section and swap in the new snapshot"""
+        async with self._lock:
+            await self._load()
+
+    async def body(self, *names: str) -> EncodedBody:
+        """Get the encoded payload for the given sections, loading the first snapshot if needed"""
+        return (await self._current()).body(names)
+
+    async def rows(self, name: str) -> Tuple[Any, ...]:
+        """Get one section's rows, loading the first snapshot if needed"""
+        return (await self._current()).sections[name]
+
+    def cache_headers(self) -> Dict[str, str]:
+        """Cache-Control for bodies served from the snapshot"""
+        return {
+            "Cache-Control": f"public, max-age={self.max_age}, stale-while-revalidate={self.max_age}, stale-if-error=86400"
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Get snapshot version, age and section sizes"""
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "version": snapshot.version if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.loaded_at, 1) if snapshot else None,
+            "sections": {name: len(rows) for name, rows in snapshot.sections.items()} if snapshot else {},
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+        }
+
+    async def _current(self) -> Snapshot:
+        if self._snapshot is None:
+            async with self._lock:
+                # Concurrent first requests share the load that got the lock
+                if self._snapshot is None:
+                    await self._load()
+        return self._snapshot
+
+    async def _load(self):
+        started = time.perf_counter()
+        sections = await self.loader()
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        self._snapshot = Snapshot(sections, version)
+        self.refreshes += 1
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failures += 1
+                print(f"Warning: Failed to refresh reference data: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
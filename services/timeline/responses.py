@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies smaller than this aren't worth a compression pass
+MIN_COMPRESS_BYTES = 1024
+
+
+class EncodedBody:
+    """A JSON payload serialized once, with its ETag and compressed variants built on demand.
+
+    Cached responses keep one of these next to the value, so repeat requests
+    reuse both the bytes and the compression work.
+    """
+
+    __slots__ = ("raw", "etag", "_variants")
+
+    def __init__(self, payload: Any):
+        self.raw = json.dumps(payload, separators=(",", ":"), default=jsonable_encoder).encode("utf-8")
+        self.etag = '"' + hashlib.blake2b(self.raw, digest_size=12).hexdigest() + '"'
+        self._variants: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        """Get the body in the given content encoding (None for identity)"""
+        if encoding is None:
+            return self.raw
+        body = self._variants.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.raw, quality=5)
+            else:
+                body = gzip.compress(self.raw, compresslevel=6)
+            self._variants[encoding] = body
+        return body
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, or None for identity"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def json_response(request: Request, payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve payload (or a prebuilt EncodedBody) with ETag, 304 and compression support"""
+    body = payload if isinstance(payload, EncodedBody) else EncodedBody(payload)
+    headers = {
+        "Vary": "Accept-Encoding",
+        # Clients may keep the body but should revalidate before reusing it,
+        # unless the caller knows the data is long-lived
+        "Cache-Control": "no-cache",
+        **(headers or {}),
+        "ETag": body.etag,
+    }
+    if etag_matches(request.headers.get("if-none-match"), body.etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if len(body.raw) < MIN_COMPRESS_BYTES:
+        encoding = None
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body.encoded(encoding), media_type="application/json", headers=headers)
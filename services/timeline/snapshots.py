@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from responses import EncodedBody, brotli
+
+# Content encodings written next to each JSON file
+ENCODINGS = {"gzip": ".gz", "br": ".br"}
+
+# Snapshot paths are built from database values; keep them inside the store
+PATH_SEGMENT_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class SnapshotStore:
+    """Versioned, precompressed JSON files under root/name for a static host.
+
+    Each snapshot path (e.g. "stories/category/funding") is written as an
+    immutable content-addressed file, path.<hash>.json, plus a path.json
+    alias for the latest version, each with .gz/.br siblings. manifest.json
+    maps every path to its current hash and bumps its version whenever any
+    file changes. The previous keep hashes of each path stay on disk for
+    clients still holding an older manifest.
+    """
+
+    def __init__(self, root: str, name: str, keep: int = 2):
+        self.directory = os.path.join(root, name)
+        self.keep = keep
+        self.manifest = self._load_manifest()
+
+    def write(self, path: str, body: EncodedBody) -> bool:
+        """Write body as the current version of path; returns False if it is unchanged"""
+        if not all(PATH_SEGMENT_RE.match(segment) for segment in path.split("/")):
+            raise ValueError(f"Invalid snapshot path: {path}")
+        digest = body.etag.strip('"')
+        entry = self.manifest["files"].get(path)
+        if entry and entry["hash"] == digest:
+            return False
+
+        for suffix, data in self._variants(body):
+            self._write_file(f"{path}.{digest}.json{suffix}", data)
+            self._write_file(f"{path}.json{suffix}", data)
+
+        # Content can return to an older version; that file is current again, not history
+        history = [h for h in [entry["hash"]] + entry["history"] if h != digest] if entry else []
+        for stale in history[self.keep:]:
+            self._remove_files(f"{path}.{stale}.json")
+        self.manifest["files"][path] = {
+            "hash": digest,
+            "file": f"{path}.{digest}.json",
+            "bytes": len(body.raw),
+            "updated_at": time.time(),
+            "history": history[:self.keep],
+        }
+        return True
+
+    def remove(self, path: str):
+        """Delete every version of path"""
+        entry = self.manifest["files"].pop(path, None)
+        if entry:
+            for digest in [entry["hash"]] + entry["history"]:
+                self._remove_files(f"{path}.{digest}.json")
+            self._remove_files(f"{path}.json")
+
+    def paths(self) -> Set[str]:
+        return set(self.manifest["files"])
+
+    def commit(self):
+        """Publish the manifest under a new version"""
+        self.manifest["version"] += 1
+        self.manifest["generated_at"] = time.time()
+        self._write_file("manifest.json", json.dumps(self.manifest, indent=2).encode("utf-8"))
+
+    def _variants(self, body: EncodedBody):
+        yield "", body.raw
+        for encoding, suffix in ENCODINGS.items():
+            if encoding == "br" and brotli is None:
+                continue
+            yield suffix, body.encoded(encoding)
+
+    def _write_file(self, relative: str, data: bytes):
+        # Write-then-rename so the static host never serves a partial file
+        target = os.path.join(self.directory, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+
+    def _remove_files(self, relative: str):
+        for suffix in [""] + list(ENCODINGS.values()):
+            try:
+                os.remove(os.path.join(self.directory, relative + suffix))
+            except FileNotFoundError:
+                pass
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, "manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"version": 0, "generated_at": None, "files": {}}
+
+
+class SnapshotGenerator:
+    """Keeps a SnapshotStore in step with the service's hot read paths.
+
+    list_paths() names every path that should exist and render(path) builds
+    its body (None to drop it). Changes mark individual paths dirty and are
+    re-rendered after a short debounce, so a burst of CMS writes costs one
+    pass. Every interval seconds all paths are re-rendered; unchanged
+    bodies are skipped by hash, so only real changes touch the disk.
+    """
+
+    def __init__(
+        self,
+        store: SnapshotStore,
+        list_paths: Callable[[], Awaitable[Iterable[str]]],
+        render: Callable[[str], Awaitable[Optional[EncodedBody]]],
+        interval: float = 300.0,
+        debounce: float = 2.0
+    ):
+        self.store = store
+        self.list_paths = list_paths
+        self.render = render
+        self.interval = interval
+        self.debounce = debounce
+        self._dirty: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._task = None
+        self.builds = 0
+        self.files_written = 0
+        self.failures = 0
+        self.last_build_ms = 0.0
+
+    def start(self):
+        """Start the background generation task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background generation task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def mark(self, paths: Iterable[str]):
+        """Re-render the given paths soon, e.g. after a CMS write"""
+        self._dirty.update(paths)
+        if self._dirty:
+            self._wake.set()
+
+    async def build(self, paths: Optional[Iterable[str]] = None):
+        """Render paths (every path if None) and publish a new manifest if anything changed"""
+        started = time.perf_counter()
+        full = paths is None
+        if full:
+            wanted = set(await self.list_paths())
+            targets = sorted(wanted)
+        else:
+            wanted = None
+            targets = sorted(paths)
+
+        changed = False
+        for path in targets:
+            try:
+                body = await self.render(path)
+                if body is None:
+                    if path in self.store.paths():
+                        await asyncio.to_thread(self.store.remove, path)
+                        changed = True
+                elif await asyncio.to_thread(self.store.write, path, body):
+                    self.files_written += 1
+                    changed = True
+            except Exception as e:
+                # Keep serving the previous file; the next pass retries
+                self.failures += 1
+                print(f"Warning: Failed to render snapshot {path}: {str(e)}")
+
+        if full:
+            for path in self.store.paths() - wanted:
+                await asyncio.to_thread(self.store.remove, path)
+                changed = True
+        if changed:
+            await asyncio.to_thread(self.store.commit)
+        self.builds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        """Get manifest version and build counters"""
+        return {
+            "directory": self.store.directory,
+            "version": self.store.manifest["version"],
+            "files": len(self.store.manifest["files"]),
+            "pending": len(self._dirty),
+            "builds": self.builds,
+            "files_written": self.files_written,
+            "failures": self.failures,
+            "last_build_ms": round(self.last_build_ms, 2),
+        }
+
+    async def _run(self):
+        next_full = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_full:
+                    self._dirty.clear()
+                    await self.build()
+                    next_full = time.monotonic() + self.interval
+                elif self._dirty:
+                    # Let a burst of changes settle before rendering
+                    await asyncio.sleep(self.debounce)
+                    paths, self._dirty = self._dirty, set()
+                    await self.build(paths)
+            except Exception as e:
+                self.failures += 1
+                print(f"Warning: Failed to build snapshots: {str(e)}")
+                next_full = time.monotonic() + self.interval
+            self._wake.clear()
+            if self._dirty:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_full - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,43 @@
+import time
+from typing import Any, Awaitable, Dict
+
+# Process-wide totals per stage name, exposed by GET /internal/stats
+stage_totals: Dict[str, Dict[str, float]] = {}
+
+
+class StageTimings:
+    """Collects per-stage durations for one request"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    async def measure(self, name: str, awaitable: Awaitable) -> Any:
+        """Await awaitable and record how long it took under name"""
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def record(self, name: str, elapsed_ms: float):
+        self.stages[name] = elapsed_ms
+        totals = stage_totals.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        totals["count"] += 1
+        totals["total_ms"] += elapsed_ms
+        totals["max_ms"] = max(totals["max_ms"], elapsed_ms)
+
+    def server_timing(self) -> str:
+        """Format the stages as a Server-Timing header value"""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+def stage_stats() -> Dict[str, Dict[str, float]]:
+    """Get count, mean and max duration per stage"""
+    return {
+        name: {
+            "count": int(t["count"]),
+            "mean_ms": round(t["total_ms"] / t["count"], 2) if t["count"] else 0.0,
+            "max_ms": round(t["max_ms"], 2),
+        }
+        for name, t in stage_totals.items()
+    }
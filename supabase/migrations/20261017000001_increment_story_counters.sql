@@ -0,0 +1,14 @@
+-- Bulk, race-free like/view increments used by the feed service's
+-- write-behind engagement buffer.
+--
+-- deltas: [{"id": "<story uuid>", "likes": 3, "views": 41}, ...]
+create or replace function increment_story_counters(deltas jsonb)
+returns void
+language sql
+as $$
+  update stories s
+     set likes = coalesce(s.likes, 0) + d.likes,
+         views = coalesce(s.views, 0) + d.views
+    from jsonb_to_recordset(deltas) as d(id uuid, likes integer, views integer)
+   where s.id = d.id;
+$$;
@@ -0,0 +1,77 @@
+-- Per-company rollups read by the timeline service's GET /companies, kept
+-- current by triggers on funding_rounds and story_companies so the listing
+-- never has to embed either table.
+alter table companies
+  add column if not exists total_funding numeric not null default 0,
+  add column if not exists funding_rounds_count integer not null default 0,
+  add column if not exists last_funding_round text,
+  add column if not exists last_funding_date date,
+  add column if not exists story_count integer not null default 0;
+
+create index if not exists companies_total_funding_idx on companies (total_funding desc, name);
+create index if not exists companies_story_count_idx on companies (story_count desc, name);
+
+-- Funding aggregates are recomputed for the one company whose rounds changed;
+-- "last round" can't be maintained from a delta when a round is deleted.
+create or replace function refresh_company_funding_rollup(target uuid)
+returns void
+language sql
+as $$
+  update companies
+     set total_funding = coalesce(
+           (select sum(coalesce(amount_raised, 0)) from funding_rounds where company_id = target), 0),
+         funding_rounds_count = (select count(*) from funding_rounds where company_id = target),
+         (last_funding_round, last_funding_date) = (
+           select round_type, announced_date
+             from funding_rounds
+            where company_id = target
+            order by announced_date desc nulls last
+            limit 1)
+   where id = target;
+$$;
+
+create or replace function funding_rounds_rollup_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform refresh_company_funding_rollup(old.company_id);
+  end if;
+  if tg_op = 'INSERT' or (tg_op = 'UPDATE' and new.company_id is distinct from old.company_id) then
+    perform refresh_company_funding_rollup(new.company_id);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists funding_rounds_rollup on funding_rounds;
+create trigger funding_rounds_rollup
+  after insert or update or delete on funding_rounds
+  for each row execute function funding_rounds_rollup_trigger();
+
+-- Story counts move by exactly one per link row.
+create or replace function story_companies_rollup_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op = 'INSERT' then
+    update companies set story_count = story_count + 1 where id = new.company_id;
+  elsif tg_op = 'DELETE' then
+    update companies set story_count = greatest(story_count - 1, 0) where id = old.company_id;
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists story_companies_rollup on story_companies;
+create trigger story_companies_rollup
+  after insert or delete on story_companies
+  for each row execute function story_companies_rollup_trigger();
+
+-- Backfill existing companies
+update companies c
+   set story_count = (select count(*) from story_companies sc where sc.company_id = c.id);
+
+select refresh_company_funding_rollup(id) from companies;
@@ -0,0 +1,65 @@
+-- Story edit and company relink in one transaction, used by the CMS's
+-- PUT /editor/stories/{id}. Only the link rows that actually change are
+-- touched, so readers never see the story without its companies.
+--
+-- changes:     partial stories row as JSON; keys that are absent keep their value
+-- company_ids: the complete new link set, or null to leave links alone
+--
+-- Returns {"story": <row>, "added": [company ids], "removed": [company ids],
+-- "company_ids": [every company the story links to afterwards]}, or null if
+-- the story does not exist.
+create or replace function update_story_with_companies(
+  target uuid,
+  changes jsonb,
+  company_ids uuid[] default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  updated stories;
+  added uuid[] := '{}';
+  removed uuid[] := '{}';
+  linked uuid[];
+begin
+  update stories s
+     set (title, summary, content, category, tags, source_url, image_url, status, updated_at) = (
+           select r.title, r.summary, r.content, r.category, r.tags, r.source_url, r.image_url, r.status, r.updated_at
+             from jsonb_populate_record(s, changes) as r)
+   where s.id = target
+  returning s.* into updated;
+
+  if not found then
+    return null;
+  end if;
+
+  if company_ids is not null then
+    with gone as (
+      delete from story_companies
+       where story_id = target
+         and company_id <> all(company_ids)
+      returning company_id
+    )
+    select coalesce(array_agg(company_id), '{}') into removed from gone;
+
+    with fresh as (
+      insert into story_companies (story_id, company_id, relevance_score)
+      select distinct target, c, 1.0
+        from unnest(company_ids) as c
+       where not exists (
+         select 1 from story_companies sc where sc.story_id = target and sc.company_id = c)
+      returning company_id
+    )
+    select coalesce(array_agg(company_id), '{}') into added from fresh;
+  end if;
+
+  select coalesce(array_agg(company_id), '{}') into linked from story_companies where story_id = target;
+
+  return jsonb_build_object(
+    'story', to_jsonb(updated),
+    'added', to_jsonb(added),
+    'removed', to_jsonb(removed),
+    'company_ids', to_jsonb(linked)
+  );
+end;
+$$;